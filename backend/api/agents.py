@@ -5,7 +5,7 @@ from fastapi import APIRouter, HTTPException, status
 
 from ..models.agents import (
     AgentResponse, AgentListResponse, 
-    AgentToolsResponse, AgentStatistics
+    AgentToolsResponse, AgentStatistics, AgentSimilarResponse
 )
 from ..services.agent_service import AgentService
 
@@ -46,6 +46,18 @@ async def get_agent_tools(agent_id: str):
     return AgentToolsResponse(agent_id=agent_id, tools=tools)
 
 
+@router.get("/{agent_id}/similar", response_model=AgentSimilarResponse)
+async def get_similar_agents(agent_id: str):
+    """Get agents whose system prompts are near-duplicates of this one"""
+    agent = AgentService.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agent {agent_id} not found"
+        )
+    return AgentService.get_similar_agents(agent_id)
+
+
 # Permissions removed by product decision
 
 
@@ -1,25 +1,42 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, status
+import json
+from typing import Any, Dict, Iterator, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from pydantic import HttpUrl
 
 from ..models.discovery import (
     GitHubDiscoveryRequest, 
     DiscoveryResponse, DiscoveryStatusResponse
 )
 from ..services.discovery_service import DiscoveryService
+from ..services.github_service import GitHubService
 
 router = APIRouter(prefix="/api/discovery", tags=["discovery"])
 
 
 @router.post("/agents", response_model=DiscoveryResponse)
-async def discover_agents_from_github(request: GitHubDiscoveryRequest):
+def discover_agents_from_github(request: GitHubDiscoveryRequest):
     """Trigger agent discovery from GitHub repository"""
+    # Plain def: discovery drives its own event loop for the LLM calls, so it runs in the threadpool
     try:
-        agents = DiscoveryService.discover_agents_from_github(str(request.github_repo_url))
+        summary: Dict[str, Any] = {}
+        agents = DiscoveryService.discover_agents_from_github(
+            str(request.github_repo_url), use_llm_cache=not request.bypass_llm_cache,
+            analysis_mode=request.analysis_mode, token_budget=request.token_budget, force=request.force,
+            summary=summary,
+        )
+        from_snapshot = bool(summary.get("from_snapshot"))
         return DiscoveryResponse(
             success=True,
-            message=f"Successfully discovered {len(agents)} agents",
-            data={"agents": agents}
+            message=(
+                f"Repository unchanged since its last scan; {len(agents)} stored agents"
+                if from_snapshot else f"Successfully discovered {len(agents)} agents"
+            ),
+            data={"agents": agents},
+            from_snapshot=from_snapshot,
         )
     except ValueError as e:
         raise HTTPException(
@@ -33,6 +50,51 @@ async def discover_agents_from_github(request: GitHubDiscoveryRequest):
         )
 
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _stream_discovery(
+    github_repo_url: str,
+    use_llm_cache: bool = True,
+    analysis_mode: str = "fused",
+    token_budget: Optional[int] = None,
+    force: bool = False,
+) -> Iterator[str]:
+    # Headers are already sent once streaming starts, so failures become an event
+    try:
+        for event in DiscoveryService.iter_discovery_events(
+            github_repo_url, use_llm_cache, analysis_mode, token_budget, force
+        ):
+            yield _sse(event["event"], event["data"])
+    except Exception as e:
+        yield _sse("error", {"detail": f"Discovery failed: {str(e)}"})
+
+
+@router.get("/stream")
+async def stream_discovery(
+    github_repo_url: HttpUrl = Query(...),
+    bypass_llm_cache: bool = Query(False),
+    analysis_mode: Literal["fused", "separate"] = Query("fused"),
+    token_budget: Optional[int] = Query(None, ge=1),
+    force: bool = Query(False),
+):
+    """Run agent discovery and stream stage, agent and progress events (Server-Sent Events)"""
+    url = str(github_repo_url)
+    if not GitHubService.validate_github_url(url):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid GitHub URL: {url}"
+        )
+    return StreamingResponse(
+        _stream_discovery(
+            url, use_llm_cache=not bypass_llm_cache, analysis_mode=analysis_mode, token_budget=token_budget,
+            force=force,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.get("/status", response_model=DiscoveryStatusResponse)
 async def get_discovery_status():
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import sqlite3
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from contextlib import contextmanager
 
@@ -33,6 +33,14 @@ class Database:
                 )
             """)
             
+            # Where an agent's risk verdict came from: rules, cache or llm (added after the initial schema)
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(agents)").fetchall()}
+            if "risk_source" not in columns:
+                cursor.execute("ALTER TABLE agents ADD COLUMN risk_source VARCHAR")
+            # Set once an agent's prompt is no longer found in any scanned repository
+            if "retired_at" not in columns:
+                cursor.execute("ALTER TABLE agents ADD COLUMN retired_at TIMESTAMP")
+
             # Create per-agent tools table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS agent_tools (
@@ -62,6 +70,117 @@ class Database:
                 )
             except Exception:
                 pass
+
+            # Every place an agent's prompt was found (one agent per distinct prompt)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS agent_locations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    agent_id VARCHAR,
+                    file_path VARCHAR,
+                    line INTEGER,
+                    col INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (agent_id) REFERENCES agents (id)
+                )
+            """)
+            cursor.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_agent_locations_unique "
+                "ON agent_locations(agent_id, file_path, line, col)"
+            )
+
+            # LLM risk verdicts memoized by canonical (role, sorted toolset)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS risk_verdicts (
+                    role_key VARCHAR,
+                    tools_key VARCHAR,
+                    risk VARCHAR,
+                    reason TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (role_key, tools_key)
+                )
+            """)
+
+            # LLM cost of each agent analysis, to compare fused and separate modes
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS agent_analysis_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    agent_id VARCHAR,
+                    mode VARCHAR,
+                    calls INTEGER,
+                    cached_calls INTEGER,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    seconds FLOAT,
+                    fell_back BOOLEAN,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (agent_id) REFERENCES agents (id)
+                )
+            """)
+            # Local estimate of the prompt tokens, next to the reported ones (added after the initial schema)
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(agent_analysis_metrics)").fetchall()}
+            if "estimated_prompt_tokens" not in columns:
+                cursor.execute("ALTER TABLE agent_analysis_metrics ADD COLUMN estimated_prompt_tokens INTEGER")
+
+            # MinHash signature of each agent's prompt and its LSH band buckets (near-duplicate index)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS prompt_signatures (
+                    agent_id VARCHAR PRIMARY KEY,
+                    signature BLOB,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (agent_id) REFERENCES agents (id)
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS prompt_lsh_buckets (
+                    band INTEGER,
+                    bucket VARCHAR,
+                    agent_id VARCHAR,
+                    PRIMARY KEY (band, bucket, agent_id),
+                    FOREIGN KEY (agent_id) REFERENCES agents (id)
+                )
+            """)
+
+            # Near-duplicate pairs, stored in both directions; source is "minhash" or "llm"
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS agent_similarity (
+                    agent_id VARCHAR,
+                    other_id VARCHAR,
+                    similarity FLOAT,
+                    is_duplicate BOOLEAN,
+                    source VARCHAR,
+                    explanation TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (agent_id, other_id),
+                    FOREIGN KEY (agent_id) REFERENCES agents (id),
+                    FOREIGN KEY (other_id) REFERENCES agents (id)
+                )
+            """)
+
+            # Commit each repository was last scanned at, for incremental rescans
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS repository_scans (
+                    repository VARCHAR PRIMARY KEY,
+                    head_sha VARCHAR,
+                    scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Extractor version of the last scan: a newer extractor rescans everything (added after the initial schema)
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(repository_scans)").fetchall()}
+            if "extractor_version" not in columns:
+                cursor.execute("ALTER TABLE repository_scans ADD COLUMN extractor_version VARCHAR")
+            # Which agents each repository file (path relative to the repository root) currently holds
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS repository_agent_files (
+                    repository VARCHAR,
+                    file_path VARCHAR,
+                    agent_id VARCHAR,
+                    PRIMARY KEY (repository, file_path, agent_id),
+                    FOREIGN KEY (agent_id) REFERENCES agents (id)
+                )
+            """)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_repository_agent_files_agent ON repository_agent_files(agent_id)"
+            )
             
             
             conn.commit()
@@ -102,8 +221,8 @@ class Database:
         return results[0] if results else None
 
     def get_all_agents(self) -> List[Dict[str, Any]]:
-        """Get all agents"""
-        return self.execute_query("SELECT * FROM agents ORDER BY created_at DESC")
+        """Get all agents that are not retired"""
+        return self.execute_query("SELECT * FROM agents WHERE retired_at IS NULL ORDER BY created_at DESC")
 
     def create_agent(self, agent_data: Dict[str, Any]) -> str:
         """Create a new agent"""
@@ -159,6 +278,221 @@ class Database:
             (agent_id,),
         )
 
+    def add_agent_locations(self, agent_id: str, locations: List[Dict[str, Any]]) -> None:
+        """Record where an agent was found; already-known locations are ignored"""
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO agent_locations (agent_id, file_path, line, col) VALUES (?, ?, ?, ?)",
+                [(agent_id, loc.get("file"), loc.get("line"), loc.get("col")) for loc in locations],
+            )
+            conn.commit()
+
+    def get_risk_verdict(self, role_key: str, tools_key: str) -> Optional[Dict[str, Any]]:
+        results = self.execute_query(
+            "SELECT risk, reason FROM risk_verdicts WHERE role_key = ? AND tools_key = ?", (role_key, tools_key)
+        )
+        return results[0] if results else None
+
+    def save_risk_verdict(self, role_key: str, tools_key: str, risk: str, reason: Optional[str]) -> None:
+        self.execute_update(
+            "INSERT OR REPLACE INTO risk_verdicts (role_key, tools_key, risk, reason) VALUES (?, ?, ?, ?)",
+            (role_key, tools_key, risk, reason),
+        )
+
+    def add_analysis_metrics(self, agent_id: str, usage: Dict[str, Any]) -> None:
+        """Record the LLM calls, tokens and latency spent analysing one agent"""
+        self.execute_update(
+            """
+            INSERT INTO agent_analysis_metrics
+                (agent_id, mode, calls, cached_calls, prompt_tokens, completion_tokens, estimated_prompt_tokens,
+                 seconds, fell_back)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                agent_id,
+                usage.get("mode"),
+                usage.get("calls", 0),
+                usage.get("cached_calls", 0),
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+                usage.get("estimated_prompt_tokens", 0),
+                usage.get("seconds", 0.0),
+                bool(usage.get("fell_back")),
+            ),
+        )
+
+    def get_agent_locations(self, agent_id: str) -> List[Dict[str, Any]]:
+        return self.execute_query(
+            "SELECT file_path, line, col FROM agent_locations WHERE agent_id = ? ORDER BY file_path, line, col",
+            (agent_id,),
+        )
+
+    def get_prompt_signature(self, agent_id: str) -> Optional[bytes]:
+        results = self.execute_query("SELECT signature FROM prompt_signatures WHERE agent_id = ?", (agent_id,))
+        return results[0]["signature"] if results else None
+
+    def get_prompt_signatures(self, agent_ids: List[str]) -> Dict[str, bytes]:
+        signatures: Dict[str, bytes] = {}
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(agent_ids), 500):
+            chunk = agent_ids[i:i + 500]
+            rows = self.execute_query(
+                f"SELECT agent_id, signature FROM prompt_signatures WHERE agent_id IN ({','.join('?' * len(chunk))})",
+                tuple(chunk),
+            )
+            signatures.update({row["agent_id"]: row["signature"] for row in rows})
+        return signatures
+
+    def save_prompt_signature(self, agent_id: str, signature: bytes, buckets: List[Tuple[int, str]]) -> None:
+        with self.get_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO prompt_signatures (agent_id, signature) VALUES (?, ?)", (agent_id, signature)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO prompt_lsh_buckets (band, bucket, agent_id) VALUES (?, ?, ?)",
+                [(band, bucket, agent_id) for band, bucket in buckets],
+            )
+            conn.commit()
+
+    def find_lsh_candidates(self, buckets: List[Tuple[int, str]]) -> List[str]:
+        """Agents sharing at least one (band, bucket) key"""
+        if not buckets:
+            return []
+        where = " OR ".join("(band = ? AND bucket = ?)" for _ in buckets)
+        params = tuple(value for key in buckets for value in key)
+        rows = self.execute_query(f"SELECT DISTINCT agent_id FROM prompt_lsh_buckets WHERE {where}", params)
+        return [row["agent_id"] for row in rows]
+
+    def save_agent_similarity(
+        self,
+        agent_id: str,
+        other_id: str,
+        similarity: float,
+        is_duplicate: bool,
+        source: str,
+        explanation: Optional[str] = None,
+    ) -> None:
+        with self.get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO agent_similarity
+                    (agent_id, other_id, similarity, is_duplicate, source, explanation)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (agent_id, other_id, similarity, is_duplicate, source, explanation),
+                    (other_id, agent_id, similarity, is_duplicate, source, explanation),
+                ],
+            )
+            conn.commit()
+
+    def get_similar_agents(self, agent_id: str, duplicates_only: bool = False) -> List[Dict[str, Any]]:
+        rows = self.execute_query(
+            """
+            SELECT s.other_id AS agent_id, a.role, a.file_path, s.similarity, s.is_duplicate, s.source, s.explanation
+            FROM agent_similarity s JOIN agents a ON a.id = s.other_id
+            WHERE s.agent_id = ?"""
+            + (" AND s.is_duplicate = 1" if duplicates_only else "")
+            + " ORDER BY s.similarity DESC",
+            (agent_id,),
+        )
+        for row in rows:
+            row["is_duplicate"] = bool(row["is_duplicate"])
+        return rows
+
+    def get_repository_scan(self, repository: str) -> Optional[Dict[str, Any]]:
+        results = self.execute_query(
+            "SELECT head_sha, extractor_version, scanned_at FROM repository_scans WHERE repository = ?", (repository,)
+        )
+        return results[0] if results else None
+
+    def save_repository_scan(self, repository: str, head_sha: str, extractor_version: str) -> None:
+        self.execute_update(
+            "INSERT OR REPLACE INTO repository_scans (repository, head_sha, extractor_version, scanned_at) "
+            "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+            (repository, head_sha, extractor_version),
+        )
+
+    def get_repository_agents(self, repository: str) -> List[Dict[str, Any]]:
+        """The agents a repository's files held at its last scan"""
+        return self.execute_query(
+            """
+            SELECT * FROM agents WHERE id IN (SELECT agent_id FROM repository_agent_files WHERE repository = ?)
+            ORDER BY created_at, id
+            """,
+            (repository,),
+        )
+
+    def replace_repository_files(
+        self, repository: str, files: Optional[List[str]], found: Dict[str, List[Dict[str, Any]]]
+    ) -> List[str]:
+        """Swap the agents of some (default: all) of a repository's files for a finished scan's, in one transaction
+
+        found maps each agent id to the locations the scan found it at.
+        Locations of the old agents go, unless another repository has the
+        same file and agent; agents found again are no longer retired.
+        Returns the agents that held any of the replaced files, for
+        retire_orphaned_agents.
+        """
+        with self.get_connection() as conn:
+            if files is None:
+                rows = conn.execute(
+                    "SELECT file_path, agent_id FROM repository_agent_files WHERE repository = ?", (repository,)
+                ).fetchall()
+            else:
+                rows = []
+                # Stay well under SQLite's bound-parameter limit
+                for i in range(0, len(files), 500):
+                    chunk = files[i:i + 500]
+                    rows += conn.execute(
+                        "SELECT file_path, agent_id FROM repository_agent_files "
+                        f"WHERE repository = ? AND file_path IN ({','.join('?' * len(chunk))})",
+                        (repository, *chunk),
+                    ).fetchall()
+            pairs = [(row["file_path"], row["agent_id"]) for row in rows]
+            conn.executemany(
+                "DELETE FROM repository_agent_files WHERE repository = ? AND file_path = ? AND agent_id = ?",
+                [(repository, file_path, agent_id) for file_path, agent_id in pairs],
+            )
+            conn.executemany(
+                """
+                DELETE FROM agent_locations WHERE file_path = ? AND agent_id = ? AND NOT EXISTS (
+                    SELECT 1 FROM repository_agent_files r WHERE r.file_path = ? AND r.agent_id = ?
+                )
+                """,
+                [(file_path, agent_id, file_path, agent_id) for file_path, agent_id in pairs],
+            )
+            for agent_id, locations in found.items():
+                conn.executemany(
+                    "INSERT OR IGNORE INTO repository_agent_files (repository, file_path, agent_id) VALUES (?, ?, ?)",
+                    [(repository, file_path, agent_id) for file_path in {loc.get("file") for loc in locations}],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO agent_locations (agent_id, file_path, line, col) VALUES (?, ?, ?, ?)",
+                    [(agent_id, loc.get("file"), loc.get("line"), loc.get("col")) for loc in locations],
+                )
+                conn.execute("UPDATE agents SET retired_at = NULL WHERE id = ?", (agent_id,))
+            conn.commit()
+        return list({agent_id for _, agent_id in pairs})
+
+    def retire_orphaned_agents(self, agent_ids: List[str]) -> List[str]:
+        """Retire those of agent_ids no repository file holds any more; returns the newly retired ones"""
+        retired = []
+        with self.get_connection() as conn:
+            for agent_id in agent_ids:
+                cursor = conn.execute(
+                    """
+                    UPDATE agents SET retired_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND retired_at IS NULL
+                        AND NOT EXISTS (SELECT 1 FROM repository_agent_files WHERE agent_id = ?)
+                    """,
+                    (agent_id, agent_id),
+                )
+                if cursor.rowcount:
+                    retired.append(agent_id)
+            conn.commit()
+        return retired
+
 
 
 
@@ -17,14 +17,26 @@ try:
 except Exception:
     # .env loading is best-effort; continue if python-dotenv isn't installed
     pass
+from contextlib import asynccontextmanager
+
 from fastapi.middleware.cors import CORSMiddleware
 
 from .api import agents, tools, discovery
+from llm_service.client import close_llm_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release pooled LLM connections and the LLM event loop
+    close_llm_clients()
+
 
 app = FastAPI(
     title="DoubleTrust API",
     description="Agent and Tools Governance Platform MVP",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware for frontend integration
@@ -19,7 +19,12 @@ class AgentResponse(AgentBase):
     framework: Optional[str] = None
     risk: Optional[str] = None
     risk_reason: Optional[str] = None
+    # "rules", "cache" or "llm"
+    risk_source: Optional[str] = None
+    locations: Optional[List[Dict[str, Any]]] = None
     created_at: str
+    # Set once the agent's prompt is no longer found in any scanned repository
+    retired_at: Optional[str] = None
 
 
 class AgentListResponse(BaseModel):
@@ -37,6 +42,26 @@ class AgentToolsResponse(BaseModel):
 # Tool permissions removed by product decision.
 
 
+class SimilarAgent(BaseModel):
+    """A near-duplicate of an agent's system prompt"""
+    agent_id: str
+    role: Optional[str] = None
+    file_path: Optional[str] = None
+    similarity: float
+    is_duplicate: bool
+    # "minhash" (estimated) or "llm" (compared by the LLM)
+    source: str
+    explanation: Optional[str] = None
+
+
+class AgentSimilarResponse(BaseModel):
+    """Model for agent near-duplicates response"""
+    agent_id: str
+    similar: List[SimilarAgent]
+    # Agents linked to this one through duplicate pairs, including itself
+    cluster: List[str]
+
+
 class AgentStatistics(BaseModel):
     """Model for agent statistics"""
     total_agents: int
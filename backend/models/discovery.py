@@ -1,12 +1,20 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, HttpUrl
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, HttpUrl
 
 
 class GitHubDiscoveryRequest(BaseModel):
     """Model for GitHub discovery request"""
     github_repo_url: HttpUrl
+    # Ask the LLM again instead of reusing cached responses
+    bypass_llm_cache: bool = False
+    # "fused": one LLM call per agent for role, tools and risk; "separate": one call each
+    analysis_mode: Literal["fused", "separate"] = "fused"
+    # Tokens the scan's LLM analysis may spend before degrading to heuristics (default: SCAN_TOKEN_BUDGET env)
+    token_budget: Optional[int] = Field(None, ge=1)
+    # Scan even if the repository has not moved since its last scan
+    force: bool = False
 
 
 class DiscoveryResponse(BaseModel):
@@ -14,6 +22,8 @@ class DiscoveryResponse(BaseModel):
     success: bool
     message: str
     data: Optional[Dict[str, Any]] = None
+    # The repository had not moved since its last scan; agents are the stored inventory
+    from_snapshot: bool = False
 
 
 class DiscoveryStatusResponse(BaseModel):
@@ -4,6 +4,7 @@ import hashlib
 from typing import Any, Dict, List, Optional
 
 from ..database import db
+from .prompt_similarity import similar_agents
 
 
 class AgentService:
@@ -28,8 +29,16 @@ class AgentService:
     
     @staticmethod
     def get_agent(agent_id: str) -> Optional[Dict[str, Any]]:
-        """Get agent by ID"""
-        return db.get_agent(agent_id)
+        """Get agent by ID, with every location its prompt was found at"""
+        agent = db.get_agent(agent_id)
+        if agent:
+            agent["locations"] = db.get_agent_locations(agent_id)
+        return agent
+    
+    @staticmethod
+    def get_similar_agents(agent_id: str) -> Dict[str, Any]:
+        """Get an agent's near-duplicate prompts and duplicate cluster"""
+        return similar_agents(agent_id)
     
     @staticmethod
     def get_all_agents() -> List[Dict[str, Any]]:
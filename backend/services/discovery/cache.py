@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Lives next to backend/doubletrust.db but in its own file so it can be deleted freely
+DEFAULT_CACHE_PATH = str(Path(__file__).resolve().parents[2] / "extraction_cache.db")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ExtractionCache:
+    """On-disk cache of per-file visitor results keyed by (content hash, extractor version).
+
+    Entries are evicted least-recently-used first once the stored results exceed
+    max_bytes. Hit/miss counters accumulate over the lifetime of the instance.
+    """
+
+    def __init__(self, version: str, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.parse_seconds_saved = 0.0
+        self._init_table()
+
+    def _init_table(self) -> None:
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    content_hash VARCHAR,
+                    extractor_version VARCHAR,
+                    results JSON,
+                    size INTEGER,
+                    parse_seconds FLOAT,
+                    last_used FLOAT,
+                    PRIMARY KEY (content_hash, extractor_version)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache(last_used)"
+            )
+            conn.commit()
+
+    @contextmanager
+    def _connect(self):
+        # Pool workers read while the parent writes, so wait on locks instead of failing
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, hashes: Iterable[str]) -> Dict[str, Tuple[Optional[Dict[str, List[Any]]], float]]:
+        """Return {content_hash: (results, parse_seconds)} for the hashes present in the cache.
+
+        Read-only, so it is safe to call from pool workers; hit/miss accounting
+        is left to the caller via record().
+        """
+        wanted = list(dict.fromkeys(hashes))
+        found: Dict[str, Tuple[Optional[Dict[str, List[Any]]], float]] = {}
+        if not wanted:
+            return found
+        with self._connect() as conn:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(wanted), 500):
+                batch = wanted[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT content_hash, results, parse_seconds FROM extraction_cache "
+                    f"WHERE extractor_version = ? AND content_hash IN ({','.join('?' * len(batch))})",
+                    (self.version, *batch),
+                ).fetchall()
+                for content_hash, results, parse_seconds in rows:
+                    found[content_hash] = (json.loads(results), parse_seconds or 0.0)
+        return found
+
+    def record(self, hits: List[Tuple[str, float]], entries: List[Tuple[str, Optional[Dict[str, List[Any]]], float]]) -> None:
+        """Account for a batch of lookups: refresh hits and store freshly parsed results.
+
+        hits are (content_hash, parse_seconds_saved); entries are
+        (content_hash, results, parse_seconds) for files that had to be parsed.
+        """
+        now = time.time()
+        self.hits += len(hits)
+        self.misses += len(entries)
+        self.parse_seconds_saved += sum(seconds for _, seconds in hits)
+        rows = []
+        for content_hash, results, parse_seconds in entries:
+            payload = json.dumps(results)
+            rows.append((content_hash, self.version, payload, len(payload), parse_seconds, now))
+        with self._connect() as conn:
+            if hits:
+                conn.executemany(
+                    "UPDATE extraction_cache SET last_used = ? WHERE content_hash = ? AND extractor_version = ?",
+                    [(now, content_hash, self.version) for content_hash, _ in hits],
+                )
+            if rows:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO extraction_cache "
+                    "(content_hash, extractor_version, results, size, parse_seconds, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            conn.commit()
+
+    def evict(self) -> int:
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                DELETE FROM extraction_cache WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, SUM(size) OVER (ORDER BY last_used DESC, rowid DESC) AS running
+                        FROM extraction_cache
+                    ) WHERE running > ?
+                )
+                """,
+                (self.max_bytes,),
+            )
+            # Entries from older extractor versions can never hit again
+            cursor2 = conn.execute(
+                "DELETE FROM extraction_cache WHERE extractor_version != ?", (self.version,)
+            )
+            conn.commit()
+            removed = cursor.rowcount + cursor2.rowcount
+        self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extraction_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "parse_seconds_saved": round(self.parse_seconds_saved, 4),
+        }
@@ -2,94 +2,304 @@ from __future__ import annotations
 
 import argparse
 import json
-from typing import Dict, Any
+from typing import Awaitable, Callable, Collection, Dict, Any, Iterator, List, Optional, Set, Tuple, TypeVar
 import logging
 import hashlib
+from functools import partial
 
-from .extractor import extract_system_prompts, extract_langchain_agents
-from .role_assigner import summarize_prompt_role
+from .cache import DEFAULT_CACHE_PATH, ExtractionCache
+from .extractor import EXTRACTOR_VERSION, PREFILTER_MODES, iter_scan, iter_scan_git
+from .walker import DEFAULT_IGNORED_DIRS, DEFAULT_MAX_FILE_SIZE, WalkOptions
+from .role_assigner import (
+    DEFAULT_BATCH_TOKENS, DEFAULT_ROLE_CONFIDENCE, asummarize_prompt_role, asummarize_prompt_roles,
+    classify_prompt_role,
+)
+from ..scan_budget import EXPECTED_COMPLETION_TOKENS, ScanBudget
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-from llm_service.llm import MissingApiKeyError
+from llm_service.cache import bypass_llm_cache
+from llm_service.llm import MissingApiKeyError, llm_concurrency, meter_llm_usage, run_llm_calls
+from llm_service.prompts.discovery_prompts import BATCH_SUMMARIZER_SYSTEM, SUMMARIZER_SYSTEM
+from llm_service.shaping import estimate_tokens, shape_text
 
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-def discover_agents(directory: str) -> Dict[str, Any]:
-    logger.info("Starting discovery in: %s", directory)
-    items = extract_system_prompts(directory)
-    # Also detect LangChain-based agents (create_react_agent)
-    lc = extract_langchain_agents(directory)
-    agents = []
-    seen: set[str] = set()
-    for file_path, s in items:
-        key = s[:2000]
-        if key in seen:
-            continue
-        seen.add(key)
+# Candidates per concurrency slot classified together in batch mode
+ROLE_BATCH_WINDOW = 20
+# Key, quotes and role of one prompt in a batch request and its answer
+_BATCH_ITEM_TOKENS = 20
+
+
+def _role_tokens(prompt: str, batch_roles: bool) -> int:
+    """Tokens summarizing one prompt's role is expected to cost (in a batch: besides the batch's instructions)."""
+    prompt_tokens = estimate_tokens(shape_text(prompt))
+    if batch_roles:
+        return prompt_tokens + _BATCH_ITEM_TOKENS
+    return estimate_tokens(SUMMARIZER_SYSTEM) + prompt_tokens + EXPECTED_COMPLETION_TOKENS
+
+
+async def _metered(call: Callable[[], Awaitable[T]], spent: List[int]) -> T:
+    """Await call, adding the tokens its LLM requests reported to spent."""
+    with meter_llm_usage() as meter:
         try:
-            if s.strip():
-                try:
-                    role = summarize_prompt_role(s)
-                except MissingApiKeyError:
-                    # Fallback to simple role detection when API key is not available
-                    role = "AI Assistant"
-                except Exception as e:
-                    role = "AI Assistant"
-            else:
-                role = "Unknown"
-            
-            agent_id = hashlib.sha256(s.encode("utf-8")).hexdigest()
-            agents.append({
-                "id": agent_id,
-                "file": file_path,
-                "role": role,
-                "system_prompt": s,
-                "framework": "Custom"
-            })
-            logger.info("Found system prompt in %s → id=%s role=%s", file_path, agent_id[:8], role)
-        except Exception as e:
-            logger.warning("Error processing string from %s: %s", file_path, e)
-            continue
-    # Add LangChain agents
-    for file_path, data in lc:
-        prompt = data.get("prompt") or ""
-        key = (prompt or file_path)[:2000]
-        if key in seen:
+            return await call()
+        finally:
+            spent.append(meter["prompt_tokens"] + meter["completion_tokens"])
+
+
+def _assign_roles(
+    prompts: List[str],
+    concurrency: int,
+    batch_roles: bool,
+    role_confidence: float,
+    stats: Dict[str, Any],
+    budget: Optional[ScanBudget] = None,
+) -> List[str]:
+    """Roles for a window of prompts: confident local guesses, the LLM for the rest.
+
+    When the LLM is unavailable (no API key, failed request) or the prompt's
+    role no longer fits the budget, the local guess is used whatever its
+    confidence.
+    """
+    roles: List[str] = []
+    pending: Dict[str, str] = {}
+    for i, prompt in enumerate(prompts):
+        if not prompt.strip():
+            roles.append("Unknown")
             continue
-        seen.add(key)
-        try:
-            if prompt.strip():
-                try:
-                    role = summarize_prompt_role(prompt)
-                except MissingApiKeyError:
-                    role = "AI Assistant"
-                except Exception as e:
-                    role = "AI Assistant"
+        guess = classify_prompt_role(prompt)
+        roles.append(guess.role)
+        if guess.confidence < role_confidence:
+            pending[str(i)] = prompt
+    reserved = 0
+    if budget is not None:
+        # The first prompt of a batch window also carries the instructions the batch shares
+        overhead = estimate_tokens(BATCH_SUMMARIZER_SYSTEM) + EXPECTED_COMPLETION_TOKENS if batch_roles else 0
+        for prompt_id, prompt in list(pending.items()):
+            tokens = _role_tokens(prompt, batch_roles) + (0 if reserved else overhead)
+            if budget.reserve(tokens):
+                reserved += tokens
             else:
-                role = "Unknown"
-            agent_id = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+                del pending[prompt_id]
+                stats["roles_over_budget"] = stats.get("roles_over_budget", 0) + 1
+    stats["roles_local"] = stats.get("roles_local", 0) + len(prompts) - len(pending)
+    if not pending:
+        return roles
+    spent: List[int] = []
+    try:
+        if batch_roles:
+            call = partial(asummarize_prompt_roles, pending, DEFAULT_BATCH_TOKENS, stats)
+            found = run_llm_calls([partial(_metered, call, spent)], concurrency)[0]
+            answers = found if isinstance(found, dict) else {}
+        else:
+            results = run_llm_calls(
+                [partial(_metered, partial(asummarize_prompt_role, prompt), spent) for prompt in pending.values()],
+                concurrency,
+            )
+            answers = {
+                prompt_id: role for prompt_id, role in zip(pending, results) if isinstance(role, str)
+            }
+    finally:
+        if budget is not None:
+            budget.settle(reserved, sum(spent))
+    for prompt_id, role in answers.items():
+        roles[int(prompt_id)] = role
+    stats["roles_llm"] = stats.get("roles_llm", 0) + len(answers)
+    return roles
+
+
+def _file_candidates(file_path: str, found: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(hash of the full content, candidate with this one location) for each prompt extracted from a file."""
+    for item in found.get("system_prompts", []):
+        prompt = item["prompt"]
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        yield key, {
+            "framework": "Custom", "prompt": prompt,
+            "locations": [{"file": file_path, "line": item.get("line"), "col": item.get("col")}],
+        }
+    for data in found.get("langchain_agents", []):
+        prompt = data.get("prompt") or ""
+        # Agents with an unresolved prompt are only the same agent within one file
+        key = hashlib.sha256((prompt or f"langchain:{file_path}").encode("utf-8")).hexdigest()
+        # Pass through any extracted tool names (strings only)
+        tools = data.get("tools") or []
+        yield key, {
+            "framework": "Langchain", "prompt": prompt,
+            "locations": [{"file": file_path, "line": data.get("line"), "col": data.get("col")}],
+            "tools": [t for t in tools if isinstance(t, str)] if isinstance(tools, list) else [],
+        }
+
+
+def _merge_candidate(candidate: Dict[str, Any], other: Dict[str, Any]) -> None:
+    candidate["locations"].extend(other["locations"])
+    for t in other.get("tools") or []:
+        if t not in candidate.setdefault("tools", []):
+            candidate["tools"].append(t)
+
+
+def merge_agent_update(agent: Dict[str, Any], update: Dict[str, Any]) -> None:
+    """Fold a location update yielded by iter_discover_agents into the agent it refers to."""
+    agent["locations"].extend(update["locations"])
+    for t in update.get("__lc_tools__") or []:
+        if t not in agent.setdefault("__lc_tools__", []):
+            agent["__lc_tools__"].append(t)
+
+
+def iter_discover_agents(
+    directory: str,
+    workers: int = 1,
+    cache: Optional[ExtractionCache] = None,
+    prefilter: str = "on",
+    walk_options: Optional[WalkOptions] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    concurrency: Optional[int] = None,
+    use_llm_cache: bool = True,
+    batch_roles: bool = True,
+    assign_roles: bool = True,
+    role_confidence: float = DEFAULT_ROLE_CONFIDENCE,
+    only_files: Optional[Collection[str]] = None,
+    git_rev: Optional[str] = None,
+    budget: Optional[ScanBudget] = None,
+    skip_roles: Optional[Callable[[str], bool]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield each discovered agent as soon as it has been classified.
+
+    Candidates are de-duplicated by a hash of their full content before any
+    classification, so each distinct prompt is classified exactly once.
+    Classification starts as soon as a window of new candidates has been
+    extracted, while the scan carries on; a candidate carries every location
+    found until its window is classified. Locations of the same prompt found
+    after its agent was yielded follow as updates: entries with "__update__"
+    set that hold only the agent's id, the new locations and any new
+    LangChain tools (see merge_agent_update). Only the hashes of yielded
+    candidates and the pending window are held in memory; scan counters are
+    accumulated into stats.
+
+    Roles are summarized concurrently (at most `concurrency` LLM requests in
+    flight) in windows of candidates; agents are still yielded in scan order.
+    Roles come from the local classifier when its confidence reaches
+    role_confidence; only the remaining prompts are sent to the LLM. With
+    batch_roles (the default) many of those share one request; otherwise
+    each prompt is summarized on its own. With use_llm_cache=False every role
+    is requested from the LLM again. Role requests reserve their tokens from
+    budget, if given; prompts that no longer fit keep the local guess. With
+    assign_roles=False no roles are requested and agents with a prompt get
+    role None, for callers that derive the role themselves; so do agents
+    whose id skip_roles returns True for (e.g. already analysed in an earlier
+    scan). only_files restricts the scan to those files (relative to
+    directory), for incremental rescans.
+
+    With git_rev, directory is a git repository (possibly bare) and the
+    files of that commit are streamed from its object database instead of
+    walking a checkout; file paths are then relative to the repository.
+    """
+    logger.info("Starting discovery in: %s%s", directory, f" at {git_rev}" if git_rev else "")
+    # One pass over the tree feeds both the system prompt and LangChain visitors
+    if git_rev:
+        scan = iter_scan_git(
+            directory, git_rev, cache=cache, prefilter=prefilter, walk_options=walk_options, stats=stats,
+            only_files=only_files,
+        )
+    else:
+        scan = iter_scan(
+            directory, workers=workers, cache=cache, prefilter=prefilter, walk_options=walk_options, stats=stats,
+            only_files=only_files,
+        )
+    limit = concurrency or llm_concurrency()
+    # Several requests per slot keep the pool busy while a slow call finishes
+    window = limit * (ROLE_BATCH_WINDOW if batch_roles else 4)
+    role_stats = stats if stats is not None else {}
+    seen: Set[str] = set()
+    pending: Dict[str, Dict[str, Any]] = {}
+    count = 0
+
+    def classify(batch: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        ids = [hashlib.sha256(c["prompt"].encode("utf-8")).hexdigest() for c in batch]
+        roles: List[Optional[str]] = [None if c["prompt"].strip() else "Unknown" for c in batch]
+        if assign_roles:
+            todo = [i for i, agent_id in enumerate(ids) if skip_roles is None or not skip_roles(agent_id)]
+            with bypass_llm_cache(not use_llm_cache):
+                assigned = _assign_roles(
+                    [batch[i]["prompt"] for i in todo], limit, batch_roles, role_confidence, role_stats, budget
+                )
+            for i, role in zip(todo, assigned):
+                roles[i] = role
+        for candidate, agent_id, role in zip(batch, ids, roles):
+            prompt = candidate["prompt"]
+            first = candidate["locations"][0]
             agent_entry = {
                 "id": agent_id,
-                "file": file_path,
+                "file": first["file"],
+                "locations": candidate["locations"],
                 "role": role,
                 "system_prompt": prompt,
-                "framework": "Langchain"
+                "framework": candidate["framework"]
             }
-            # Pass through any extracted tool names (strings only)
-            tools = data.get("tools") or []
-            if isinstance(tools, list) and any(isinstance(t, str) for t in tools):
-                agent_entry["__lc_tools__"] = [t for t in tools if isinstance(t, str)]
-            agents.append(agent_entry)
-            logger.info("Found LangChain agent in %s → id=%s role=%s", file_path, agent_id[:8], role)
-        except Exception as e:
-            logger.warning("Error processing LC agent in %s: %s", file_path, e)
-            continue
+            if candidate.get("tools"):
+                agent_entry["__lc_tools__"] = candidate["tools"]
+            logger.info(
+                "Found %s agent in %s:%s (%d occurrences) → id=%s role=%s",
+                candidate["framework"], first["file"], first["line"], len(candidate["locations"]), agent_id[:8], role,
+            )
+            yield agent_entry
+
+    for file_path, found in scan:
+        for key, candidate in _file_candidates(file_path, found):
+            if key in seen:
+                update = {
+                    "__update__": True,
+                    "id": hashlib.sha256(candidate["prompt"].encode("utf-8")).hexdigest(),
+                    "locations": candidate["locations"],
+                }
+                if candidate.get("tools"):
+                    update["__lc_tools__"] = candidate["tools"]
+                yield update
+            elif key in pending:
+                _merge_candidate(pending[key], candidate)
+            else:
+                pending[key] = candidate
+        if len(pending) >= window:
+            seen.update(pending)
+            batch, pending = list(pending.values()), {}
+            for agent_entry in classify(batch):
+                count += 1
+                yield agent_entry
+    if pending:
+        for agent_entry in classify(list(pending.values())):
+            count += 1
+            yield agent_entry
+
+    logger.info("Discovery complete. %d agents found", count)
+
 
-    logger.info("Discovery complete. %d agents found", len(agents))
-    return {"agents": agents}
+def discover_agents(
+    directory: str,
+    workers: int = 1,
+    cache: Optional[ExtractionCache] = None,
+    prefilter: str = "on",
+    walk_options: Optional[WalkOptions] = None,
+    concurrency: Optional[int] = None,
+    use_llm_cache: bool = True,
+    batch_roles: bool = True,
+    role_confidence: float = DEFAULT_ROLE_CONFIDENCE,
+    git_rev: Optional[str] = None,
+) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {}
+    agents: Dict[str, Dict[str, Any]] = {}
+    for entry in iter_discover_agents(
+        directory, workers=workers, cache=cache, prefilter=prefilter, walk_options=walk_options, stats=stats,
+        concurrency=concurrency, use_llm_cache=use_llm_cache, batch_roles=batch_roles,
+        role_confidence=role_confidence, git_rev=git_rev,
+    ):
+        if entry.get("__update__"):
+            merge_agent_update(agents[entry["id"]], entry)
+        else:
+            agents.setdefault(entry["id"], entry)
+    return {"agents": list(agents.values()), "stats": stats}
 
 # Alias for backward compatibility
 d = discover_agents
@@ -98,10 +308,57 @@ d = discover_agents
 def cli() -> None:
     parser = argparse.ArgumentParser(description="Discover agents by scanning system prompts")
     parser.add_argument("directory", nargs="?", default=".", help="Directory to scan")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Worker processes for file parsing (0 = one per CPU, 1 = serial)",
+    )
+    parser.add_argument(
+        "--cache", nargs="?", const=DEFAULT_CACHE_PATH, default=None, metavar="PATH",
+        help="Reuse extraction results of unchanged files from an on-disk cache",
+    )
+    parser.add_argument(
+        "--prefilter", choices=PREFILTER_MODES, default="on",
+        help="Skip files without trigger tokens before parsing ('strict' verifies every skip)",
+    )
+    parser.add_argument(
+        "--ignore-dir", action="append", default=[], metavar="NAME",
+        help="Additional directory name to prune (repeatable)",
+    )
+    parser.add_argument(
+        "--max-file-size", type=int, default=DEFAULT_MAX_FILE_SIZE, metavar="BYTES",
+        help="Skip files larger than this (0 = no limit)",
+    )
+    parser.add_argument("--no-gitignore", action="store_true", help="Do not honour .gitignore files")
+    parser.add_argument(
+        "--git-rev", default=None, metavar="REV",
+        help="Treat directory as a git repository (bare is fine) and scan this commit's files without a checkout",
+    )
+    parser.add_argument(
+        "--llm-concurrency", type=int, default=None, metavar="N",
+        help="Maximum concurrent LLM requests (default: LLM_CONCURRENCY env or 8)",
+    )
+    parser.add_argument("--no-llm-cache", action="store_true", help="Bypass the LLM response cache")
+    parser.add_argument(
+        "--no-role-batching", action="store_true", help="Summarize each prompt's role in its own LLM request",
+    )
+    parser.add_argument(
+        "--role-confidence", type=float, default=DEFAULT_ROLE_CONFIDENCE, metavar="X",
+        help="Use local role guesses at or above this confidence without the LLM (0 = never call it, >1 = always)",
+    )
     args = parser.parse_args()
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    cache = ExtractionCache(EXTRACTOR_VERSION, path=args.cache) if args.cache else None
+    walk_options = WalkOptions(
+        ignored_dirs=DEFAULT_IGNORED_DIRS | set(args.ignore_dir),
+        max_file_size=args.max_file_size or None,
+        use_gitignore=not args.no_gitignore,
+    )
     try:
-        result = discover_agents(args.directory)
+        result = discover_agents(
+            args.directory, workers=args.workers, cache=cache, prefilter=args.prefilter, walk_options=walk_options,
+            concurrency=args.llm_concurrency, use_llm_cache=not args.no_llm_cache,
+            batch_roles=not args.no_role_batching, role_confidence=args.role_confidence, git_rev=args.git_rev,
+        )
         print(json.dumps(result, indent=2))
     except MissingApiKeyError:
         # Non-zero exit via exception propagation avoided; print nothing besides logs
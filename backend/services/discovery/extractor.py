@@ -1,33 +1,55 @@
 from __future__ import annotations
 
 import ast
+import hashlib
 import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice, repeat
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple, Union
-import ast
+from typing import Any, Callable, Collection, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .cache import ExtractionCache
+from .git_source import iter_git_files
+from .resolver import ConstantResolver
+from .walker import WalkOptions, new_walk_stats, walk_code_files
 
 
 logger = logging.getLogger(__name__)
 
+# Below this many files a process pool costs more to start than it saves.
+PARALLEL_MIN_FILES = 200
+DEFAULT_CHUNK_SIZE = 64
+# Bump whenever visitor output changes so cached extraction results are not reused
+EXTRACTOR_VERSION = "3"
+# Files whose constant resolution takes longer than this are logged as warnings
+SLOW_RESOLVE_SECONDS = 1.0
+
 
 class SystemPromptVisitor(ast.NodeVisitor):
     def __init__(self) -> None:
-        self.prompts: List[Tuple[str, str]] = []  # (source_hint, content)
+        self.prompts: List[Tuple[str, str, int, int]] = []  # (source_hint, content, line, col)
         self.env_stack: List[Dict[str, Optional[str]]] = []
+        self.resolver = ConstantResolver(self._lookup_name)
+        # ids of message lists already collected via messages=[...], so visit_List skips them
+        self._collected_lists: set[int] = set()
 
     def visit_Module(self, node: ast.Module) -> None:  # type: ignore[override]
-        self.env_stack.append(self._collect_assignments(node.body))
+        self._push_env(self._collect_assignments(node.body))
         self.generic_visit(node)
-        self.env_stack.pop()
+        self._pop_env()
 
     def visit_FunctionDef(self, node: ast.FunctionDef) -> None:  # type: ignore[override]
         # Parameters may shadow names; treat as unknown (None)
         fn_env = self._collect_assignments(node.body)
         for arg in node.args.args:
             fn_env[arg.arg] = None
-        self.env_stack.append(fn_env)
+        self._push_env(fn_env)
         self.generic_visit(node)
-        self.env_stack.pop()
+        self._pop_env()
 
     def visit_Assign(self, node: ast.Assign) -> None:  # type: ignore[override]
         # Keep collecting simple constant assignments as we go
@@ -35,6 +57,7 @@ class SystemPromptVisitor(ast.NodeVisitor):
         for target in node.targets:
             if isinstance(target, ast.Name):
                 self._current_env()[target.id] = values
+                self.resolver.invalidate()
         self.generic_visit(node)
 
     def visit_Call(self, node: ast.Call) -> None:  # type: ignore[override]
@@ -44,21 +67,24 @@ class SystemPromptVisitor(ast.NodeVisitor):
         for kw in node.keywords:
             if kw.arg == "messages":
                 msgs = self._collect_messages(kw.value)
-                for src, content in msgs:
+                for src, content, line, col in msgs:
                     if content:
-                        self.prompts.append((src, content))
+                        self.prompts.append((src, content, line, col))
+                if isinstance(kw.value, ast.List):
+                    self._collected_lists.add(id(kw.value))
         self.generic_visit(node)
 
     def visit_List(self, node: ast.List) -> None:  # type: ignore[override]
-        # Top-level lists of messages
-        msgs = self._collect_messages(node)
-        for src, content in msgs:
-            if content:
-                self.prompts.append((src, content))
+        # Top-level lists of messages (unless already collected as messages=[...])
+        if id(node) not in self._collected_lists:
+            msgs = self._collect_messages(node)
+            for src, content, line, col in msgs:
+                if content:
+                    self.prompts.append((src, content, line, col))
         self.generic_visit(node)
 
-    def _collect_messages(self, node: ast.AST) -> List[Tuple[str, Optional[str]]]:
-        results: List[Tuple[str, Optional[str]]] = []
+    def _collect_messages(self, node: ast.AST) -> List[Tuple[str, Optional[str], int, int]]:
+        results: List[Tuple[str, Optional[str], int, int]] = []
         if isinstance(node, (ast.List, ast.Tuple)):
             for elt in node.elts:
                 res = self._extract_role_content_from_node(elt)
@@ -70,7 +96,7 @@ class SystemPromptVisitor(ast.NodeVisitor):
                 results.append(res)
         return results
 
-    def _extract_role_content_from_node(self, node: ast.AST) -> Optional[Tuple[str, Optional[str]]]:
+    def _extract_role_content_from_node(self, node: ast.AST) -> Optional[Tuple[str, Optional[str], int, int]]:
         # Expect a dict with keys 'role' and 'content'
         if isinstance(node, ast.Dict):
             keys = [self._resolve_node_to_str(k) for k in node.keys]
@@ -84,7 +110,7 @@ class SystemPromptVisitor(ast.NodeVisitor):
             content = items.get("content")
             if role == "system":
                 # content can be None if unresolved
-                return ("dict", content)
+                return ("dict", content, node.lineno, node.col_offset)
         elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "dict":
             items: Dict[str, Optional[str]] = {}
             for kw in node.keywords:
@@ -93,7 +119,7 @@ class SystemPromptVisitor(ast.NodeVisitor):
             role = items.get("role")
             content = items.get("content")
             if role == "system":
-                return ("dict_call", content)
+                return ("dict_call", content, node.lineno, node.col_offset)
         return None
 
     def _collect_assignments(self, body: List[ast.stmt]) -> Dict[str, Optional[str]]:
@@ -112,44 +138,7 @@ class SystemPromptVisitor(ast.NodeVisitor):
         return env
 
     def _resolve_node_to_str(self, node: Optional[ast.AST]) -> Optional[str]:
-        if node is None:
-            return None
-        if isinstance(node, ast.Constant) and isinstance(node.value, str):
-            return node.value
-        if isinstance(node, ast.JoinedStr):  # f-string: take literal chunks, placeholders as {...}
-            parts: List[str] = []
-            for v in node.values:
-                if isinstance(v, ast.Constant) and isinstance(v.value, str):
-                    parts.append(v.value)
-                elif isinstance(v, ast.FormattedValue):
-                    parts.append("{...}")
-            res = "".join(parts).strip()
-            return res if res else None
-        if isinstance(node, ast.Name):
-            return self._lookup_name(node.id)
-        if isinstance(node, ast.Call):
-            # Handle simple method calls on literals like "...".strip()
-            if isinstance(node.func, ast.Attribute):
-                base_str = self._resolve_node_to_str(node.func.value)
-                if base_str is None:
-                    return None
-                attr = node.func.attr
-                if attr == "strip" and not node.args and not node.keywords:
-                    return base_str.strip()
-                # Other methods (e.g., format) are not safely resolvable; return base as best-effort
-                if attr == "format":
-                    return base_str
-            # str("...") wrapper
-            if isinstance(node.func, ast.Name) and node.func.id == "str" and len(node.args) == 1:
-                return self._resolve_node_to_str(node.args[0])
-        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
-            left = self._resolve_node_to_str(node.left)
-            right = self._resolve_node_to_str(node.right)
-            if left is None or right is None:
-                return None
-            return left + right
-        # Other node types (calls, subscripts, attribute access) are unknown
-        return None
+        return self.resolver.resolve(node)
 
     def _lookup_name(self, name: str) -> Optional[str]:
         for env in reversed(self.env_stack):
@@ -162,39 +151,14 @@ class SystemPromptVisitor(ast.NodeVisitor):
             self.env_stack.append({})
         return self.env_stack[-1]
 
+    def _push_env(self, env: Dict[str, Optional[str]]) -> None:
+        self.env_stack.append(env)
+        # Memoized resolutions depend on the bindings in scope
+        self.resolver.invalidate()
 
-def _iter_code_files(root: Path) -> Iterable[Path]:
-    exts = {".py"}
-    for path in root.rglob("*"):
-        if path.is_file() and path.suffix.lower() in exts:
-            yield path
-
-
-def extract_system_prompts(directory: str) -> List[Tuple[str, str]]:
-    logger.info("Scanning for system prompts in: %s", directory)
-    results: List[Tuple[str, str]] = []
-    for file_path in _iter_code_files(Path(directory)):
-        try:
-            text = file_path.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            continue
-        try:
-            tree = ast.parse(text)
-        except Exception:
-            logger.debug("Skipping unparsable file: %s", file_path)
-            continue
-        visitor = SystemPromptVisitor()
-        visitor.visit(tree)
-        for _, content in visitor.prompts:
-            if content is not None and content.strip():
-                results.append((str(file_path), content))
-            else:
-                # keep empty/unknown to signal variable-dependent prompts
-                results.append((str(file_path), ""))
-        if visitor.prompts:
-            logger.debug("%s: found %d system prompt candidates", file_path, len(visitor.prompts))
-    logger.info("System prompt scan complete. %d prompts found", len(results))
-    return results
+    def _pop_env(self) -> None:
+        self.env_stack.pop()
+        self.resolver.invalidate()
 
 
 class LangChainAgentVisitor(ast.NodeVisitor):
@@ -203,6 +167,7 @@ class LangChainAgentVisitor(ast.NodeVisitor):
         self.imported_create_react_agent_names: set[str] = set()
         self.assign_env: Dict[str, ast.AST] = {}
         self.found: List[Dict[str, Optional[str]]] = []
+        self.resolver = ConstantResolver(self.assign_env.get)
 
     def visit_ImportFrom(self, node: ast.ImportFrom) -> None:  # type: ignore[override]
         if node.module and node.module.startswith("langchain.agents"):
@@ -216,30 +181,11 @@ class LangChainAgentVisitor(ast.NodeVisitor):
         for target in node.targets:
             if isinstance(target, ast.Name):
                 self.assign_env[target.id] = node.value
+                self.resolver.invalidate()
         self.generic_visit(node)
 
     def _resolve_str(self, node: Optional[ast.AST]) -> Optional[str]:
-        if node is None:
-            return None
-        if isinstance(node, ast.Constant) and isinstance(node.value, str):
-            return node.value
-        if isinstance(node, ast.Name) and node.id in self.assign_env:
-            return self._resolve_str(self.assign_env[node.id])
-        if isinstance(node, ast.JoinedStr):
-            parts: List[str] = []
-            for v in node.values:
-                if isinstance(v, ast.Constant) and isinstance(v.value, str):
-                    parts.append(v.value)
-                else:
-                    parts.append("{...}")
-            res = "".join(parts).strip()
-            return res if res else None
-        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
-            left = self._resolve_str(node.left)
-            right = self._resolve_str(node.right)
-            if left and right:
-                return left + right
-        return None
+        return self.resolver.resolve(node)
 
     def _resolve_tools(self, node: Optional[ast.AST]) -> List[str]:
         names: List[str] = []
@@ -267,7 +213,9 @@ class LangChainAgentVisitor(ast.NodeVisitor):
             name = node.func.attr
         if name and name in self.imported_create_react_agent_names:
             # extract keywords: prompt, tools (common usage)
-            data: Dict[str, Optional[str] | List[str]] = {"framework": "Langchain", "prompt": None, "tools": []}
+            data: Dict[str, Optional[str] | List[str] | int] = {
+                "framework": "Langchain", "prompt": None, "tools": [], "line": node.lineno, "col": node.col_offset,
+            }
             for kw in node.keywords:
                 if kw.arg == "prompt":
                     data["prompt"] = self._resolve_str(kw.value)
@@ -277,19 +225,366 @@ class LangChainAgentVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
 
-def extract_langchain_agents(directory: str) -> List[Tuple[str, Dict[str, Optional[str]]]]:
-    """Scan directory to find LangChain create_react_agent calls and extract prompt."""
-    results: List[Tuple[str, Dict[str, Optional[str]]]] = []
-    for file_path in _iter_code_files(Path(directory)):
+def _collect_system_prompts(tree: ast.AST, timings: Dict[str, float]) -> List[Dict[str, Any]]:
+    visitor = SystemPromptVisitor()
+    visitor.visit(tree)
+    timings["resolve_seconds"] += visitor.resolver.seconds
+    return [
+        # keep empty/unknown as "" to signal variable-dependent prompts
+        {"prompt": content if content is not None and content.strip() else "", "line": line, "col": col}
+        for _, content, line, col in visitor.prompts
+    ]
+
+
+def _collect_langchain_agents(tree: ast.AST, timings: Dict[str, float]) -> List[Dict[str, Optional[str]]]:
+    visitor = LangChainAgentVisitor()
+    visitor.visit(tree)
+    timings["resolve_seconds"] += visitor.resolver.seconds
+    return visitor.found
+
+
+# Visitors dispatched by the scan engine, keyed by the name their results are
+# reported under. Each one receives a parsed module plus a per-file timings dict
+# (resolve_seconds) and returns its candidates, which must be JSON-serializable
+# so they can be stored in the extraction cache.
+VISITORS: Dict[str, Callable[[ast.AST, Dict[str, float]], List[Any]]] = {
+    "system_prompts": _collect_system_prompts,
+    "langchain_agents": _collect_langchain_agents,
+}
+
+
+# Byte tokens that must all occur in a file for a visitor to possibly yield a
+# candidate. Both visitors only resolve strings defined in the same file, so a
+# system prompt needs the literals "role" and "system", and a LangChain agent
+# needs the create_react_agent import. Visitors without an entry are never skipped.
+VISITOR_TRIGGERS: Dict[str, Tuple[bytes, ...]] = {
+    "system_prompts": (b"role", b"system"),
+    "langchain_agents": (b"create_react_agent",),
+}
+PREFILTER_MODES = ("off", "on", "strict")
+_TRIGGER_RE = re.compile(
+    b"|".join(re.escape(t) for t in sorted({t for ts in VISITOR_TRIGGERS.values() for t in ts}, key=len, reverse=True))
+)
+
+
+def _may_have_candidates(data: bytes, visitors: Sequence[str]) -> bool:
+    """Cheap lexical check run on raw bytes before ast.parse."""
+    if any(name not in VISITOR_TRIGGERS for name in visitors):
+        return True
+    needed = {t for name in visitors for t in VISITOR_TRIGGERS[name]}
+    seen: set[bytes] = set()
+    for match in _TRIGGER_RE.finditer(data):
+        seen.add(match.group(0))
+        if any(all(t in seen for t in VISITOR_TRIGGERS[name]) for name in visitors):
+            return True
+        if seen >= needed:
+            break
+    return False
+
+
+def _new_scan_stats() -> Dict[str, Any]:
+    return {
+        "files_seen": 0, "files_read": 0, "files_parsed": 0, "parse_errors": 0, **new_walk_stats(),
+        "prefilter_skipped": 0, "prefilter_mismatches": 0,
+        "cache_hits": 0, "cache_misses": 0, "parse_seconds": 0.0, "parse_seconds_saved": 0.0,
+        "resolve_seconds": 0.0, "slowest_resolve_seconds": 0.0, "slowest_resolve_file": None,
+    }
+
+
+@dataclass
+class ScanResult:
+    """Per-file results of one pass over a directory, merged across visitors."""
+    files: Dict[str, Dict[str, List[Any]]] = field(default_factory=dict)
+    stats: Dict[str, Any] = field(default_factory=_new_scan_stats)
+
+    def items(self, visitor: str) -> List[Tuple[str, Any]]:
+        """Flatten one visitor's results to (file_path, candidate) pairs in scan order."""
+        return [(path, item) for path, found in self.files.items() for item in found.get(visitor, [])]
+
+
+@dataclass
+class _ChunkResult:
+    found: List[Tuple[str, Optional[Dict[str, List[Any]]]]]
+    stats: Dict[str, Any]
+    # (content_hash, parse_seconds) for cache hits, (content_hash, results, parse_seconds) for fresh parses
+    cache_hits: List[Tuple[str, float]] = field(default_factory=list)
+    cache_entries: List[Tuple[str, Optional[Dict[str, List[Any]]], float]] = field(default_factory=list)
+
+
+def _parse_and_visit(text: str, visitors: Sequence[str], stats: Dict[str, Any], label: str) -> Optional[Dict[str, List[Any]]]:
+    """Parse source once, then run every requested visitor on the tree."""
+    try:
+        tree = ast.parse(text)
+    except Exception:
+        stats["parse_errors"] += 1
+        logger.debug("Skipping unparsable file: %s", label)
+        return None
+    stats["files_parsed"] += 1
+    timings = {"resolve_seconds": 0.0}
+    try:
+        found = {name: VISITORS[name](tree, timings) for name in visitors}
+    except (RecursionError, MemoryError):
+        # Pathologically nested expressions (e.g. generated concatenation chains) or runaway constants
+        stats["parse_errors"] += 1
+        logger.warning("Skipping file too deeply nested or too large to visit: %s", label)
+        return None
+    seconds = timings["resolve_seconds"]
+    stats["resolve_seconds"] += seconds
+    if seconds > stats["slowest_resolve_seconds"]:
+        stats["slowest_resolve_seconds"] = seconds
+        stats["slowest_resolve_file"] = label
+    if seconds > SLOW_RESOLVE_SECONDS:
+        logger.warning("Constant resolution took %.2fs in %s", seconds, label)
+    else:
+        logger.debug("Constant resolution took %.4fs in %s", seconds, label)
+    return found
+
+
+def _scan_chunk(
+    paths: List[str], visitors: List[str], cache: Optional[ExtractionCache] = None, prefilter: str = "on"
+) -> _ChunkResult:
+    """Work unit for the scan engine: read, prefilter, hash, parse and visit a chunk of files.
+
+    Cache lookups happen here (so pool workers skip parsing on hits), but writes
+    are returned to the caller, which owns the cache.
+    """
+    files: List[Tuple[str, bytes]] = []
+    for path in paths:
         try:
-            text = file_path.read_text(encoding="utf-8", errors="ignore")
-            tree = ast.parse(text)
+            files.append((path, Path(path).read_bytes()))
         except Exception:
             continue
-        visitor = LangChainAgentVisitor()
-        visitor.visit(tree)
-        for item in visitor.found:
-            results.append((str(file_path), item))
+    return _scan_contents(files, visitors, cache, prefilter)
+
+
+def _scan_contents(
+    files: List[Tuple[str, bytes]], visitors: List[str], cache: Optional[ExtractionCache] = None, prefilter: str = "on"
+) -> _ChunkResult:
+    """Prefilter, hash, parse and visit already-read (path, content) pairs."""
+    chunk = _ChunkResult(found=[], stats=_new_scan_stats())
+    stats = chunk.stats
+    contents: List[Tuple[str, bytes, Optional[str]]] = []
+    for path, data in files:
+        stats["files_read"] += 1
+        if prefilter != "off" and not _may_have_candidates(data, visitors):
+            stats["prefilter_skipped"] += 1
+            found: Optional[Dict[str, List[Any]]] = None
+            if prefilter == "strict":
+                # Verify the skip: a full parse must not find anything either
+                found = _parse_and_visit(data.decode("utf-8", errors="ignore"), visitors, stats, path)
+                if found and any(found.values()):
+                    stats["prefilter_mismatches"] += 1
+                    logger.warning("Prefilter would have skipped candidates in %s", path)
+            chunk.found.append((path, found))
+            continue
+        contents.append((path, data, hashlib.sha256(data).hexdigest() if cache else None))
+    cached = cache.lookup(h for _, _, h in contents if h) if cache else {}
+
+    for path, data, content_hash in contents:
+        hit = cached.get(content_hash) if content_hash else None
+        if hit is not None and (hit[0] is None or all(name in hit[0] for name in visitors)):
+            results, parse_seconds = hit
+            stats["cache_hits"] += 1
+            stats["parse_seconds_saved"] += parse_seconds
+            chunk.cache_hits.append((content_hash, parse_seconds))
+            if results is None:
+                stats["parse_errors"] += 1
+                found = None
+            else:
+                found = {name: results[name] for name in visitors}
+        else:
+            started = time.perf_counter()
+            found = _parse_and_visit(data.decode("utf-8", errors="ignore"), visitors, stats, path)
+            elapsed = time.perf_counter() - started
+            stats["parse_seconds"] += elapsed
+            if content_hash:
+                stats["cache_misses"] += 1
+                # Keep results of visitors that were cached but not requested this time
+                merged = found if hit is None or hit[0] is None or found is None else {**hit[0], **found}
+                chunk.cache_entries.append((content_hash, merged, elapsed))
+        chunk.found.append((path, found))
+    return chunk
+
+
+def _merge_stats(stats: Dict[str, Any], chunk_stats: Dict[str, Any]) -> None:
+    for key, value in chunk_stats.items():
+        if key in ("files_seen", "slowest_resolve_file"):
+            continue
+        if key == "slowest_resolve_seconds":
+            if value > stats[key]:
+                stats[key] = value
+                stats["slowest_resolve_file"] = chunk_stats["slowest_resolve_file"]
+        else:
+            stats[key] += value
+
+
+def _scan_parallel(
+    paths: List[str], visitors: List[str], workers: int, chunk_size: int,
+    cache: Optional[ExtractionCache], prefilter: str,
+) -> Iterable[_ChunkResult]:
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        # map() yields in submission order, so results stay deterministic
+        yield from pool.map(_scan_chunk, chunks, repeat(visitors), repeat(cache), repeat(prefilter))
+
+
+def iter_scan(
+    directory: str,
+    visitors: Optional[Sequence[str]] = None,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: Optional[ExtractionCache] = None,
+    prefilter: str = "on",
+    walk_options: Optional[WalkOptions] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    only_files: Optional[Collection[str]] = None,
+) -> Iterator[Tuple[str, Dict[str, List[Any]]]]:
+    """Scan directory once, yielding (file_path, per-visitor results) for files with candidates.
+
+    Every file is read and parsed at most once and the tree is dispatched to all
+    requested visitors. Results are yielded chunk by chunk as soon as they are
+    ready, and counters are accumulated into stats while the scan runs.
+
+    With workers > 1 (0 means one per CPU) files are read, parsed and visited in
+    a process pool in chunks of chunk_size. Trees smaller than PARALLEL_MIN_FILES
+    are always scanned serially. When a cache is given, files whose content hash
+    is already known for EXTRACTOR_VERSION are not parsed at all.
+
+    prefilter="on" skips files whose raw bytes lack the VISITOR_TRIGGERS tokens;
+    "strict" still parses skipped files and counts any candidates the skip would
+    have lost as prefilter_mismatches (keeping them in the result).
+
+    walk_options controls directory pruning (deny-list, .gitignore, size cap);
+    what was pruned is reported as dirs_pruned/files_pruned/bytes_pruned.
+
+    only_files (paths relative to directory, "/"-separated) restricts the scan
+    to those of the walked files, e.g. the ones changed since a previous scan.
+    """
+    names = _check_scan_options(visitors, cache, prefilter)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    chunk_size = max(1, chunk_size)
+    stats = _init_scan_stats(stats)
+    paths = list(walk_code_files(directory, walk_options, stats))
+    if only_files is not None:
+        wanted = set(only_files)
+        paths = [p for p in paths if os.path.relpath(p, directory).replace(os.sep, "/") in wanted]
+    stats["files_seen"] = len(paths)
+
+    chunks: Iterable[_ChunkResult]
+    if workers > 1 and len(paths) >= PARALLEL_MIN_FILES:
+        logger.info("Scanning %d files with %d worker processes", len(paths), workers)
+        chunks = _scan_parallel(paths, names, workers, chunk_size, cache, prefilter)
+    else:
+        chunks = (
+            _scan_chunk(paths[i:i + chunk_size], names, cache, prefilter)
+            for i in range(0, len(paths), chunk_size)
+        )
+
+    yield from _drain_chunks(chunks, stats, cache, directory)
+
+
+def iter_scan_git(
+    repo: str,
+    rev: str = "HEAD",
+    visitors: Optional[Sequence[str]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: Optional[ExtractionCache] = None,
+    prefilter: str = "on",
+    walk_options: Optional[WalkOptions] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    only_files: Optional[Collection[str]] = None,
+) -> Iterator[Tuple[str, Dict[str, List[Any]]]]:
+    """Like iter_scan, for the code files of commit rev read straight from repo's object database.
+
+    repo may be a bare repository: nothing is checked out or written to
+    disk. Blobs stream out of one `git cat-file --batch` process into the
+    parser, so parsing starts while later objects are still being read.
+    Paths are relative to the repository root. Files are parsed serially.
+    """
+    names = _check_scan_options(visitors, cache, prefilter)
+    chunk_size = max(1, chunk_size)
+    stats = _init_scan_stats(stats)
+    files = iter_git_files(repo, rev, walk_options, stats, only_files)
+    chunks = (
+        _scan_contents(batch, names, cache, prefilter) for batch in iter(lambda: list(islice(files, chunk_size)), [])
+    )
+    yield from _drain_chunks(chunks, stats, cache, f"{repo}@{rev}")
+
+
+def _check_scan_options(
+    visitors: Optional[Sequence[str]], cache: Optional[ExtractionCache], prefilter: str
+) -> List[str]:
+    names = list(visitors) if visitors is not None else list(VISITORS)
+    unknown = [n for n in names if n not in VISITORS]
+    if unknown:
+        raise ValueError(f"Unknown visitors: {', '.join(unknown)}")
+    if prefilter not in PREFILTER_MODES:
+        raise ValueError(f"Invalid prefilter mode: {prefilter}")
+    if cache is not None and cache.version != EXTRACTOR_VERSION:
+        raise ValueError(f"Cache version {cache.version!r} does not match extractor version {EXTRACTOR_VERSION!r}")
+    return names
+
+
+def _init_scan_stats(stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if stats is None:
+        return _new_scan_stats()
+    for key, value in _new_scan_stats().items():
+        stats.setdefault(key, value)
+    return stats
+
+
+def _drain_chunks(
+    chunks: Iterable[_ChunkResult], stats: Dict[str, Any], cache: Optional[ExtractionCache], label: str
+) -> Iterator[Tuple[str, Dict[str, List[Any]]]]:
+    """Merge chunk stats and cache writes, yielding the files with candidates as chunks complete."""
+    for chunk in chunks:
+        _merge_stats(stats, chunk.stats)
+        if cache is not None:
+            cache.record(chunk.cache_hits, chunk.cache_entries)
+        for path, found in chunk.found:
+            if found and any(found.values()):
+                logger.debug("%s: %s", path, {n: len(v) for n, v in found.items()})
+                yield path, found
+    if cache is not None:
+        cache.evict()
+    for key in ("parse_seconds", "parse_seconds_saved", "resolve_seconds", "slowest_resolve_seconds"):
+        stats[key] = round(stats[key], 4)
+    read = stats["files_read"]
+    stats["prefilter_skip_ratio"] = round(stats["prefilter_skipped"] / read, 4) if read else 0.0
+    logger.info(
+        "Walk of %s pruned %d directories and %d files (%d bytes)",
+        label, stats["dirs_pruned"], stats["files_pruned"], stats["bytes_pruned"],
+    )
+    logger.info(
+        "Scan of %s complete: %d files read, %d parsed, %d unparsable, %.0f%% skipped by prefilter, "
+        "%d cache hits (%.2fs parse time saved), %.2fs constant resolution",
+        label, read, stats["files_parsed"], stats["parse_errors"],
+        100 * stats["prefilter_skip_ratio"], stats["cache_hits"], stats["parse_seconds_saved"],
+        stats["resolve_seconds"],
+    )
+    if stats["prefilter_mismatches"]:
+        logger.warning("Prefilter mismatches in %d files", stats["prefilter_mismatches"])
+
+
+def scan_directory(directory: str, visitors: Optional[Sequence[str]] = None, **options: Any) -> ScanResult:
+    """Collect iter_scan() into a ScanResult; accepts the same keyword options."""
+    result = ScanResult()
+    for path, found in iter_scan(directory, visitors, stats=result.stats, **options):
+        result.files[path] = found
+    return result
+
+
+def extract_system_prompts(directory: str) -> List[Tuple[str, str]]:
+    logger.info("Scanning for system prompts in: %s", directory)
+    results = [
+        (path, item["prompt"])
+        for path, item in scan_directory(directory, ["system_prompts"]).items("system_prompts")
+    ]
+    logger.info("System prompt scan complete. %d prompts found", len(results))
     return results
 
- 
\ No newline at end of file
+
+def extract_langchain_agents(directory: str) -> List[Tuple[str, Dict[str, Optional[str]]]]:
+    """Scan directory to find LangChain create_react_agent calls and extract prompt."""
+    return scan_directory(directory, ["langchain_agents"]).items("langchain_agents")
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import logging
+import os
+import posixpath
+import subprocess
+import threading
+from typing import IO, Collection, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .walker import GitIgnore, WalkOptions, _is_ignored, new_walk_stats
+
+
+logger = logging.getLogger(__name__)
+
+GIT_TIMEOUT = 300
+_SYMLINK_MODE = "120000"
+
+
+def run_git(
+    args: List[str], cwd: Optional[str] = None, timeout: float = GIT_TIMEOUT, stdin: Optional[str] = None
+) -> str:
+    """Stdout of a git command; a non-zero exit raises RuntimeError with git's message."""
+    result = subprocess.run(
+        ["git", *args], cwd=cwd, input=stdin, capture_output=True, text=True, timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+def _batch_check(repo: str, oids: Sequence[str], lazy_fetch: bool = True) -> Dict[str, Optional[int]]:
+    """Size of each object (None if missing) from one `git cat-file --batch-check`, without reading contents.
+
+    With lazy_fetch=False a partial clone reports what it holds locally
+    instead of fetching. Older git aborts at the first missing object; that
+    object and every one not answered yet are then reported missing.
+    """
+    env = None if lazy_fetch else {**os.environ, "GIT_NO_LAZY_FETCH": "1"}
+    result = subprocess.run(
+        ["git", "cat-file", "--batch-check"], cwd=repo, input="\n".join(oids) + "\n",
+        capture_output=True, text=True, timeout=GIT_TIMEOUT, env=env,
+    )
+    sizes: Dict[str, Optional[int]] = {}
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if len(fields) >= 3 and fields[1] != "missing":
+            sizes[fields[0]] = int(fields[2])
+        elif fields:
+            sizes[fields[0]] = None
+    if result.returncode != 0 and lazy_fetch:
+        raise RuntimeError(result.stderr.strip() or "git cat-file --batch-check failed")
+    for oid in oids:
+        sizes.setdefault(oid, None)
+    return sizes
+
+
+class BlobReader:
+    """One long-lived `git cat-file --batch` process streaming blob contents out of a repository.
+
+    Object ids are written from a background thread while contents are read,
+    so git keeps producing blobs while the caller is still parsing earlier
+    ones.
+    """
+
+    def __init__(self, repo: str):
+        self._proc = subprocess.Popen(
+            ["git", "cat-file", "--batch"], cwd=repo, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+    def read(self, oids: Sequence[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """Yield (oid, content) in request order; content is None for objects the repository lacks."""
+        stdin: IO[bytes] = self._proc.stdin  # type: ignore[assignment]
+        stdout: IO[bytes] = self._proc.stdout  # type: ignore[assignment]
+
+        def feed() -> None:
+            try:
+                for oid in oids:
+                    stdin.write(oid.encode("ascii") + b"\n")
+                stdin.flush()
+            except (OSError, ValueError):
+                pass
+
+        feeder = threading.Thread(target=feed, name="git-cat-file-feeder", daemon=True)
+        feeder.start()
+        answered = 0
+        try:
+            for oid in oids:
+                header = stdout.readline()
+                if not header:
+                    raise RuntimeError("git cat-file exited early")
+                fields = header.split()
+                if len(fields) < 3 or fields[1] == b"missing":
+                    answered += 1
+                    yield oid, None
+                    continue
+                size = int(fields[2])
+                data = stdout.read(size)
+                stdout.read(1)  # newline after the content
+                answered += 1
+                yield oid, data
+        finally:
+            if answered < len(oids):
+                # Stopped early: git may be blocked writing answers nobody reads, and the feeder blocked
+                # writing ids git no longer reads. Killing git unblocks both; the reader is unusable after.
+                self._proc.kill()
+            feeder.join()
+
+    def close(self) -> None:
+        if self._proc.stdin:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+        try:
+            self._proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+
+    def __enter__(self) -> "BlobReader":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def _list_tree(repo: str, rev: str) -> List[Tuple[str, str, str]]:
+    """(mode, oid, path) of every blob in rev's tree; listing does not fetch blobs of partial clones."""
+    entries = []
+    for record in run_git(["ls-tree", "-r", "-z", "--full-tree", rev], repo).split("\0"):
+        if not record:
+            continue
+        meta, path = record.split("\t", 1)
+        mode, kind, oid = meta.split()
+        if kind == "blob":
+            entries.append((mode, oid, path))
+    return entries
+
+
+def _promisor_remote(repo: str) -> Optional[str]:
+    # Older clones name it in extensions.partialClone; newer ones only mark the remote remote.<name>.promisor
+    config = dict(
+        line.split("=", 1) for line in run_git(["config", "--local", "--list"], repo).splitlines() if "=" in line
+    )
+    if config.get("extensions.partialclone"):
+        return config["extensions.partialclone"]
+    for key, value in config.items():
+        if key.startswith("remote.") and key.endswith(".promisor") and value == "true":
+            return key[len("remote."):-len(".promisor")]
+    return None
+
+
+def prefetch_blobs(repo: str, oids: Collection[str]) -> int:
+    """Fetch the blobs a partial clone lacks in one round trip, instead of one lazy fetch per object.
+
+    Returns the number of blobs requested; 0 for repositories that are not
+    partial clones. With git older than 2.45 some present blobs may be
+    requested again (see _batch_check).
+    """
+    remote = _promisor_remote(repo)
+    if not remote or not oids:
+        return 0
+    sizes = _batch_check(repo, sorted(set(oids)), lazy_fetch=False)
+    missing = [oid for oid, size in sizes.items() if size is None]
+    if missing:
+        run_git(
+            [
+                "-c", "fetch.negotiationAlgorithm=noop", "fetch", remote, "--no-tags", "--no-write-fetch-head",
+                "--recurse-submodules=no", "--filter=blob:none", "--stdin",
+            ],
+            repo,
+            stdin="\n".join(missing) + "\n",
+        )
+    return len(missing)
+
+
+def iter_git_files(
+    repo: str,
+    rev: str = "HEAD",
+    options: Optional[WalkOptions] = None,
+    stats: Optional[Dict[str, int]] = None,
+    only_files: Optional[Collection[str]] = None,
+) -> Iterator[Tuple[str, bytes]]:
+    """Yield (path, content) for the code files of a commit, read from the object database without a checkout.
+
+    repo may be bare. The same files are selected as walk_code_files would
+    visit in a checkout of rev (deny-listed directories, .gitignore files,
+    extensions, size cap); paths are relative to the repository root. In a
+    partial clone the .gitignore blobs are fetched in one batch first, then
+    the blobs of the selected files in another; files dropped by the
+    .gitignore files or the size cap are not fetched, except oversized blobs
+    the clone lacks (their size is unknown until fetched). Counters are
+    accumulated into stats, including files_seen.
+    """
+    options = options or WalkOptions()
+    stats = stats if stats is not None else new_walk_stats()
+    for key, value in new_walk_stats().items():
+        stats.setdefault(key, value)
+    entries = _list_tree(repo, rev)
+
+    def denied(path: str) -> bool:
+        return any(d in options.ignored_dirs for d in path.split("/")[:-1])
+
+    ignore_files = {
+        posixpath.dirname(path): oid for mode, oid, path in entries
+        if options.use_gitignore and posixpath.basename(path) == ".gitignore" and not denied(path)
+    }
+    code_files = [
+        (path, oid) for mode, oid, path in entries
+        if mode != _SYMLINK_MODE and path.lower().endswith(options.extensions)
+        and (only_files is None or path in only_files)
+    ]
+
+    # Only the .gitignore files are fetched before selecting; the code files after, and only those selected
+    prefetch_blobs(repo, list(ignore_files.values()))
+    with BlobReader(repo) as reader:
+        ignores: Dict[str, GitIgnore] = {}
+        for (base, _), (_, data) in zip(ignore_files.items(), reader.read(list(ignore_files.values()))):
+            if data is not None:
+                ignores[base] = GitIgnore.from_text(data.decode("utf-8", errors="ignore"), base)
+
+        def chain(directory: str) -> Tuple[GitIgnore, ...]:
+            # .gitignore files of directory and its ancestors, outermost first
+            parts = directory.split("/") if directory else []
+            bases = [""] + ["/".join(parts[:i + 1]) for i in range(len(parts))]
+            return tuple(ignores[b] for b in bases if b in ignores)
+
+        def pruned_dir(path: str) -> Optional[str]:
+            # Outermost directory the walker would not descend into
+            parts = path.split("/")
+            for i in range(len(parts) - 1):
+                directory = "/".join(parts[:i + 1])
+                if parts[i] in options.ignored_dirs or _is_ignored(chain("/".join(parts[:i])), directory, True):
+                    return directory
+            return None
+
+        pruned_dirs = set()
+        selected: List[Tuple[str, str]] = []
+        for path, oid in code_files:
+            directory = pruned_dir(path)
+            if directory is not None:
+                pruned_dirs.add(directory)
+            elif _is_ignored(chain(posixpath.dirname(path)), path, False):
+                stats["files_pruned"] += 1
+            else:
+                selected.append((path, oid))
+        stats["dirs_pruned"] += len(pruned_dirs)
+
+        def within_size(files: List[Tuple[str, str]], sizes: Dict[str, Optional[int]]) -> List[Tuple[str, str]]:
+            kept = []
+            for path, oid in files:
+                size = sizes.get(oid)
+                if size is not None and options.max_file_size is not None and size > options.max_file_size:
+                    stats["oversized_files"] += 1
+                    stats["files_pruned"] += 1
+                    stats["bytes_pruned"] += size
+                    logger.debug("Skipping oversized file (%d bytes): %s", size, path)
+                else:
+                    kept.append((path, oid))
+            return kept
+
+        unsized: List[str] = []
+        if options.max_file_size is not None and selected:
+            # Sizes come from the object headers, so oversized blobs are never read; a partial clone
+            # knows them only for the blobs it holds, so it is asked without fetching
+            sizes = _batch_check(repo, [oid for _, oid in selected], lazy_fetch=False)
+            selected = within_size(selected, sizes)
+            unsized = [oid for _, oid in selected if sizes.get(oid) is None]
+        prefetch_blobs(repo, [oid for _, oid in selected])
+        if unsized:
+            # Blobs whose size was unknown until fetched are still checked before they are read
+            selected = within_size(selected, _batch_check(repo, unsized))
+        stats["files_seen"] = len(selected)
+
+        for (path, _), (oid, data) in zip(selected, reader.read([oid for _, oid in selected])):
+            if data is None:
+                logger.warning("Blob %s of %s is missing from %s", oid[:12], path, repo)
+                continue
+            yield path, data
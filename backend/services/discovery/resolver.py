@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import ast
+import re
+import string
+import textwrap
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+
+
+# Name lookups may return an already-resolved string or an AST node to resolve further
+Lookup = Callable[[str], Union[str, ast.AST, None]]
+
+DEFAULT_MAX_DEPTH = 100
+DEFAULT_MAX_LENGTH = 200_000
+_STRIP_METHODS = {"strip", "lstrip", "rstrip"}
+# Sentinel for formatting arguments that are not literals
+_UNKNOWN: Any = object()
+# A printf-style conversion: width and precision are groups 1 and 2
+_PERCENT_SPEC_RE = re.compile(r"%(?:\([^)]*\))?[-#0 +]*(\*|\d+)?(?:\.(\*|\d+))?[hlL]?([a-zA-Z%])")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+class ConstantResolver:
+    """Resolve string-valued expressions to constants, shared by the extractor visitors.
+
+    Results are memoized per AST node until invalidate() is called, which the
+    owning visitor does whenever its name bindings change. Self-referencing
+    bindings (x = x + "a") resolve to None instead of recursing, nesting deeper
+    than max_depth gives up, and results are clipped to max_length characters.
+    Time spent in top-level resolve() calls is accumulated in seconds.
+    """
+
+    def __init__(self, lookup: Lookup, max_depth: int = DEFAULT_MAX_DEPTH, max_length: int = DEFAULT_MAX_LENGTH):
+        self.lookup = lookup
+        self.max_depth = max_depth
+        self.max_length = max_length
+        self.seconds = 0.0
+        self.cycles = 0
+        self.truncated = 0
+        self._memo: Dict[int, Optional[str]] = {}
+        self._active: Set[int] = set()
+        self._depth = 0
+
+    def invalidate(self) -> None:
+        self._memo.clear()
+
+    def resolve(self, node: Optional[ast.AST]) -> Optional[str]:
+        if node is None:
+            return None
+        if self._depth:
+            return self._resolve(node)
+        started = time.perf_counter()
+        try:
+            return self._resolve(node)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def _resolve(self, node: ast.AST) -> Optional[str]:
+        key = id(node)
+        if key in self._memo:
+            return self._memo[key]
+        if key in self._active:
+            self.cycles += 1
+            return None
+        if self._depth >= self.max_depth:
+            return None
+        self._active.add(key)
+        self._depth += 1
+        try:
+            value = self._eval(node)
+        finally:
+            self._depth -= 1
+            self._active.discard(key)
+        if value is not None and len(value) > self.max_length:
+            self.truncated += 1
+            value = value[:self.max_length]
+        self._memo[key] = value
+        return value
+
+    def _eval(self, node: ast.AST) -> Optional[str]:
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.JoinedStr):  # f-string: take literal chunks, placeholders as {...}
+            parts: List[str] = []
+            for v in node.values:
+                if isinstance(v, ast.Constant) and isinstance(v.value, str):
+                    parts.append(v.value)
+                else:
+                    parts.append("{...}")
+            res = "".join(parts).strip()
+            return res if res else None
+        if isinstance(node, ast.Name):
+            bound = self.lookup(node.id)
+            if isinstance(bound, ast.AST):
+                return self._resolve(bound)
+            return bound
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            return self._eval_concat(node)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod):
+            template = self._resolve(node.left)
+            args = self._literal(node.right)
+            if template is None or args is _UNKNOWN:
+                return None
+            numbers: List[str] = []
+            fields = 0
+            for match in _PERCENT_SPEC_RE.finditer(template):
+                if match.group(3) == "%":
+                    continue
+                if "*" in (match.group(1), match.group(2)):
+                    return None  # width taken from the arguments
+                numbers += [n for n in match.group(1, 2) if n]
+                fields += 1
+            if not self._fits(template, numbers, fields, args):
+                return None
+            try:
+                return template % args
+            except (TypeError, ValueError, KeyError):
+                return None
+        if isinstance(node, ast.Call):
+            return self._eval_call(node)
+        # Other node types (subscripts, attribute access, ...) are unknown
+        return None
+
+    def _eval_concat(self, node: ast.BinOp) -> Optional[str]:
+        # Flatten a + b + c + ... iteratively: no recursion per operand and one join
+        operands: List[ast.AST] = []
+        stack: List[ast.AST] = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, ast.BinOp) and isinstance(current.op, ast.Add):
+                stack.append(current.right)
+                stack.append(current.left)
+            else:
+                operands.append(current)
+        parts: List[str] = []
+        length = 0
+        for operand in operands:
+            part = self._resolve(operand)
+            if part is None:
+                return None
+            parts.append(part)
+            length += len(part)
+            if length > self.max_length:
+                break
+        return "".join(parts)
+
+    def _eval_call(self, node: ast.Call) -> Optional[str]:
+        func = node.func
+        # textwrap.dedent("...") / dedent("...")
+        if (isinstance(func, ast.Attribute) and func.attr == "dedent" and isinstance(func.value, ast.Name)
+                and func.value.id == "textwrap") or (isinstance(func, ast.Name) and func.id == "dedent"):
+            if len(node.args) == 1 and not node.keywords:
+                text = self._resolve(node.args[0])
+                return textwrap.dedent(text) if text is not None else None
+            return None
+        # str("...") wrapper
+        if isinstance(func, ast.Name) and func.id == "str" and len(node.args) == 1:
+            return self._resolve(node.args[0])
+        if not isinstance(func, ast.Attribute):
+            return None
+        # Method calls on resolvable strings like "...".strip()
+        base = self._resolve(func.value)
+        if base is None:
+            return None
+        attr = func.attr
+        if attr in _STRIP_METHODS and not node.keywords and len(node.args) <= 1:
+            chars = self._resolve(node.args[0]) if node.args else None
+            if node.args and chars is None:
+                return None
+            return getattr(base, attr)(chars)
+        if attr == "join" and len(node.args) == 1 and not node.keywords:
+            seq = node.args[0]
+            if isinstance(seq, (ast.List, ast.Tuple)):
+                items = [self._resolve(elt) for elt in seq.elts]
+                if any(item is None for item in items):
+                    return None
+                return base.join(items)  # type: ignore[arg-type]
+            return None
+        if attr == "format":
+            args = [self._literal(a) for a in node.args]
+            kwargs = {kw.arg: self._literal(kw.value) for kw in node.keywords if kw.arg}
+            if all(a is not _UNKNOWN for a in args) and all(v is not _UNKNOWN for v in kwargs.values()) \
+                    and len(kwargs) == len(node.keywords):
+                try:
+                    specs = [spec for _, name, spec, _ in string.Formatter().parse(base) if name is not None]
+                    if any("{" in (spec or "") for spec in specs):
+                        return None  # nested fields take their spec from the arguments
+                    numbers = [n for spec in specs for n in _DIGITS_RE.findall(spec or "")]
+                    if not self._fits(base, numbers, len(specs), (*args, *kwargs.values())):
+                        return None
+                    return base.format(*args, **kwargs)
+                except (IndexError, KeyError, ValueError, AttributeError):
+                    pass
+            # Non-literal arguments are not safely resolvable; return the template as best-effort
+            return base
+        return None
+
+    def _fits(self, template: str, numbers: List[str], fields: int, args: Any) -> bool:
+        """Whether formatting template stays within max_length, judged from its widths, precisions and arguments.
+
+        Formatting is refused up front because a single "%0300000000d"
+        allocates the whole result before it could be clipped.
+        """
+        if any(len(n) > len(str(self.max_length)) for n in numbers):
+            return False
+        values = args.values() if isinstance(args, dict) else args if isinstance(args, tuple) else (args,)
+        longest = max((len(str(v)) for v in values), default=0)
+        return len(template) + sum(int(n) for n in numbers) + fields * longest <= self.max_length
+
+    def _literal(self, node: ast.AST) -> Any:
+        """Value of a literal formatting argument, or _UNKNOWN."""
+        if isinstance(node, ast.Constant) and (node.value is None or isinstance(node.value, (int, float))):
+            return node.value
+        if isinstance(node, ast.Tuple):
+            values = tuple(self._literal(elt) for elt in node.elts)
+            return _UNKNOWN if any(v is _UNKNOWN for v in values) else values
+        if isinstance(node, ast.Dict):
+            out: Dict[Any, Any] = {}
+            for k, v in zip(node.keys, node.values):
+                key = self._resolve(k) if k is not None else None
+                value = self._literal(v)
+                if key is None or value is _UNKNOWN:
+                    return _UNKNOWN
+                out[key] = value
+            return out
+        text = self._resolve(node)
+        return _UNKNOWN if text is None else text
@@ -1,27 +1,246 @@
 from __future__ import annotations
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+import asyncio
+import json
 import logging
+import math
+import re
 
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-from llm_service.llm import llm_json
-from llm_service.prompts.discovery_prompts import SUMMARIZER_SYSTEM
+from llm_service.llm import MissingApiKeyError, allm_json, llm_json
+from llm_service.shaping import estimate_tokens, shape_text
+from llm_service.prompts.discovery_prompts import BATCH_SUMMARIZER_SYSTEM, SUMMARIZER_SYSTEM
+from .role_examples import ROLE_EXAMPLES, ROLE_KEYWORDS
 
 
 logger = logging.getLogger(__name__)
 
+# Rough budget for the prompt texts packed into one batch request
+DEFAULT_BATCH_TOKENS = 6000
+MAX_BATCH_ITEMS = 40
+# JSON key, quotes and separators around each packed prompt
+_ITEM_OVERHEAD_TOKENS = 8
 
-def summarize_prompt_role(text: str) -> str:
-    messages: List[Dict[str, str]] = [
+# Local guesses at or above this confidence are used without asking the LLM
+DEFAULT_ROLE_CONFIDENCE = 0.5
+# Below this confidence the guess falls back to the generic label
+_MIN_LABEL_CONFIDENCE = 0.1
+# Weight of keyword evidence against TF-IDF similarity when scoring labels
+_KEYWORD_WEIGHT = 0.5
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9+#/.-]*[a-z0-9+#]|[a-z]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from has have help i in is it its of on or our that the their them "
+    "they this to use user users we what when which who will with you your".split()
+)
+
+
+def _role_messages(text: str) -> List[Dict[str, str]]:
+    return [
         {"role": "system", "content": SUMMARIZER_SYSTEM},
-        {"role": "user", "content": text},
+        {"role": "user", "content": shape_text(text)},
     ]
-    logger.debug("Summarizing role for prompt of length %d", len(text))
-    data: Dict[str, Any] = llm_json(messages)
+
+
+def _role_from_response(data: Dict[str, Any]) -> str:
     role = str(data.get("role", "Unknown")).strip()
     logger.debug("Role summarization result: %s", role)
     return role or "Unknown"
 
 
+def summarize_prompt_role(text: str) -> str:
+    logger.debug("Summarizing role for prompt of length %d", len(text))
+    data: Dict[str, Any] = llm_json(_role_messages(text))
+    return _role_from_response(data)
+
+
+async def asummarize_prompt_role(text: str) -> str:
+    """Async summarize_prompt_role, for use inside run_llm_calls()."""
+    logger.debug("Summarizing role for prompt of length %d", len(text))
+    data: Dict[str, Any] = await allm_json(_role_messages(text))
+    return _role_from_response(data)
+
+
+def _estimate_tokens(text: str) -> int:
+    return estimate_tokens(text) + _ITEM_OVERHEAD_TOKENS
+
+
+def plan_role_batches(
+    items: List[Tuple[str, str]], max_tokens: int = DEFAULT_BATCH_TOKENS, max_items: int = MAX_BATCH_ITEMS
+) -> List[List[Tuple[str, str]]]:
+    """Pack (prompt_id, text) pairs into batches in order, each within the token budget.
+
+    A prompt that alone exceeds the budget gets a batch of its own.
+    """
+    batches: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    used = 0
+    for item in items:
+        cost = _estimate_tokens(item[1])
+        if current and (used + cost > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _batch_messages(items: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": BATCH_SUMMARIZER_SYSTEM},
+        {"role": "user", "content": json.dumps(dict(items), ensure_ascii=False)},
+    ]
+
+
+def _roles_from_batch_response(data: Dict[str, Any], ids: List[str]) -> Dict[str, str]:
+    """Valid roles in a batch answer, keyed by the requested IDs; anything else is dropped."""
+    roles = data.get("roles") if isinstance(data, dict) else None
+    if not isinstance(roles, dict):
+        return {}
+    found: Dict[str, str] = {}
+    for prompt_id in ids:
+        role = roles.get(prompt_id)
+        if isinstance(role, str) and role.strip():
+            found[prompt_id] = role.strip()
+    return found
+
+
+def _count(stats: Optional[Dict[str, Any]], key: str) -> None:
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + 1
+
+
+async def _asummarize_batch(items: List[Tuple[str, str]], stats: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    if len(items) == 1:
+        prompt_id, text = items[0]
+        _count(stats, "role_requests")
+        return {prompt_id: await asummarize_prompt_role(text)}
+    _count(stats, "role_requests")
+    _count(stats, "role_batches")
+    logger.debug("Summarizing roles for a batch of %d prompts", len(items))
+    try:
+        data: Dict[str, Any] = await allm_json(_batch_messages(items))
+        roles = _roles_from_batch_response(data, [prompt_id for prompt_id, _ in items])
+    except ValueError:
+        # Unparseable answer: treat every prompt as unanswered
+        roles = {}
+    missing = [item for item in items if item[0] not in roles]
+    if missing:
+        # Partial or malformed answer: retry only the unanswered prompts in two halves
+        _count(stats, "role_batch_splits")
+        logger.debug("Batch answered %d of %d prompts; splitting the rest", len(roles), len(items))
+        half = (len(missing) + 1) // 2
+        parts = [missing[:half], missing[half:]] if len(missing) > 1 else [missing]
+        for part_roles in await asyncio.gather(*(_asummarize_batch(part, stats) for part in parts if part)):
+            roles.update(part_roles)
+    return roles
+
+
+async def asummarize_prompt_roles(
+    prompts: Dict[str, str], max_tokens: int = DEFAULT_BATCH_TOKENS, stats: Optional[Dict[str, Any]] = None
+) -> Dict[str, str]:
+    """Summarize the role of many prompts, packing them into as few requests as the budget allows.
+
+    Returns a role per prompt ID. Batches are sent concurrently; a batch whose
+    answer is partial or malformed is split and its missing prompts retried,
+    down to one single-prompt request each. Prompts of a batch that failed
+    outright are left out of the result. Request counters go into stats.
+    """
+    # Oversized prompts are shaped first, so one of them cannot crowd out a whole batch
+    batches = plan_role_batches([(prompt_id, shape_text(text)) for prompt_id, text in prompts.items()], max_tokens)
+    roles: Dict[str, str] = {}
+    results = await asyncio.gather(*(_asummarize_batch(batch, stats) for batch in batches), return_exceptions=True)
+    for batch_roles in results:
+        if isinstance(batch_roles, MissingApiKeyError):
+            raise batch_roles
+        if isinstance(batch_roles, BaseException):
+            logger.warning("Role summarization batch failed: %s", batch_roles)
+            continue
+        roles.update(batch_roles)
+    return roles
+
+
+@dataclass
+class RoleGuess:
+    """A locally classified role with a confidence in [0, 1]."""
+    role: str
+    confidence: float
+
+
+def _tokens(text: str) -> List[str]:
+    words = [w for w in _TOKEN_RE.findall(text.lower()) if w not in _STOPWORDS]
+    # Bigrams keep phrases like "customer support" apart from their words
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _normalized(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+@lru_cache(maxsize=1)
+def _centroid_model() -> Tuple[Dict[str, float], Dict[str, Dict[str, float]], Dict[str, "re.Pattern[str]"]]:
+    """IDF weights, one unit-length TF-IDF centroid per label and the keyword patterns."""
+    documents = [(label, Counter(_tokens(text))) for label, texts in ROLE_EXAMPLES.items() for text in texts]
+    df: Counter = Counter()
+    for _, counts in documents:
+        df.update(counts.keys())
+    idf = {term: math.log((1 + len(documents)) / (1 + n)) + 1 for term, n in df.items()}
+    sums: Dict[str, Dict[str, float]] = {}
+    for label, counts in documents:
+        vector = _normalized({t: c * idf[t] for t, c in counts.items()})
+        total = sums.setdefault(label, {})
+        for term, weight in vector.items():
+            total[term] = total.get(term, 0.0) + weight
+    centroids = {label: _normalized(vector) for label, vector in sums.items()}
+    keywords = {
+        label: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in phrases) + r")\b")
+        for label, phrases in ROLE_KEYWORDS.items()
+    }
+    return idf, centroids, keywords
+
+
+def classify_prompt_role(text: str) -> RoleGuess:
+    """Deterministic local role guess from keyword rules and a TF-IDF nearest-centroid model.
+
+    Each label scores the mean of its share of keyword hits and its cosine
+    similarity to the centroid (relative to the best). Confidence combines the
+    winner's score with its margin over the runner-up, so prompts that match
+    nothing, or several labels equally, come out low.
+    """
+    idf, centroids, keywords = _centroid_model()
+    lowered = text.lower()
+    counts = Counter(_tokens(text))
+    # Terms never seen in the examples carry no signal for the centroids
+    vector = _normalized({t: c * idf[t] for t, c in counts.items() if t in idf})
+    similarity = {
+        label: sum(w * centroid.get(t, 0.0) for t, w in vector.items()) for label, centroid in centroids.items()
+    }
+    hits = {label: len(pattern.findall(lowered)) for label, pattern in keywords.items()}
+    total_hits = sum(hits.values())
+    best_similarity = max(similarity.values(), default=0.0)
+    scores = {
+        label: _KEYWORD_WEIGHT * (hits.get(label, 0) / total_hits if total_hits else 0.0)
+        + (1 - _KEYWORD_WEIGHT) * (similarity[label] / best_similarity if best_similarity else 0.0)
+        for label in centroids
+    }
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    if not ranked or ranked[0][1] <= 0:
+        return RoleGuess("General assistant", 0.0)
+    (role, top), (_, second) = ranked[0], ranked[1] if len(ranked) > 1 else ("", 0.0)
+    margin = (top - second) / top
+    # Absolute similarity matters too: a best match that barely overlaps is weak evidence
+    evidence = min(1.0, best_similarity * 2) if not total_hits else 1.0
+    confidence = round(top * margin * evidence, 4)
+    if confidence < _MIN_LABEL_CONFIDENCE:
+        # Too little evidence for a specific label
+        role = "General assistant"
+    logger.debug("Local role guess %s (confidence %.2f)", role, confidence)
+    return RoleGuess(role, confidence)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+
+# Labelled system prompts the local role classifier builds its centroids from.
+# Labels follow SUMMARIZER_SYSTEM: short (at most 3 words), never "Unknown".
+ROLE_EXAMPLES: Dict[str, List[str]] = {
+    "Coding assistant": [
+        "You are a helpful coding assistant. Write clean, well documented code and explain your changes.",
+        "You are an expert software engineer. Help the user debug their Python program and fix failing tests.",
+        "Act as a senior developer reviewing pull requests. Point out bugs, style issues and refactoring opportunities.",
+        "You write code. Given a programming task, produce a working implementation with unit tests.",
+        "You are a programming tutor for JavaScript and TypeScript; answer questions about functions, classes and APIs.",
+    ],
+    "Customer support": [
+        "You are a friendly customer support agent. Help customers with orders, refunds and account issues.",
+        "You are a support assistant for our SaaS product. Troubleshoot login problems and open a ticket when needed.",
+        "Act as a help desk agent. Answer customer questions politely and escalate complaints to a human.",
+        "You handle customer service chats: track shipments, process returns and answer billing questions.",
+    ],
+    "Data analyst": [
+        "You are a data analyst. Analyze the dataset, compute statistics and describe trends in the data.",
+        "Act as a data scientist: explore the CSV, build charts and explain correlations and outliers.",
+        "You answer analytics questions by querying the metrics table and summarizing the results in a report.",
+        "You are an expert in pandas and data visualization. Clean the data and produce insightful plots.",
+    ],
+    "SQL assistant": [
+        "You translate natural language questions into SQL queries for a PostgreSQL database.",
+        "You are a SQL expert. Given the database schema, write an efficient query that answers the question.",
+        "Generate a SQLite query for the user's request. Only use tables and columns from the schema.",
+    ],
+    "Financial advisor": [
+        "Act as a financial advisor for investments. Recommend portfolio allocations based on risk tolerance.",
+        "You are a personal finance assistant. Help users budget, save money and plan for retirement.",
+        "You provide stock market analysis, explain earnings reports and discuss investment strategies.",
+        "You are an accounting assistant who explains taxes, invoices, expenses and financial statements.",
+    ],
+    "Travel agent": [
+        "You are a travel agent. Plan trips, suggest itineraries and find flights and hotels for the user.",
+        "Act as a travel planner: recommend destinations, book accommodation and build a day-by-day itinerary.",
+        "You help travelers with visas, flight bookings, hotel reservations and local sightseeing tips.",
+    ],
+    "Creative writer": [
+        "You are a creative writer generating stories. Write imaginative fiction with vivid characters.",
+        "Act as a poet. Compose poems in the style the user asks for.",
+        "You are a screenwriter and storyteller who drafts scenes, dialogue and plot outlines.",
+        "Write engaging short stories, song lyrics and creative content based on the user's prompt.",
+    ],
+    "Translator": [
+        "You are a professional translator. Translate the user's text into French, preserving tone and meaning.",
+        "Translate the following text from English to Spanish. Output only the translation.",
+        "You are a multilingual translation assistant; detect the source language and translate into the target language.",
+    ],
+    "Tutor": [
+        "You are a patient math tutor. Explain concepts step by step and give the student practice problems.",
+        "Act as a teacher helping students learn history. Ask questions to check their understanding.",
+        "You are an educational assistant for high school students studying physics and chemistry homework.",
+        "You are a language learning tutor; correct the learner's grammar and explain vocabulary.",
+    ],
+    "Research assistant": [
+        "You are a research assistant. Search the literature, read papers and summarize the key findings with citations.",
+        "Act as a scientific researcher: gather sources, compare studies and write a literature review.",
+        "You help with academic research by finding relevant papers and extracting their methods and results.",
+    ],
+    "Web search agent": [
+        "You are a web search agent. Use the search tool to browse the internet and answer with up-to-date sources.",
+        "Search the web for the latest news on the topic and report what you find with links.",
+        "You can browse websites and scrape pages to collect information requested by the user.",
+    ],
+    "Summarizer": [
+        "You summarize documents. Produce a concise summary of the text in three bullet points.",
+        "Summarize the following meeting transcript, listing decisions and action items.",
+        "You are a summarization assistant: condense long articles into short, accurate abstracts.",
+    ],
+    "Legal assistant": [
+        "You are a legal assistant. Review contracts, explain clauses and flag legal risks.",
+        "Act as a lawyer: answer questions about law, regulations, compliance and terms of service.",
+        "You help draft legal documents such as NDAs and agreements; you do not give formal legal advice.",
+    ],
+    "Medical assistant": [
+        "You are a medical assistant. Answer health questions, explain symptoms and suggest when to see a doctor.",
+        "Act as a clinical decision support tool for physicians reviewing patient records and diagnoses.",
+        "You are a healthcare assistant who explains medications, dosages and treatment options to patients.",
+    ],
+    "Sales assistant": [
+        "You are a sales assistant. Qualify leads, answer product questions and help close deals.",
+        "Act as a sales development representative writing outreach emails to prospects.",
+        "You recommend products to shoppers based on their preferences and upsell relevant items.",
+    ],
+    "Marketing assistant": [
+        "You are a marketing assistant. Write ad copy, social media posts and SEO optimized content.",
+        "Act as a marketing strategist: plan campaigns, define target audiences and brand messaging.",
+        "You create engaging marketing emails and product descriptions for our brand.",
+    ],
+    "Email assistant": [
+        "You are an email assistant. Draft replies to incoming emails in a professional tone.",
+        "Read the user's inbox, triage messages and compose responses to important emails.",
+        "You help write and proofread business emails and cover letters.",
+    ],
+    "Scheduling assistant": [
+        "You are a scheduling assistant. Manage the user's calendar, book meetings and send reminders.",
+        "Act as a personal assistant who organizes appointments, events and to-do lists.",
+        "You find free time slots across calendars and schedule meetings for the team.",
+    ],
+    "DevOps assistant": [
+        "You are a DevOps engineer. Help with CI/CD pipelines, Docker, Kubernetes and cloud deployments.",
+        "Act as a site reliability engineer: investigate incidents, read logs and restart failing services.",
+        "You manage infrastructure as code with Terraform and automate deployments on AWS.",
+        "You can run shell commands in the terminal to install packages and configure servers.",
+    ],
+    "Security analyst": [
+        "You are a cybersecurity analyst. Review code and configurations for vulnerabilities and threats.",
+        "Act as a penetration tester assessing the application's security and reporting exploitable issues.",
+        "You triage security alerts, investigate suspicious activity and recommend remediation.",
+    ],
+    "Recruiting assistant": [
+        "You are a recruiting assistant. Screen resumes, match candidates to job descriptions and schedule interviews.",
+        "Act as an HR assistant answering employee questions about benefits, policies and onboarding.",
+        "You write job postings and evaluate candidates for hiring managers.",
+    ],
+    "Content moderator": [
+        "You are a content moderator. Classify user messages as safe or unsafe and flag policy violations.",
+        "Review the following comment for hate speech, harassment or spam and decide whether to remove it.",
+        "You detect toxic, abusive or inappropriate content and explain which guideline it breaks.",
+    ],
+    "General assistant": [
+        "You are a helpful assistant.",
+        "You are a helpful, harmless and honest AI assistant. Answer the user's questions accurately.",
+        "You are a friendly chatbot. Be concise and polite in your answers.",
+        "You are an AI assistant that helps people find information.",
+    ],
+}
+
+# Phrases that strongly indicate a label; matched as whole words, case-insensitively
+ROLE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "Coding assistant": ("code", "coding", "programming", "programmer", "developer", "software engineer",
+                         "debug", "refactor", "python", "javascript", "typescript", "pull request"),
+    "Customer support": ("customer support", "customer service", "support agent", "help desk", "helpdesk",
+                         "refund", "ticket", "complaint"),
+    "Data analyst": ("data analyst", "data scientist", "dataset", "analytics", "statistics", "pandas",
+                     "visualization", "csv"),
+    "SQL assistant": ("sql", "postgresql", "sqlite", "mysql", "database schema", "query"),
+    "Financial advisor": ("financial", "finance", "investment", "portfolio", "stock", "budget", "retirement",
+                          "accounting", "tax"),
+    "Travel agent": ("travel", "trip", "itinerary", "flight", "hotel", "destination", "vacation"),
+    "Creative writer": ("story", "stories", "fiction", "poem", "poet", "creative writer", "screenwriter",
+                        "lyrics", "storyteller"),
+    "Translator": ("translate", "translator", "translation", "multilingual"),
+    "Tutor": ("tutor", "teacher", "student", "homework", "lesson", "learner", "educational"),
+    "Research assistant": ("research", "researcher", "literature", "papers", "citations", "academic"),
+    "Web search agent": ("web search", "search the web", "browse", "internet", "scrape", "search engine"),
+    "Summarizer": ("summarize", "summarization", "summary", "condense", "tl;dr"),
+    "Legal assistant": ("legal", "lawyer", "contract", "law", "compliance", "attorney", "clause"),
+    "Medical assistant": ("medical", "health", "patient", "doctor", "physician", "symptom", "clinical",
+                          "medication", "diagnosis"),
+    "Sales assistant": ("sales", "lead", "leads", "prospect", "prospects", "upsell", "deal", "shopper"),
+    "Marketing assistant": ("marketing", "ad copy", "seo", "campaign", "brand", "social media"),
+    "Email assistant": ("email", "emails", "inbox", "reply", "replies"),
+    "Scheduling assistant": ("calendar", "schedule", "scheduling", "meeting", "appointment", "reminder"),
+    "DevOps assistant": ("devops", "kubernetes", "docker", "ci/cd", "terraform", "deployment", "sre",
+                         "infrastructure", "shell commands", "terminal"),
+    "Security analyst": ("security", "cybersecurity", "vulnerability", "vulnerabilities", "penetration",
+                         "threat", "exploit", "malware"),
+    "Recruiting assistant": ("recruiting", "recruiter", "resume", "resumes", "candidate", "candidates", "hiring",
+                             "job description", "hr"),
+    "Content moderator": ("moderator", "moderation", "toxic", "hate speech", "harassment", "policy violation",
+                          "unsafe"),
+    "General assistant": ("helpful assistant", "ai assistant", "chatbot", "general purpose"),
+}
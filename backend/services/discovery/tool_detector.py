@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tool_vocabulary import DEFAULT_TOOL_VOCABULARY
+
+
+logger = logging.getLogger(__name__)
+
+# Wording that grants tools; where no vocabulary match is near it, it may name tools the vocabulary
+# does not know. Generic words ("use the", "API", "functions") are left out: nearly every prompt has them.
+_TOOL_HINT_RE = re.compile(
+    r"\byou (?:have|now have|are given|'ve got) access to\b"
+    r"|\b(?:call|use|invoke|run) the [\w\s-]{1,40}?\b(?:tool|function)s?\b"
+    r"|\b(?:tools|functions|available tools|available functions)\s*:"
+    r"|\b(?:tool|function)[ _-]call(?:s|ing)?\b"
+    r"|(?P<call>\b[A-Za-z_][A-Za-z0-9_]*\([^()\n]{0,80}\))",
+    re.IGNORECASE,
+)
+# Characters around a granting phrase in which a vocabulary match counts as the tool it grants
+_HINT_WINDOW = 80
+
+
+def _normalize(text: str) -> str:
+    # Same length as the input, so match offsets map back onto the original text
+    return text.lower().replace("_", " ").replace("-", " ")
+
+
+class _Automaton:
+    """Aho-Corasick automaton over normalized aliases: one pass over the text finds every alias."""
+
+    def __init__(self, patterns: Dict[str, str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # (alias length, canonical name) ending at each state
+        self.out: List[List[Tuple[int, str]]] = [[]]
+        for alias, canonical in patterns.items():
+            state = 0
+            for ch in alias:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append((len(alias), canonical))
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                if state:
+                    f = self.fail[state]
+                    while f and ch not in self.goto[f]:
+                        f = self.fail[f]
+                    self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def matches(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, canonical) of every alias occurrence on word boundaries."""
+        found: List[Tuple[int, int, str]] = []
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, canonical in out[state]:
+                start, end = i - length + 1, i + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    found.append((start, end, canonical))
+        return found
+
+
+@dataclass
+class ToolDetection:
+    tools: List[Dict[str, Any]] = field(default_factory=list)
+    # Tool-granting wording that no vocabulary match accounts for: worth asking the LLM
+    needs_llm: bool = False
+
+
+class ToolMentionDetector:
+    """Find tools named in system prompts from a vocabulary of canonical names and aliases.
+
+    All aliases are compiled into one Aho-Corasick automaton, so each prompt
+    is scanned once in time linear in its length whatever the vocabulary
+    size. Throughput counters accumulate over the lifetime of the instance.
+    """
+
+    def __init__(self, vocabulary: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.vocabulary = vocabulary if vocabulary is not None else load_tool_vocabulary()
+        patterns: Dict[str, str] = {}
+        for canonical, entry in self.vocabulary.items():
+            for alias in entry.get("aliases") or []:
+                key = _normalize(str(alias)).strip()
+                if key:
+                    patterns.setdefault(key, canonical)
+        self._automaton = _Automaton(patterns)
+        self.prompts = 0
+        self.chars = 0
+        self.seconds = 0.0
+        self.with_tools = 0
+        self.sent_to_llm = 0
+        self._lock = threading.Lock()
+
+    def detect(self, text: str) -> ToolDetection:
+        started = time.perf_counter()
+        normalized = _normalize(text)
+        matches = self._automaton.matches(normalized)
+        tools: List[Dict[str, Any]] = []
+        seen = set()
+        for _, _, canonical in matches:
+            if canonical not in seen:
+                seen.add(canonical)
+                entry = self.vocabulary.get(canonical) or {}
+                tools.append({"name": canonical, "description": entry.get("description"), "parameters": {}})
+        needs_llm = any(not self._covered(hint, matches) for hint in _TOOL_HINT_RE.finditer(text))
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.prompts += 1
+            self.chars += len(text)
+            self.seconds += elapsed
+            self.with_tools += 1 if tools else 0
+            self.sent_to_llm += 1 if needs_llm else 0
+        return ToolDetection(tools, needs_llm)
+
+    @staticmethod
+    def _covered(hint: "re.Match[str]", matches: List[Tuple[int, int, str]]) -> bool:
+        """Whether a vocabulary match accounts for a tool hint: inside a call's span, or near a granting phrase."""
+        window = 0 if hint.group("call") else _HINT_WINDOW
+        start, end = hint.start() - window, hint.end() + window
+        return any(m_start < end and m_end > start for m_start, m_end, _ in matches)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            prompts, chars, seconds = self.prompts, self.chars, self.seconds
+            with_tools, sent_to_llm = self.with_tools, self.sent_to_llm
+        return {
+            "prompts": prompts,
+            "prompts_with_tools": with_tools,
+            "sent_to_llm": sent_to_llm,
+            "seconds": round(seconds, 4),
+            "prompts_per_second": round(prompts / seconds, 1) if seconds else 0.0,
+            "chars_per_second": round(chars / seconds, 1) if seconds else 0.0,
+        }
+
+
+def load_tool_vocabulary(path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """The vocabulary from path (or TOOL_VOCABULARY_PATH), falling back to the built-in one."""
+    path = path or os.getenv("TOOL_VOCABULARY_PATH")
+    if not path:
+        return DEFAULT_TOOL_VOCABULARY  # type: ignore[return-value]
+    try:
+        with open(path, encoding="utf-8") as fh:
+            vocabulary = json.load(fh)
+    except (OSError, ValueError) as e:
+        logger.warning("Cannot load tool vocabulary from %s (%s); using the built-in one", path, e)
+        return DEFAULT_TOOL_VOCABULARY  # type: ignore[return-value]
+    if not isinstance(vocabulary, dict):
+        logger.warning("Tool vocabulary %s is not an object; using the built-in one", path)
+        return DEFAULT_TOOL_VOCABULARY  # type: ignore[return-value]
+    return vocabulary
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from typing import Dict
+
+
+# Tools the local detector recognises in system prompts: canonical name -> description and
+# aliases. Only aliases are matched (as whole words, case-insensitively; "_" and "-" match
+# spaces). Canonical names are chosen so the risk engine's taxonomy covers every one of them.
+# Override with a JSON file of the same shape via TOOL_VOCABULARY_PATH.
+DEFAULT_TOOL_VOCABULARY: Dict[str, Dict[str, object]] = {
+    "filesystem": {
+        "description": "Read and write files on the local filesystem",
+        "aliases": ["filesystem", "file system", "local files", "read files", "write files", "file access",
+                    "read_file", "write_file", "file manager"],
+    },
+    "shell": {
+        "description": "Run shell commands",
+        "aliases": ["shell", "terminal", "bash", "command line", "shell commands", "run commands", "subprocess",
+                    "powershell"],
+    },
+    "python_repl": {
+        "description": "Execute Python code",
+        "aliases": ["python repl", "python interpreter", "execute python", "run python code", "pythonrepltool"],
+    },
+    "code_interpreter": {
+        "description": "Execute code in a sandbox",
+        "aliases": ["code interpreter", "code execution", "execute code", "run code", "jupyter"],
+    },
+    "browser": {
+        "description": "Browse and interact with web pages",
+        "aliases": ["browser", "web browser", "browse the web", "browse websites", "playwright", "selenium",
+                    "puppeteer"],
+    },
+    "web_scraper": {
+        "description": "Fetch and scrape web pages",
+        "aliases": ["scrape", "scraper", "web scraping", "crawl", "crawler", "fetch url", "firecrawl"],
+    },
+    "http_request": {
+        "description": "Make HTTP requests to arbitrary URLs",
+        "aliases": ["http request", "http requests", "requests_get", "requests_post", "curl", "rest api calls"],
+    },
+    "web_search": {
+        "description": "Search the web",
+        "aliases": ["web search", "search the web", "internet search", "search engine", "google search", "bing",
+                    "serpapi", "tavily", "duckduckgo", "brave search"],
+    },
+    "wikipedia": {
+        "description": "Look up Wikipedia articles",
+        "aliases": ["wikipedia"],
+    },
+    "arxiv": {
+        "description": "Search arXiv papers",
+        "aliases": ["arxiv"],
+    },
+    "weather": {
+        "description": "Get weather forecasts",
+        "aliases": ["weather api", "weather tool", "openweathermap", "weather forecast"],
+    },
+    "news": {
+        "description": "Fetch news articles",
+        "aliases": ["news api", "newsapi", "news search"],
+    },
+    "github": {
+        "description": "Access GitHub repositories, issues and pull requests",
+        "aliases": ["github", "github api", "pull requests", "github issues"],
+    },
+    "gitlab": {
+        "description": "Access GitLab projects",
+        "aliases": ["gitlab"],
+    },
+    "git_push": {
+        "description": "Commit and push changes to a repository",
+        "aliases": ["git push", "push commits", "commit and push", "create commits"],
+    },
+    "jira": {
+        "description": "Access Jira issues",
+        "aliases": ["jira"],
+    },
+    "confluence": {
+        "description": "Access Confluence pages",
+        "aliases": ["confluence"],
+    },
+    "notion": {
+        "description": "Access Notion pages",
+        "aliases": ["notion api", "notion pages", "notion workspace", "notion database"],
+    },
+    "google_drive": {
+        "description": "Access Google Drive files",
+        "aliases": ["google drive", "gdrive"],
+    },
+    "google_sheets": {
+        "description": "Read and edit spreadsheets",
+        "aliases": ["google sheets", "spreadsheet", "spreadsheets"],
+    },
+    "calendar": {
+        "description": "Read and manage calendar events",
+        "aliases": ["calendar", "google calendar", "outlook calendar"],
+    },
+    "email": {
+        "description": "Read and send email",
+        "aliases": ["email", "e-mail", "gmail", "outlook mail", "send emails", "inbox", "smtp"],
+    },
+    "slack": {
+        "description": "Read and post Slack messages",
+        "aliases": ["slack"],
+    },
+    "sms": {
+        "description": "Send SMS messages",
+        "aliases": ["sms", "twilio", "text message", "text messages"],
+    },
+    "database": {
+        "description": "Query a SQL database",
+        "aliases": ["database", "sql database", "sql query", "sql queries", "postgres", "postgresql", "mysql",
+                    "sqlite", "query the database"],
+    },
+    "database_write": {
+        "description": "Insert, update or delete database rows",
+        "aliases": ["insert rows", "update records", "delete records", "write to the database", "drop table"],
+    },
+    "vector_store": {
+        "description": "Retrieve documents from a vector store",
+        "aliases": ["vector store", "vectorstore", "vector database", "knowledge base", "retriever", "pinecone",
+                    "chroma", "weaviate", "faiss", "qdrant"],
+    },
+    "calculator": {
+        "description": "Evaluate arithmetic",
+        "aliases": ["calculator", "llm-math", "llm math"],
+    },
+    "payments": {
+        "description": "Take payments or move money",
+        "aliases": ["stripe", "paypal", "process payments", "payment api", "refund api"],
+    },
+    "aws": {
+        "description": "Administer AWS resources",
+        "aliases": ["aws", "amazon web services", "s3 bucket", "ec2", "lambda functions"],
+    },
+    "kubernetes": {
+        "description": "Administer Kubernetes clusters",
+        "aliases": ["kubernetes", "kubectl", "k8s"],
+    },
+    "docker": {
+        "description": "Manage Docker containers",
+        "aliases": ["docker", "docker containers"],
+    },
+    "secrets_vault": {
+        "description": "Read secrets and credentials",
+        "aliases": ["secrets vault", "hashicorp vault", "secrets manager", "credentials store", "password manager"],
+    },
+    "crm": {
+        "description": "Access CRM records",
+        "aliases": ["crm", "salesforce", "hubspot"],
+    },
+}
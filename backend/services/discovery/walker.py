@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Directory names never worth descending into when looking for agent code
+DEFAULT_IGNORED_DIRS: FrozenSet[str] = frozenset({
+    ".git", ".hg", ".svn",
+    "node_modules", "bower_components",
+    "venv", ".venv", "env", ".env", "virtualenv",
+    "site-packages", "dist-packages", "__pycache__", ".eggs",
+    "build", "dist", "target", "out",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".ipynb_checkpoints",
+    ".idea", ".vscode",
+})
+# Generated or vendored sources above this size are not agent code worth parsing
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+CODE_EXTENSIONS: Tuple[str, ...] = (".py",)
+
+
+@dataclass
+class WalkOptions:
+    """Controls which parts of a tree the discovery walker visits."""
+    ignored_dirs: FrozenSet[str] = DEFAULT_IGNORED_DIRS
+    max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE
+    use_gitignore: bool = True
+    # Descend into symlinked directories; symlinked files are always read. Either way,
+    # symlinks resolving outside the walked root are skipped
+    follow_symlinks: bool = False
+    extensions: Tuple[str, ...] = CODE_EXTENSIONS
+    # Walk pruned directories anyway just to report what pruning saved (diagnostics only)
+    measure_pruned: bool = False
+
+
+def new_walk_stats() -> Dict[str, int]:
+    return {"dirs_pruned": 0, "files_pruned": 0, "bytes_pruned": 0, "oversized_files": 0, "symlink_loops": 0}
+
+
+@dataclass
+class _IgnoreRule:
+    regex: "re.Pattern[str]"
+    negate: bool
+    dir_only: bool
+
+
+def _glob_to_regex(pattern: str) -> str:
+    out: List[str] = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+@dataclass
+class GitIgnore:
+    """Rules from one .gitignore file, matched against paths relative to its directory."""
+    base: str
+    rules: List[_IgnoreRule] = field(default_factory=list)
+
+    @classmethod
+    def from_file(cls, path: str, base: str) -> "GitIgnore":
+        try:
+            with open(path, encoding="utf-8", errors="ignore") as fh:
+                return cls.from_text(fh.read(), base)
+        except OSError:
+            return cls(base=base)
+
+    @classmethod
+    def from_text(cls, text: str, base: str) -> "GitIgnore":
+        ignore = cls(base=base)
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            # Patterns with an inner or leading slash are relative to the .gitignore;
+            # bare names match at any depth below it
+            anchored = "/" in line
+            body = _glob_to_regex(line.lstrip("/"))
+            regex = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+            ignore.rules.append(_IgnoreRule(regex, negate, dir_only))
+        return ignore
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """Return True (ignored), False (re-included) or None (no rule applies)."""
+        result: Optional[bool] = None
+        for rule in self.rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(rel_path):
+                result = not rule.negate
+        return result
+
+
+def _is_ignored(chain: Sequence[GitIgnore], rel_path: str, is_dir: bool) -> bool:
+    ignored = False
+    # Deeper .gitignore files take precedence, as in git
+    for ignore in chain:
+        if ignore.base:
+            if not rel_path.startswith(ignore.base + "/"):
+                continue
+            sub = rel_path[len(ignore.base) + 1:]
+        else:
+            sub = rel_path
+        verdict = ignore.match(sub, is_dir)
+        if verdict is not None:
+            ignored = verdict
+    return ignored
+
+
+def _escapes(entry: "os.DirEntry[str]", root: str) -> bool:
+    """Whether entry is a symlink resolving outside root (a resolved path)."""
+    if not entry.is_symlink():
+        return False
+    target = os.path.realpath(entry.path)
+    return target != root and not target.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def _measure(
+    path: str, options: WalkOptions, stats: Dict[str, int], seen: Set[Tuple[int, int]], root: str
+) -> None:
+    """Count the code files (and their bytes) under a pruned directory."""
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if _escapes(entry, root):
+                    continue
+                if entry.is_dir(follow_symlinks=options.follow_symlinks):
+                    st = entry.stat(follow_symlinks=True)
+                    if (st.st_dev, st.st_ino) not in seen:
+                        seen.add((st.st_dev, st.st_ino))
+                        stack.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(options.extensions):
+                    stats["files_pruned"] += 1
+                    stats["bytes_pruned"] += entry.stat().st_size
+            except OSError:
+                continue
+
+
+def walk_code_files(
+    root: str, options: Optional[WalkOptions] = None, stats: Optional[Dict[str, int]] = None
+) -> Iterator[str]:
+    """Yield code files under root in sorted depth-first order, pruning ignored directories.
+
+    Uses os.scandir so ignored directories are never listed. Honours .gitignore
+    files at every level, skips files larger than max_file_size and directories
+    already visited through a symlink. Symlinked files are read and
+    symlinked directories descended into (with follow_symlinks) only when
+    they resolve within root, so a scanned repository cannot point the walk
+    at the rest of the host.
+    Counters are accumulated into stats.
+    """
+    options = options or WalkOptions()
+    stats = stats if stats is not None else new_walk_stats()
+    try:
+        root_stat = os.stat(root)
+    except OSError:
+        return
+    real_root = os.path.realpath(root)
+    seen: Set[Tuple[int, int]] = {(root_stat.st_dev, root_stat.st_ino)}
+    stack: List[Tuple[str, str, Tuple[GitIgnore, ...]]] = [(root, "", ())]
+
+    while stack:
+        dir_path, rel_dir, chain = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            logger.debug("Cannot list %s: %s", dir_path, e)
+            continue
+        if options.use_gitignore and any(e.name == ".gitignore" and e.is_file(follow_symlinks=False) for e in entries):
+            chain = chain + (GitIgnore.from_file(os.path.join(dir_path, ".gitignore"), rel_dir),)
+
+        subdirs: List[Tuple[str, str, Tuple[GitIgnore, ...]]] = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if _escapes(entry, real_root):
+                    logger.debug("Skipping symlink out of the walked tree: %s", entry.path)
+                    continue
+                is_dir = entry.is_dir(follow_symlinks=options.follow_symlinks)
+                if is_dir:
+                    pruned = entry.name in options.ignored_dirs or _is_ignored(chain, rel_path, True)
+                    st = entry.stat(follow_symlinks=True)
+                    key = (st.st_dev, st.st_ino)
+                    if pruned:
+                        stats["dirs_pruned"] += 1
+                        if options.measure_pruned and key not in seen:
+                            seen.add(key)
+                            _measure(entry.path, options, stats, seen, real_root)
+                        continue
+                    if key in seen:
+                        # Symlink back into a directory we already walked
+                        stats["symlink_loops"] += 1
+                        continue
+                    seen.add(key)
+                    subdirs.append((entry.path, rel_path, chain))
+                    continue
+                if not entry.is_file() or not entry.name.lower().endswith(options.extensions):
+                    continue
+                if _is_ignored(chain, rel_path, False):
+                    stats["files_pruned"] += 1
+                    stats["bytes_pruned"] += entry.stat().st_size
+                    continue
+                if options.max_file_size is not None:
+                    size = entry.stat().st_size
+                    if size > options.max_file_size:
+                        stats["oversized_files"] += 1
+                        stats["files_pruned"] += 1
+                        stats["bytes_pruned"] += size
+                        logger.debug("Skipping oversized file (%d bytes): %s", size, entry.path)
+                        continue
+            except OSError:
+                continue
+            yield entry.path
+        # Reverse so the stack pops subdirectories in sorted order
+        stack.extend(reversed(subdirs))
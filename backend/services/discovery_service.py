@@ -1,116 +1,642 @@
 from __future__ import annotations
 
 import hashlib
-from typing import Any, Dict, List, Optional
+import logging
+import os
+import time
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional
 
 from ..database import db
 from .github_service import GitHubService
-from .discovery.discovery import discover_agents
-from llm_service.llm import get_json_llm_response, MissingApiKeyError
+from .discovery.cache import ExtractionCache
+from .discovery.discovery import iter_discover_agents
+from .discovery.extractor import EXTRACTOR_VERSION
+from .prompt_similarity import PromptSimilarityIndex
+from .risk_engine import RiskEngine
+from .scan_budget import EXPECTED_COMPLETION_TOKENS, ScanBudget, scan_token_budget
+from .discovery.role_assigner import DEFAULT_ROLE_CONFIDENCE, asummarize_prompt_role, classify_prompt_role
+from .discovery.tool_detector import ToolMentionDetector
+from llm_service.cache import bypass_llm_cache, llm_cache_stats
+from llm_service.client import llm_client_stats
+from llm_service.recording import recording_stats
+from llm_service.transport import transport_stats
+from llm_service.shaping import estimate_tokens, shape_text, token_stats
+from llm_service.llm import (
+    aget_json_llm_response, llm_concurrency, meter_llm_usage, run_llm_calls, MissingApiKeyError
+)
+from llm_service.prompts.agent_profile import AGENT_PROFILE_PROMPT
 from llm_service.prompts.tool_detection import TOOL_DETECTION_PROMPT
 from llm_service.prompts.agent_risk import AGENT_RISK_PROMPT
 
 
+logger = logging.getLogger(__name__)
+
+
+ANALYSIS_MODES = ("fused", "separate")
+DEFAULT_ANALYSIS_MODE = "fused"
+# checkout: walk a worktree of the repository; objects: stream the commit's files from the mirror's object database
+SCAN_SOURCES = ("checkout", "objects")
+DEFAULT_SCAN_SOURCE = "checkout"
+
+
+def scan_source() -> str:
+    source = os.getenv("DISCOVERY_SOURCE", DEFAULT_SCAN_SOURCE).lower()
+    return source if source in SCAN_SOURCES else DEFAULT_SCAN_SOURCE
+
+
 class DiscoveryService:
     """Service for discovering agents"""
     
     @staticmethod
-    def discover_agents_from_github(github_repo_url: str) -> List[Dict[str, Any]]:
-        """Discover agents from GitHub repository"""
-        temp_dir = None
+    def discover_agents_from_github(
+        github_repo_url: str,
+        use_llm_cache: bool = True,
+        analysis_mode: str = DEFAULT_ANALYSIS_MODE,
+        token_budget: Optional[int] = None,
+        force: bool = False,
+        summary: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Discover agents from GitHub repository
+
+        summary, if given, receives the final "done" event's data (e.g.
+        whether the agents were served from the stored snapshot).
+        """
+        agents = []
+        for event in DiscoveryService.iter_discovery_events(
+            github_repo_url, use_llm_cache, analysis_mode, token_budget, force
+        ):
+            if event["event"] == "agent":
+                agents.append(event["data"])
+            elif event["event"] == "done" and summary is not None:
+                summary.update(event["data"])
+        return agents
+
+    @staticmethod
+    def iter_discovery_events(
+        github_repo_url: str,
+        use_llm_cache: bool = True,
+        analysis_mode: str = DEFAULT_ANALYSIS_MODE,
+        token_budget: Optional[int] = None,
+        force: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """Run discovery for a GitHub repository, yielding progress as it happens.
+
+        Events are dicts with an "event" name and a "data" payload: "stage" when
+        a phase starts, "agent" for every saved agent (as soon as it has been
+        classified, persisted and risk-assessed), "progress" with running counts
+        after each agent, and a final "done" summary.
+
+        Tool detection and risk assessment run concurrently for a window of
+        agents at a time; agents are still emitted in discovery order. In
+        "fused" analysis mode (the default) one LLM call per agent returns its
+        role, tools and risk; "separate" mode makes the role, tool and risk
+        calls individually. The done summary compares their per-agent cost.
+
+        Tools named in Custom agents' prompts are found locally from the tool
+        vocabulary; the tool-detection LLM call is only made for prompts with
+        tool-granting wording that no vocabulary match accounts for.
+
+        Each new prompt is added to the near-duplicate index as it is saved;
+        only borderline matches are compared by the LLM.
+
+        token_budget (default SCAN_TOKEN_BUDGET env, unlimited if unset) caps
+        the tokens spent on role summaries, agent analysis and duplicate
+        comparisons; work that no longer fits uses local heuristics only
+        (the local role classifier for roles).
+
+        Rescans are incremental: only files added or modified since the
+        commit the repository was last scanned at are extracted, agents whose
+        files were all deleted are retired, and agents whose prompt (hence id)
+        was already analysed are not sent to the LLM again, for their role
+        either. The stored agents of unchanged files are emitted after the
+        rescanned ones, so the agents emitted are the whole inventory (the
+        rescan summary counts both). When the remote's HEAD (one
+        `git ls-remote`) is still the commit last scanned, nothing is cloned
+        or analysed: the stored inventory is emitted and the done summary has
+        from_snapshot set. force always scans the whole tree.
+
+        DISCOVERY_SOURCE=objects scans the commit straight from the mirror's
+        object database (no worktree is written); the default, "checkout",
+        walks a worktree.
+        """
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode: {analysis_mode}")
+        checkout = None
+        started = time.monotonic()
         try:
-            # Clone the repository
-            temp_dir = GitHubService.clone_repository(github_repo_url)
-            
-            # Use existing discovery function
-            discovery_result = discover_agents(temp_dir)
-            agents = discovery_result.get("agents", [])
-            
-            # Save discovered agents to database
-            saved_agents = []
-            for agent in agents:
-                agent_data = {
-                    "id": agent["id"],
-                    "file_path": agent["file"],
-                    "role": agent["role"],
-                    "system_prompt": agent["system_prompt"],
-                    "model": None,
-                    "temperature": None,
-                    "framework": agent.get("framework"),
-                    "risk": None,
-                    "risk_reason": None,
-                }
-                
-                # Check if agent already exists
-                existing_agent = db.get_agent(agent["id"])
-                if not existing_agent:
-                    db.create_agent(agent_data)
-                    saved_agents.append(agent_data)
-                else:
-                    saved_agents.append(existing_agent)
-
-                # Persist any pre-extracted tools (from LangChain visitor)
-                pre_tools = agent.get("__lc_tools__")
-                if pre_tools:
-                    for tname in pre_tools:
-                        try:
-                            # Avoid duplicates by checking first
-                            if not db.has_agent_tool(agent_data["id"], tname):
-                                db.create_agent_tool({
-                                    "agent_id": agent_data["id"],
-                                    "name": tname,
-                                    "description": None,
-                                    "parameters": {}
-                                })
-                        except Exception:
-                            pass
-
-                # If custom agent: detect tools from prompt via LLM
-                if agent_data.get("framework") == "Custom":
-                    try:
-                        prompt = TOOL_DETECTION_PROMPT + "\n\n" + agent_data["system_prompt"]
-                        tools_json = get_json_llm_response(prompt, "")
-                        for t in tools_json.get("tools", []) or []:
-                            try:
-                                tname = t.get("name")
-                                if tname and not db.has_agent_tool(agent_data["id"], tname):
-                                    db.create_agent_tool({
-                                        "agent_id": agent_data["id"],
-                                        "name": tname,
-                                        "description": t.get("description"),
-                                        "parameters": t.get("parameters") or {}
-                                    })
-                            except Exception:
-                                pass
-                    except MissingApiKeyError:
-                        pass
-                    except Exception:
-                        pass
-
-                # Compute agent risk via LLM using role and tool names
+            previous = db.get_repository_scan(github_repo_url)
+            if previous and previous["extractor_version"] != EXTRACTOR_VERSION:
+                # Unchanged files may hold agents the old extractor missed
+                previous = None
+            if previous and not force:
+                yield {"event": "stage", "data": {"stage": "check", "repository": github_repo_url}}
+                if GitHubService.remote_head(github_repo_url) == previous["head_sha"]:
+                    yield from DiscoveryService._snapshot_events(github_repo_url, previous, started)
+                    return
+
+            yield {"event": "stage", "data": {"stage": "clone", "repository": github_repo_url}}
+            clone_stats: Dict[str, Any] = {}
+            source = scan_source()
+            checkout = GitHubService.checkout_repository(
+                github_repo_url, stats=clone_stats, worktree=source == "checkout"
+            )
+            head = checkout.commit
+            changes = None
+            if previous and previous["head_sha"] and not force:
+                changes = GitHubService.changed_files(checkout.mirror, previous["head_sha"], head)
+            only_files = set(changes[0]) if changes is not None else None
+            rescan = {
+                "mode": "full" if changes is None else "incremental",
+                "base_commit": previous["head_sha"] if previous and changes is not None else None,
+                "head_commit": head,
+                "files_changed": len(changes[0]) if changes is not None else None,
+                "files_deleted": len(changes[1]) if changes is not None else None,
+            }
+            if changes is not None:
+                logger.info(
+                    "Rescanning %s from %s: %d files added or modified, %d deleted",
+                    github_repo_url, previous["head_sha"][:12], len(changes[0]), len(changes[1]),
+                )
+
+            yield {"event": "stage", "data": {"stage": "scan", "mode": rescan["mode"], "source": source}}
+            stats: Dict[str, Any] = {}
+            processed = 0
+            concurrency = llm_concurrency()
+            metrics: Dict[str, Dict[str, Any]] = {}
+            risk_engine = RiskEngine()
+            tool_detector = ToolMentionDetector()
+            similarity_index = PromptSimilarityIndex()
+            budget = ScanBudget(token_budget or scan_token_budget())
+            # Where each agent was found; the repository's stored files are only replaced once the scan completes
+            found: Dict[str, List[Dict[str, Any]]] = {}
+            # Agents already analysed keep their stored role (see _save_and_assess)
+            skip_roles = DiscoveryService._analysed if use_llm_cache else None
+            if source == "objects":
+                # Paths from the object database are already relative to the repository root
+                agents = iter_discover_agents(
+                    checkout.mirror, cache=ExtractionCache(EXTRACTOR_VERSION), stats=stats, concurrency=concurrency,
+                    use_llm_cache=use_llm_cache, assign_roles=analysis_mode != "fused", only_files=only_files,
+                    git_rev=head, budget=budget, skip_roles=skip_roles,
+                )
+            else:
+                agents = iter_discover_agents(
+                    checkout.path, cache=ExtractionCache(EXTRACTOR_VERSION), stats=stats, concurrency=concurrency,
+                    use_llm_cache=use_llm_cache, assign_roles=analysis_mode != "fused", only_files=only_files,
+                    budget=budget, skip_roles=skip_roles,
+                )
+                agents = (DiscoveryService._relative_to(agent, checkout.path) for agent in agents)
+            for window in DiscoveryService._windows(agents, concurrency * 4):
+                # Later locations of agents already yielded; their agents are saved by now or in this window
+                updates = [agent for agent in window if agent.get("__update__")]
+                window = [agent for agent in window if not agent.get("__update__")]
+                saved_window = DiscoveryService._save_and_assess(
+                    window, concurrency, use_llm_cache, analysis_mode, metrics, risk_engine, tool_detector,
+                    similarity_index, budget,
+                ) if window else []
+                for agent in window + updates:
+                    found.setdefault(agent["id"], []).extend(agent["locations"])
+                for update in updates:
+                    DiscoveryService._save_locations(update)
+                for saved in saved_window:
+                    processed += 1
+                    yield {"event": "agent", "data": saved}
+                    yield {"event": "progress", "data": {
+                        "agents": processed,
+                        "files_seen": stats.get("files_seen", 0),
+                        "elapsed_seconds": round(time.monotonic() - started, 2),
+                    }}
+            # Only a completed scan replaces the stored files and moves the baseline; an interrupted one keeps
+            # the previous inventory and is redone from the old commit
+            affected = db.replace_repository_files(
+                github_repo_url, changes[0] + changes[1] if changes is not None else None, found
+            )
+            rescan["agents_retired"] = len(db.retire_orphaned_agents(affected))
+            db.save_repository_scan(github_repo_url, head, EXTRACTOR_VERSION)
+            if changes is not None:
+                # Agents of unchanged files were not rescanned; emit their stored rows so the result, like a
+                # snapshot's, is the repository's whole inventory
+                unchanged = [a for a in db.get_repository_agents(github_repo_url) if a["id"] not in found]
+                rescan["agents_changed"] = processed
+                rescan["agents_unchanged"] = len(unchanged)
+                for agent in unchanged:
+                    processed += 1
+                    yield {"event": "agent", "data": DiscoveryService._stored_agent(agent["id"])}
+
+            yield {"event": "done", "data": {
+                "agents": processed,
+                "from_snapshot": False,
+                "clone": clone_stats,
+                "rescan": rescan,
+                "stats": stats,
+                "analysis_mode": analysis_mode,
+                "analysis": metrics,
+                "risk_sources": risk_engine.stats(),
+                "tool_detection": tool_detector.stats(),
+                "similarity": similarity_index.stats(),
+                "budget": budget.stats(),
+                "llm_tokens": token_stats(),
+                "llm": llm_client_stats(),
+                "llm_cache": llm_cache_stats(),
+                "llm_transport": transport_stats(),
+                "llm_recording": recording_stats(),
+                "elapsed_seconds": round(time.monotonic() - started, 2),
+            }}
+        finally:
+            # Remove the worktree; the mirror is kept for the next scan
+            if checkout:
+                GitHubService.release_checkout(checkout)
+
+    @staticmethod
+    def _snapshot_events(
+        github_repo_url: str, scan: Dict[str, Any], started: float
+    ) -> Iterator[Dict[str, Any]]:
+        """Events for a repository unchanged since its last scan: its stored agents, no clone or LLM calls."""
+        agents = db.get_repository_agents(github_repo_url)
+        for agent in agents:
+            yield {"event": "agent", "data": agent}
+        yield {"event": "done", "data": {
+            "agents": len(agents),
+            "from_snapshot": True,
+            "rescan": {"mode": "snapshot", "head_commit": scan["head_sha"], "scanned_at": scan["scanned_at"]},
+            "elapsed_seconds": round(time.monotonic() - started, 2),
+        }}
+
+    @staticmethod
+    def _relative_to(agent: Dict[str, Any], root: str) -> Dict[str, Any]:
+        """The agent with its file paths relative to the repository root, stable across checkouts."""
+        locations = [
+            {**loc, "file": os.path.relpath(loc["file"], root).replace(os.sep, "/")} for loc in agent["locations"]
+        ]
+        return {**agent, "file": locations[0]["file"], "locations": locations}
+
+    @staticmethod
+    def _windows(agents: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+        window: List[Dict[str, Any]] = []
+        for agent in agents:
+            window.append(agent)
+            if len(window) >= size:
+                yield window
+                window = []
+        if window:
+            yield window
+
+    @staticmethod
+    def _save_and_assess(
+        agents: List[Dict[str, Any]],
+        concurrency: Optional[int] = None,
+        use_llm_cache: bool = True,
+        analysis_mode: str = "separate",
+        metrics: Optional[Dict[str, Dict[str, Any]]] = None,
+        risk_engine: Optional[RiskEngine] = None,
+        tool_detector: Optional[ToolMentionDetector] = None,
+        similarity_index: Optional[PromptSimilarityIndex] = None,
+        budget: Optional[ScanBudget] = None,
+    ) -> List[Dict[str, Any]]:
+        """Persist discovered agents with their tools and risk; return the stored rows in input order.
+
+        Rows are read back once their assessment is applied, so they carry
+        the risk verdict and a "tools" list.
+
+        The LLM calls for all agents run concurrently before anything is
+        written; rows are then saved and results applied serially in input
+        order. Per-agent call metrics are stored and summed into metrics.
+        Saved prompts are then indexed for near-duplicates, and the window's
+        borderline pairs compared by the LLM concurrently.
+
+        Agents reserve their estimated tokens from the budget in priority
+        order: most known or detected tools first (likeliest to be risky),
+        then cheapest. Those that do not fit get a heuristic assessment.
+        Agents already analysed in an earlier scan keep their stored analysis
+        (counted as "reused" in metrics) unless use_llm_cache is False.
+        """
+        risk_engine = risk_engine or RiskEngine()
+        tool_detector = tool_detector or ToolMentionDetector()
+        similarity_index = similarity_index or PromptSimilarityIndex()
+        budget = budget or ScanBudget()
+        # Same prompt, same id: an agent already analysed is only re-analysed when the LLM cache is bypassed
+        existing = [db.get_agent(agent["id"]) for agent in agents]
+        reused = [use_llm_cache and row is not None and row.get("risk") is not None for row in existing]
+        pending = [i for i in range(len(agents)) if not reused[i]]
+        agents = [
+            agent if reused[i] else DiscoveryService._detect_tools(agent, tool_detector)
+            for i, agent in enumerate(agents)
+        ]
+        known_tools = [DiscoveryService._known_tools(agent) for agent in agents]
+        estimates = {i: DiscoveryService._estimate_analysis_tokens(agents[i], analysis_mode) for i in pending}
+        ranked = sorted(
+            pending,
+            key=lambda i: (-len(known_tools[i]) - len(agents[i].get("__detected_tools__") or []), estimates[i]),
+        )
+        reserved = {i: estimates[i] for i in ranked if budget.reserve(estimates[i])}
+        analyse = DiscoveryService._profile_agent if analysis_mode == "fused" else DiscoveryService._assess_agent
+        heuristic = DiscoveryService._assess_heuristically
+        with bypass_llm_cache(not use_llm_cache):
+            results = run_llm_calls(
+                [
+                    partial(analyse if i in reserved else heuristic, agents[i], known_tools[i], risk_engine)
+                    for i in pending
+                ],
+                concurrency=concurrency,
+            )
+        assessments: List[Any] = [{} for _ in agents]
+        for i, result in zip(pending, results):
+            assessments[i] = result
+        for i, tokens in reserved.items():
+            usage = assessments[i].get("usage") if isinstance(assessments[i], dict) else None
+            # A failed analysis may still have spent tokens; keep its reservation
+            budget.settle(tokens, usage["prompt_tokens"] + usage["completion_tokens"] if usage else tokens)
+        borderline = []
+        for agent, assessment, row, reuse in zip(agents, assessments, existing, reused):
+            if reuse:
+                DiscoveryService._save_agent({**agent, "role": row["role"]})
+                if metrics is not None:
+                    DiscoveryService._add_metrics(metrics, {"mode": "reused"})
+                continue
+            if isinstance(assessment, BaseException):
+                assessment = {}
+            if agent.get("role") is None:
+                # Fused mode derives the role together with tools and risk
+                agent = {**agent, "role": assessment.get("role") or classify_prompt_role(agent["system_prompt"]).role}
+            DiscoveryService._save_agent(agent)
+            DiscoveryService._apply_assessment(agent["id"], assessment)
+            borderline.extend(similarity_index.index(agent["id"], agent["system_prompt"]))
+            usage = assessment.get("usage")
+            if usage:
+                db.add_analysis_metrics(agent["id"], usage)
+                if metrics is not None:
+                    DiscoveryService._add_metrics(metrics, usage)
+        if borderline:
+            with bypass_llm_cache(not use_llm_cache):
+                run_llm_calls(
+                    [partial(similarity_index.compare, pair, budget) for pair in borderline], concurrency=concurrency
+                )
+        return [DiscoveryService._stored_agent(agent["id"]) for agent in agents]
+
+    @staticmethod
+    def _analysed(agent_id: str) -> bool:
+        """Whether an agent with this id was already analysed (stored with a risk verdict)."""
+        row = db.get_agent(agent_id)
+        return row is not None and row.get("risk") is not None
+
+    @staticmethod
+    def _stored_agent(agent_id: str) -> Dict[str, Any]:
+        """An agent's stored row with its tools, as sent in "agent" events."""
+        return {**db.get_agent(agent_id), "tools": db.get_agent_tools(agent_id)}
+
+    @staticmethod
+    def _estimate_analysis_tokens(agent: Dict[str, Any], analysis_mode: str) -> int:
+        """Tokens the agent's LLM analysis is expected to cost, from the shaped prompt sizes."""
+        prompt_tokens = estimate_tokens(shape_text(agent["system_prompt"]))
+        if analysis_mode == "fused":
+            return estimate_tokens(AGENT_PROFILE_PROMPT) + prompt_tokens + EXPECTED_COMPLETION_TOKENS
+        tokens = estimate_tokens(AGENT_RISK_PROMPT) + EXPECTED_COMPLETION_TOKENS
+        if agent.get("framework") == "Custom" and agent.get("__tool_llm__", True):
+            tokens += estimate_tokens(TOOL_DETECTION_PROMPT) + prompt_tokens + EXPECTED_COMPLETION_TOKENS
+        return tokens
+
+    @staticmethod
+    def _detect_tools(agent: Dict[str, Any], tool_detector: ToolMentionDetector) -> Dict[str, Any]:
+        """Attach the tools found locally in a Custom agent's prompt, and whether the LLM should still look."""
+        if agent.get("framework") != "Custom":
+            return agent
+        detection = tool_detector.detect(agent["system_prompt"])
+        return {**agent, "__detected_tools__": detection.tools, "__tool_llm__": detection.needs_llm}
+
+    @staticmethod
+    def _merge_tools(*tool_lists: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        merged: Dict[str, Dict[str, Any]] = {}
+        for tools in tool_lists:
+            for t in tools:
+                merged.setdefault(t["name"], t)
+        return list(merged.values())
+
+    @staticmethod
+    def _known_tools(agent: Dict[str, Any]) -> List[str]:
+        names = [t.get("name") for t in db.get_agent_tools(agent["id"]) or []]
+        for name in agent.get("__lc_tools__") or []:
+            if name not in names:
+                names.append(name)
+        return names
+
+    @staticmethod
+    def _add_metrics(metrics: Dict[str, Dict[str, Any]], usage: Dict[str, Any]) -> None:
+        total = metrics.setdefault(usage["mode"], {
+            "agents": 0, "calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "estimated_prompt_tokens": 0, "seconds": 0.0, "fallbacks": 0,
+        })
+        total["agents"] += 1
+        for key in (
+            "calls", "cached_calls", "prompt_tokens", "completion_tokens", "estimated_prompt_tokens", "seconds",
+        ):
+            total[key] += usage.get(key, 0)
+        total["fallbacks"] += 1 if usage.get("fell_back") else 0
+        total["seconds"] = round(total["seconds"], 4)
+
+    @staticmethod
+    def _save_agent(agent: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist one discovered agent, its locations and pre-extracted tools; return the stored row."""
+        agent_data = {
+            "id": agent["id"],
+            "file_path": agent["file"],
+            "role": agent["role"],
+            "system_prompt": agent["system_prompt"],
+            "model": None,
+            "temperature": None,
+            "framework": agent.get("framework"),
+            "risk": None,
+            "risk_reason": None,
+        }
+        
+        # Check if agent already exists
+        existing_agent = db.get_agent(agent["id"])
+        if not existing_agent:
+            db.create_agent(agent_data)
+            saved_agent = agent_data
+        else:
+            saved_agent = existing_agent
+
+        DiscoveryService._save_locations(agent)
+        return saved_agent
+
+    @staticmethod
+    def _save_locations(agent: Dict[str, Any]) -> None:
+        """Persist an agent's locations and pre-extracted tools; also used for later location updates."""
+        db.add_agent_locations(agent["id"], agent.get("locations") or [])
+
+        # Persist any pre-extracted tools (from LangChain visitor)
+        pre_tools = agent.get("__lc_tools__")
+        if pre_tools:
+            for tname in pre_tools:
                 try:
-                    tools = db.get_agent_tools(agent_data["id"]) or []
-                    tool_names = [t.get("name") for t in tools]
-                    prompt = AGENT_RISK_PROMPT.format(role=agent_data["role"], tools=tool_names)
-                    risk_json = get_json_llm_response(prompt, "")
-                    risk = (risk_json.get("risk") or "").lower()
-                    if risk in ("low", "medium", "high"):
-                        # Update agent row with risk
-                        db.execute_update(
-                            "UPDATE agents SET risk = ?, risk_reason = ? WHERE id = ?",
-                            (risk, risk_json.get("reason"), agent_data["id"]) 
-                        )
+                    # Avoid duplicates by checking first
+                    if not db.has_agent_tool(agent["id"], tname):
+                        db.create_agent_tool({
+                            "agent_id": agent["id"],
+                            "name": tname,
+                            "description": None,
+                            "parameters": {}
+                        })
+                except Exception:
+                    pass
+
+    @staticmethod
+    async def _assess_agent(agent: Dict[str, Any], known_tools: List[str], risk_engine: RiskEngine) -> Dict[str, Any]:
+        """Detect tools (Custom agents) and assess risk via separate LLM calls, without touching the database."""
+        started = time.perf_counter()
+        with meter_llm_usage() as meter:
+            assessment = await DiscoveryService._assess_separately(agent, known_tools, risk_engine)
+        assessment["usage"] = {**meter, "mode": "separate", "seconds": round(time.perf_counter() - started, 4)}
+        return assessment
+
+    @staticmethod
+    async def _profile_agent(agent: Dict[str, Any], known_tools: List[str], risk_engine: RiskEngine) -> Dict[str, Any]:
+        """Fused analysis: role, tools and risk from one LLM call, falling back to separate calls.
+
+        The fallback is used for agents without a prompt and whenever the fused
+        answer is missing a role or a valid risk level.
+        """
+        started = time.perf_counter()
+        fell_back = False
+        with meter_llm_usage() as meter:
+            profile: Optional[Dict[str, Any]] = None
+            if agent["system_prompt"].strip():
+                try:
+                    prompt = (
+                        AGENT_PROFILE_PROMPT.format(tools=known_tools) + "\n\n" + shape_text(agent["system_prompt"])
+                    )
+                    profile = await aget_json_llm_response(prompt, "")
                 except MissingApiKeyError:
                     pass
-                except Exception as e:
+                except Exception:
                     pass
-            
-            return saved_agents
-            
-        finally:
-            # Clean up temporary directory
-            if temp_dir:
-                GitHubService.cleanup_temp_directory(temp_dir)
+            role = str((profile or {}).get("role") or "").strip()
+            risk = str((profile or {}).get("risk") or "").lower()
+            if profile is not None and role and risk in ("low", "medium", "high"):
+                detected = []
+                if agent.get("framework") == "Custom":
+                    detected = DiscoveryService._merge_tools(
+                        agent.get("__detected_tools__") or [],
+                        [t for t in profile.get("tools", []) or [] if isinstance(t, dict) and t.get("name")],
+                    )
+                tool_names = list(known_tools)
+                for t in detected:
+                    if t["name"] not in tool_names:
+                        tool_names.append(t["name"])
+                verdict = risk_engine.settle(role, tool_names, risk, profile.get("reason"))
+                assessment = {
+                    "role": role,
+                    "tools": detected,
+                    "risk": verdict.__dict__ if verdict is not None else None,
+                }
+            else:
+                fell_back = True
+                if agent.get("role") is None:
+                    agent = {**agent, "role": await DiscoveryService._fallback_role(agent["system_prompt"])}
+                assessment = await DiscoveryService._assess_separately(agent, known_tools, risk_engine)
+                assessment["role"] = agent["role"]
+        assessment["usage"] = {
+            **meter, "mode": "fused", "fell_back": fell_back, "seconds": round(time.perf_counter() - started, 4),
+        }
+        return assessment
+
+    @staticmethod
+    async def _assess_heuristically(
+        agent: Dict[str, Any], known_tools: List[str], risk_engine: RiskEngine
+    ) -> Dict[str, Any]:
+        """Over-budget analysis: local role guess, vocabulary tools and rule or memoized risk; no LLM calls."""
+        started = time.perf_counter()
+        role = agent.get("role") or classify_prompt_role(agent["system_prompt"]).role
+        detected = list(agent.get("__detected_tools__") or [])
+        tool_names = list(known_tools)
+        for t in detected:
+            if t["name"] not in tool_names:
+                tool_names.append(t["name"])
+        verdict = risk_engine.assess_locally(role, tool_names)
+        return {
+            "role": role,
+            "tools": detected,
+            "risk": verdict.__dict__ if verdict is not None else None,
+            "usage": {
+                "mode": "heuristic", "calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "estimated_prompt_tokens": 0, "seconds": round(time.perf_counter() - started, 4),
+            },
+        }
+
+    @staticmethod
+    async def _fallback_role(prompt: str) -> str:
+        if not prompt.strip():
+            return "Unknown"
+        guess = classify_prompt_role(prompt)
+        if guess.confidence >= DEFAULT_ROLE_CONFIDENCE:
+            return guess.role
+        try:
+            return await asummarize_prompt_role(prompt)
+        except Exception:
+            return guess.role
+
+    @staticmethod
+    async def _assess_separately(
+        agent: Dict[str, Any], known_tools: List[str], risk_engine: RiskEngine
+    ) -> Dict[str, Any]:
+        detected: List[Dict[str, Any]] = list(agent.get("__detected_tools__") or [])
+        # If custom agent: ask the LLM about tool wording the local detector could not resolve
+        if agent.get("framework") == "Custom" and agent.get("__tool_llm__", True):
+            try:
+                prompt = TOOL_DETECTION_PROMPT + "\n\n" + shape_text(agent["system_prompt"])
+                tools_json = await aget_json_llm_response(prompt, "")
+                detected = DiscoveryService._merge_tools(
+                    detected,
+                    [t for t in tools_json.get("tools", []) or [] if isinstance(t, dict) and t.get("name")],
+                )
+            except MissingApiKeyError:
+                pass
+            except Exception:
+                pass
+
+        # Compute agent risk from the tool taxonomy, the verdict memo or, for unseen combinations, the LLM
+        risk_json: Optional[Dict[str, Any]] = None
+        try:
+            tool_names = list(known_tools)
+            for t in detected:
+                if t["name"] not in tool_names:
+                    tool_names.append(t["name"])
+            prompt = AGENT_RISK_PROMPT.format(role=agent["role"], tools=tool_names)
+            verdict = await risk_engine.assess(
+                agent["role"], tool_names, partial(aget_json_llm_response, prompt, "")
+            )
+            risk_json = verdict.__dict__ if verdict is not None else None
+        except MissingApiKeyError:
+            pass
+        except Exception:
+            pass
+
+        return {"tools": detected, "risk": risk_json}
+
+    @staticmethod
+    def _apply_assessment(agent_id: str, assessment: Dict[str, Any]) -> None:
+        """Persist detected tools and the risk verdict of an assessment."""
+        for t in assessment.get("tools") or []:
+            try:
+                tname = t.get("name")
+                if tname and not db.has_agent_tool(agent_id, tname):
+                    db.create_agent_tool({
+                        "agent_id": agent_id,
+                        "name": tname,
+                        "description": t.get("description"),
+                        "parameters": t.get("parameters") or {}
+                    })
+            except Exception:
+                pass
+
+        risk_json = assessment.get("risk") or {}
+        risk = (risk_json.get("risk") or "").lower()
+        if risk in ("low", "medium", "high"):
+            # Update agent row with risk
+            db.execute_update(
+                "UPDATE agents SET risk = ?, risk_reason = ?, risk_source = ? WHERE id = ?",
+                (risk, risk_json.get("reason"), risk_json.get("source", "llm"), agent_id)
+            )
     
     @staticmethod
     def save_discovered_agent(agent_data: Dict[str, Any]) -> str:
@@ -1,13 +1,41 @@
 from __future__ import annotations
 
+import logging
 import os
-import shutil
 import subprocess
-import tempfile
-from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 import re
 
+from .discovery.git_source import run_git
+from .discovery.walker import CODE_EXTENSIONS
+from .repo_mirror import RepoCheckout, get_mirror_store
+
+
+logger = logging.getLogger(__name__)
+
+# full: every commit and blob; shallow: HEAD commit only; blobless: history without blobs, HEAD's
+# blobs fetched on checkout; sparse: HEAD commit and only the blobs of scannable files
+CLONE_MODES = ("full", "shallow", "blobless", "sparse")
+DEFAULT_CLONE_MODE = "sparse"
+LS_REMOTE_TIMEOUT = 30
+# Repositories GitHub reports as larger than this are not cloned (GIT_MAX_REPO_SIZE_MB env, 0 = no limit)
+DEFAULT_MAX_REPO_SIZE_MB = 2048
+# The only files discovery reads: code files, and .gitignore files for the walker's pruning
+SPARSE_PATTERNS = [f"*{ext}" for ext in CODE_EXTENSIONS] + [".gitignore"]
+
+
+def clone_mode() -> str:
+    mode = os.getenv("GIT_CLONE_MODE", DEFAULT_CLONE_MODE).lower()
+    return mode if mode in CLONE_MODES else DEFAULT_CLONE_MODE
+
+
+def max_repo_size_mb() -> Optional[float]:
+    try:
+        limit = float(os.getenv("GIT_MAX_REPO_SIZE_MB", DEFAULT_MAX_REPO_SIZE_MB))
+    except ValueError:
+        limit = DEFAULT_MAX_REPO_SIZE_MB
+    return limit if limit > 0 else None
+
 
 class GitHubService:
     """Service for handling GitHub repository operations"""
@@ -19,43 +47,106 @@ class GitHubService:
         return bool(re.match(github_pattern, url))
     
     @staticmethod
-    def clone_repository(github_url: str) -> str:
-        """Clone GitHub repository to temporary directory"""
+    def repository_size_mb(github_url: str) -> Optional[float]:
+        """Size GitHub reports for the repository (all history), or None if it cannot be fetched"""
+        import httpx
+
+        owner, name = github_url.rstrip("/").split("/")[-2:]
+        if name.endswith(".git"):
+            name = name[:-4]
+        headers = {"Accept": "application/vnd.github+json"}
+        token = os.getenv("GITHUB_TOKEN")
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            resp = httpx.get(f"https://api.github.com/repos/{owner}/{name}", headers=headers, timeout=10)
+            resp.raise_for_status()
+            return resp.json()["size"] / 1024  # reported in KB
+        except (httpx.HTTPError, KeyError, TypeError, ValueError) as e:
+            logger.warning("Could not fetch the size of %s: %s", github_url, e)
+            return None
+    
+    @staticmethod
+    def check_repository_size(github_url: str) -> Optional[float]:
+        """Reject repositories over GIT_MAX_REPO_SIZE_MB before cloning; returns the reported size"""
+        limit = max_repo_size_mb()
+        if limit is None:
+            return None
+        size = GitHubService.repository_size_mb(github_url)
+        if size is not None and size > limit:
+            raise ValueError(f"Repository is {size:.0f} MB, over the {limit:.0f} MB limit (GIT_MAX_REPO_SIZE_MB)")
+        return size
+    
+    @staticmethod
+    def checkout_repository(
+        github_url: str, mode: Optional[str] = None, stats: Optional[Dict[str, Any]] = None, worktree: bool = True
+    ) -> RepoCheckout:
+        """Check the repository out from its local mirror, cloning the mirror on first use
+
+        Repeat scans only fetch what changed since the last one. Release the
+        checkout with release_checkout(); the mirror itself is kept (up to
+        GIT_MIRROR_MAX_BYTES, least recently used mirrors evicted first).
+        With worktree=False nothing is checked out; read the mirror directly.
+        """
         if not GitHubService.validate_github_url(github_url):
             raise ValueError(f"Invalid GitHub URL: {github_url}")
-        
-        # Create temporary directory
-        temp_dir = tempfile.mkdtemp(prefix="doubletrust_github_")
+        mode = mode or clone_mode()
+        if mode not in CLONE_MODES:
+            raise ValueError(f"Unknown clone mode: {mode}")
+        store = get_mirror_store()
+        reported_mb = None
+        if not store.has_mirror(github_url, mode):
+            reported_mb = GitHubService.check_repository_size(github_url)
         
         try:
-            # Clone the repository
-            result = subprocess.run(
-                ["git", "clone", github_url, temp_dir],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
+            checkout = store.checkout(
+                github_url, mode, sparse_patterns=SPARSE_PATTERNS if mode == "sparse" else None, stats=stats,
+                worktree=worktree,
             )
-            
-            if result.returncode != 0:
-                raise RuntimeError(f"Failed to clone repository: {result.stderr}")
-            
-            return temp_dir
-            
         except subprocess.TimeoutExpired:
-            # Clean up on timeout
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            raise RuntimeError("Repository clone timed out")
+            raise RuntimeError("Repository fetch timed out")
         except Exception as e:
-            # Clean up on any error
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            raise RuntimeError(f"Failed to clone repository: {str(e)}")
+            raise RuntimeError(f"Failed to fetch repository: {str(e)}")
+        if stats is not None:
+            stats["reported_size_mb"] = round(reported_mb, 1) if reported_mb is not None else None
+        return checkout
     
     @staticmethod
-    def cleanup_temp_directory(path: str) -> None:
-        """Clean up temporary directory"""
+    def release_checkout(checkout: RepoCheckout) -> None:
+        """Remove a checkout's worktree and unlock its mirror"""
         try:
-            if os.path.exists(path):
-                shutil.rmtree(path)
+            get_mirror_store().release(checkout)
         except Exception as e:
             # Log error but don't raise to avoid masking other errors
-            print(f"Warning: Failed to cleanup temp directory {path}: {e}")
+            logger.warning("Failed to release checkout of %s: %s", checkout.mirror, e)
+    
+    @staticmethod
+    def remote_head(github_url: str) -> Optional[str]:
+        """SHA the remote's HEAD points at (one `git ls-remote` round trip), or None if it cannot be read"""
+        try:
+            output = run_git(["ls-remote", github_url, "HEAD"], timeout=LS_REMOTE_TIMEOUT)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            logger.warning("Could not read the HEAD of %s: %s", github_url, e)
+            return None
+        fields = output.split()
+        return fields[0] if fields else None
+    
+    @staticmethod
+    def changed_files(repo_path: str, old_sha: str, new_sha: str) -> Optional[Tuple[List[str], List[str]]]:
+        """(added or modified, deleted) files between two commits, or None if old_sha is not available
+
+        Renames are reported as a deletion plus an addition.
+        """
+        try:
+            output = run_git(
+                ["diff", "--name-status", "--no-renames", "-z", old_sha, new_sha], cwd=repo_path
+            )
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            logger.info("Cannot diff %s..%s, rescanning everything: %s", old_sha[:12], new_sha[:12], e)
+            return None
+        fields = output.split("\0")
+        changed: List[str] = []
+        deleted: List[str] = []
+        for status, path in zip(fields[0::2], fields[1::2]):
+            (deleted if status == "D" else changed).append(path)
+        return changed, deleted
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import random
+import re
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..database import db
+from .scan_budget import EXPECTED_COMPLETION_TOKENS, ScanBudget
+from llm_service.llm import MissingApiKeyError, aget_json_llm_response, meter_llm_usage
+from llm_service.transport import LLMUnavailableError
+from llm_service.shaping import estimate_tokens, max_input_tokens, shape_text
+from llm_service.prompts.duplicate_detection import DUPLICATE_DETECTION_PROMPT
+
+
+logger = logging.getLogger(__name__)
+
+# Words per shingle
+SHINGLE_SIZE = 3
+# 32 bands of 4 rows: pairs with Jaccard similarity around 0.5 become candidates ~87% of the time
+NUM_BANDS = 32
+ROWS_PER_BAND = 4
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+# Same cut-off as DUPLICATE_DETECTION_PROMPT's is_duplicate
+DUPLICATE_SIMILARITY = 0.9
+# Candidates estimated between this and DUPLICATE_SIMILARITY are compared by the LLM
+BORDERLINE_SIMILARITY = 0.5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(0x5EED)
+# Fixed seed: signatures are stored, so the permutations must not change between runs
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> List[str]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return list({" ".join(words[i:i + size]) for i in range(len(words) - size + 1)})
+
+
+def minhash(text: str) -> Optional[List[int]]:
+    """MinHash signature of the prompt's word shingles, or None for a prompt without words."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles(text)
+    ]
+    if not hashes:
+        return None
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(signature: Sequence[int]) -> List[Tuple[int, str]]:
+    """(band, bucket) keys of a signature; prompts sharing any key are candidate near-duplicates."""
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        key = hashlib.blake2b(struct.pack(f"<{ROWS_PER_BAND}I", *rows), digest_size=8).hexdigest()
+        buckets.append((band, key))
+    return buckets
+
+
+def estimate_similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of the two prompts' shingle sets."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def pack_signature(signature: Sequence[int]) -> bytes:
+    return struct.pack(f"<{len(signature)}I", *signature)
+
+
+def unpack_signature(blob: bytes) -> List[int]:
+    return list(struct.unpack(f"<{len(blob) // 4}I", blob))
+
+
+@dataclass
+class SimilarPair:
+    agent_id: str
+    other_id: str
+    similarity: float
+
+
+class PromptSimilarityIndex:
+    """Near-duplicate index over agents' system prompts (MinHash signatures + LSH banding).
+
+    Indexing a prompt looks up only the agents sharing one of its LSH
+    buckets, so clustering a new prompt does not scan the inventory.
+    Candidates whose estimated similarity reaches DUPLICATE_SIMILARITY are
+    recorded as duplicates directly; borderline ones are returned for an LLM
+    comparison with DUPLICATE_DETECTION_PROMPT.
+    """
+
+    def __init__(self) -> None:
+        self.counts = {
+            "indexed": 0, "candidates": 0, "duplicates": 0, "borderline": 0, "llm_compared": 0, "over_budget": 0,
+            "not_compared": 0,
+        }
+
+    def index(self, agent_id: str, prompt: str) -> List[SimilarPair]:
+        """Index an agent's prompt (once) and return its borderline pairs for LLM comparison."""
+        if db.get_prompt_signature(agent_id) is not None:
+            return []
+        signature = minhash(prompt)
+        if signature is None:
+            return []
+        buckets = lsh_buckets(signature)
+        candidates = [c for c in db.find_lsh_candidates(buckets) if c != agent_id]
+        db.save_prompt_signature(agent_id, pack_signature(signature), buckets)
+        self.counts["indexed"] += 1
+        self.counts["candidates"] += len(candidates)
+
+        borderline = []
+        for other_id, blob in db.get_prompt_signatures(candidates).items():
+            similarity = round(estimate_similarity(signature, unpack_signature(blob)), 4)
+            if similarity >= DUPLICATE_SIMILARITY:
+                self.counts["duplicates"] += 1
+                db.save_agent_similarity(agent_id, other_id, similarity, True, "minhash")
+            elif similarity >= BORDERLINE_SIMILARITY:
+                self.counts["borderline"] += 1
+                # Recorded as not-duplicate until (and unless) the LLM says otherwise
+                db.save_agent_similarity(agent_id, other_id, similarity, False, "minhash")
+                borderline.append(SimilarPair(agent_id, other_id, similarity))
+        return borderline
+
+    async def compare(self, pair: SimilarPair, budget: Optional[ScanBudget] = None) -> bool:
+        """Settle a borderline pair with the LLM; return whether it was compared.
+
+        When it was not (over budget, LLM unavailable or not configured, no
+        usable answer) the MinHash estimate stands.
+        """
+        first, second = db.get_agent(pair.agent_id), db.get_agent(pair.other_id)
+        if not first or not second:
+            return False
+        # Both prompts share one input allowance
+        half = max_input_tokens() // 2
+        prompt = DUPLICATE_DETECTION_PROMPT.format(
+            prompt1=shape_text(first["system_prompt"], half), prompt2=shape_text(second["system_prompt"], half)
+        )
+        reserved = estimate_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
+        if budget is not None and not budget.reserve(reserved):
+            self.counts["over_budget"] += 1
+            return False
+        spent = reserved
+        try:
+            with meter_llm_usage() as meter:
+                answer = await aget_json_llm_response(prompt, "")
+            spent = meter["prompt_tokens"] + meter["completion_tokens"]
+        except (LLMUnavailableError, MissingApiKeyError) as e:
+            logger.warning("Borderline pair %s/%s not compared: %s", pair.agent_id, pair.other_id, e)
+            self.counts["not_compared"] += 1
+            return False
+        finally:
+            if budget is not None:
+                budget.settle(reserved, spent)
+        try:
+            score = float(answer.get("similarity_score"))
+        except (TypeError, ValueError):
+            self.counts["not_compared"] += 1
+            return False
+        is_duplicate = bool(answer.get("is_duplicate", score >= DUPLICATE_SIMILARITY))
+        self.counts["llm_compared"] += 1
+        self.counts["duplicates"] += 1 if is_duplicate else 0
+        db.save_agent_similarity(
+            pair.agent_id, pair.other_id, round(score, 4), is_duplicate, "llm", answer.get("explanation")
+        )
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+
+def similar_agents(agent_id: str) -> Dict[str, Any]:
+    """An agent's recorded near-duplicates and its duplicate cluster (agents linked by duplicate pairs)."""
+    cluster = {agent_id}
+    frontier = [agent_id]
+    while frontier:
+        current = frontier.pop()
+        for row in db.get_similar_agents(current, duplicates_only=True):
+            if row["agent_id"] not in cluster:
+                cluster.add(row["agent_id"])
+                frontier.append(row["agent_id"])
+    return {
+        "agent_id": agent_id,
+        "similar": db.get_similar_agents(agent_id),
+        "cluster": sorted(cluster),
+    }
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional
+
+from .discovery.git_source import run_git
+
+try:
+    import fcntl
+except ImportError:  # Windows: mirrors are then only locked within this process
+    fcntl = None  # type: ignore[assignment]
+
+
+logger = logging.getLogger(__name__)
+
+# Bare mirrors live next to the other local caches and can be deleted freely
+DEFAULT_MIRROR_DIR = str(Path(__file__).resolve().parents[1] / "git_mirrors")
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+_LAST_USED = "doubletrust-last-used"
+_SIZE = "doubletrust-bytes"
+_thread_locks: Dict[str, Dict[str, Any]] = {}
+_thread_locks_cond = threading.Condition()
+
+
+def _dir_bytes(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _object_bytes(mirror: Path) -> int:
+    """Size of a mirror's object database from `git count-objects -v`, without walking it."""
+    counts = dict(
+        line.split(": ", 1) for line in run_git(["count-objects", "-v"], cwd=str(mirror)).splitlines() if ": " in line
+    )
+    return sum(int(counts.get(key, 0)) for key in ("size", "size-pack", "size-garbage")) * 1024
+
+
+def _mirror_bytes(mirror: Path) -> int:
+    """Size recorded at the mirror's last clone or fetch; measured (and recorded) if there is none."""
+    try:
+        return int((mirror / _SIZE).read_text())
+    except (OSError, ValueError):
+        pass
+    try:
+        size = _object_bytes(mirror)
+    except (RuntimeError, subprocess.TimeoutExpired):
+        return 0
+    (mirror / _SIZE).write_text(str(size))
+    return size
+
+
+def mirror_key(url: str, mode: str) -> str:
+    """Directory name of a repository's mirror: readable owner/name plus a hash of the URL and clone mode."""
+    normalized = url.strip().rstrip("/").lower()
+    if normalized.endswith(".git"):
+        normalized = normalized[:-4]
+    readable = re.sub(r"[^a-z0-9_.-]+", "_", "__".join(normalized.split("/")[-2:]))
+    digest = hashlib.sha256(f"{normalized}#{mode}".encode("utf-8")).hexdigest()[:12]
+    return f"{readable}-{mode}-{digest}"
+
+
+class _MirrorLock:
+    """Shared or exclusive lock on a file under the mirror root, held across processes."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh: Optional[IO[str]] = None
+        self._held: Optional[str] = None
+
+    def acquire(self, shared: bool = False, blocking: bool = True) -> bool:
+        if fcntl is None:
+            return self._acquire_in_process(shared, blocking)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(self.path, "a+")
+        flags = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(fh, flags)
+        except OSError:
+            fh.close()
+            return False
+        self._fh = fh
+        return True
+
+    def _acquire_in_process(self, shared: bool, blocking: bool) -> bool:
+        # Without flock, mirrors are only locked against other threads of this process
+        with _thread_locks_cond:
+            state = _thread_locks.setdefault(str(self.path), {"readers": 0, "writer": False})
+            while state["writer"] or (not shared and state["readers"]):
+                if not blocking:
+                    return False
+                _thread_locks_cond.wait()
+            if shared:
+                state["readers"] += 1
+            else:
+                state["writer"] = True
+            self._held = "shared" if shared else "exclusive"
+            return True
+
+    def release(self) -> None:
+        if self._fh is not None:
+            self._fh.close()  # closing drops the flock
+            self._fh = None
+        if self._held is not None:
+            with _thread_locks_cond:
+                state = _thread_locks[str(self.path)]
+                if self._held == "shared":
+                    state["readers"] -= 1
+                else:
+                    state["writer"] = False
+                self._held = None
+                _thread_locks_cond.notify_all()
+
+
+@dataclass
+class RepoCheckout:
+    """A worktree of a mirrored repository, holding its mirror's usage lock until RepoMirrorStore.release().
+
+    path is None when no worktree was requested; the mirror is then read directly at commit.
+    """
+    path: Optional[str]
+    mirror: str
+    commit: str
+    lock: _MirrorLock
+
+
+class RepoMirrorStore:
+    """On-disk bare mirrors of scanned repositories, keyed by URL and clone mode.
+
+    The first scan of a repository clones a bare mirror; later scans fetch
+    only new objects into it. Each scan gets its own detached worktree, so
+    concurrent scans of one repository never share a checkout. A scan holds
+    the mirror's usage lock shared until it is released, which keeps the
+    mirror from being evicted under it; cloning, fetching and adding a
+    worktree are serialized per mirror by its update lock. Fetches only add
+    objects, so they are safe while other worktrees are in use. Each mirror's
+    object size is recorded after every clone or fetch; once the recorded
+    sizes exceed max_bytes, the least recently used mirrors nobody is using
+    are deleted whole.
+    """
+
+    def __init__(self, root: str = DEFAULT_MIRROR_DIR, max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.counts = {"clones": 0, "fetches": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def _lock_for(self, key: str, kind: str = "use") -> _MirrorLock:
+        return _MirrorLock(self.root / f"{key}.{kind}.lock")
+
+    def has_mirror(self, url: str, mode: str) -> bool:
+        return (self.root / mirror_key(url, mode) / "HEAD").exists()
+
+    def checkout(
+        self,
+        url: str,
+        mode: str,
+        sparse_patterns: Optional[List[str]] = None,
+        stats: Optional[Dict[str, Any]] = None,
+        worktree: bool = True,
+    ) -> RepoCheckout:
+        """Bring the mirror of url up to date and check HEAD out into a new temporary worktree.
+
+        Shallow mirrors ("shallow", "sparse") clone and fetch with depth 1;
+        blob-filtered ones ("blobless", "sparse") only fetch the blobs their
+        worktrees check out. With sparse_patterns, only matching files are
+        checked out. With worktree=False the mirror is only brought up to
+        date, for callers that read its objects directly.
+        """
+        key = mirror_key(url, mode)
+        mirror = self.root / key
+        lock = self._lock_for(key)
+        lock.acquire(shared=True)
+        update_lock = self._lock_for(key, "update")
+        update_lock.acquire()
+        path: Optional[str] = None
+        try:
+            started = time.monotonic()
+            existed = (mirror / "HEAD").exists()
+            before = _mirror_bytes(mirror) if existed else 0
+            if existed:
+                self._fetch(mirror, mode)
+            else:
+                self._clone(url, mirror, mode)
+            # Resolved under the update lock: a later fetch may move the mirror's HEAD
+            commit = run_git(["rev-parse", "HEAD"], cwd=str(mirror)).strip()
+            if worktree:
+                path = tempfile.mkdtemp(prefix="doubletrust_worktree_")
+                self._add_worktree(mirror, path, commit, sparse_patterns)
+            # Measured after the checkout, which fetches the blobs of blob-filtered mirrors
+            size = _object_bytes(mirror)
+            (mirror / _SIZE).write_text(str(size))
+            (mirror / _LAST_USED).touch()
+            if stats is not None:
+                stats.update({
+                    "mode": mode,
+                    "mirror": key,
+                    "incremental": existed,
+                    "bytes_fetched": size - before,
+                    # A worktree's .git is a file pointing into the mirror, so this is the checked-out files only
+                    "bytes_checked_out": _dir_bytes(Path(path)) if path else 0,
+                    "seconds": round(time.monotonic() - started, 2),
+                })
+        except BaseException:
+            if path:
+                shutil.rmtree(path, ignore_errors=True)
+            lock.release()
+            raise
+        finally:
+            update_lock.release()
+        try:
+            self.evict(keep=key)
+        except Exception as e:
+            logger.warning("Mirror eviction failed: %s", e)
+        return RepoCheckout(path, str(mirror), commit, lock)
+
+    def release(self, checkout: RepoCheckout) -> None:
+        """Delete the worktree and release the mirror; its metadata is pruned on the next checkout."""
+        if checkout.path:
+            shutil.rmtree(checkout.path, ignore_errors=True)
+        checkout.lock.release()
+
+    def _clone(self, url: str, mirror: Path, mode: str) -> None:
+        mirror.parent.mkdir(parents=True, exist_ok=True)
+        partial = mirror.with_name(mirror.name + ".partial")
+        shutil.rmtree(partial, ignore_errors=True)
+        args = ["clone", "--bare", "--no-tags", "--single-branch", *self._shape_flags(mode), url, str(partial)]
+        try:
+            run_git(args)
+            # Bare clones have no fetch refspec; track only the cloned branch, so fetches never pull the others
+            branch = run_git(["symbolic-ref", "--short", "HEAD"], cwd=str(partial)).strip()
+            run_git(["config", "remote.origin.fetch", f"+refs/heads/{branch}:refs/heads/{branch}"], cwd=str(partial))
+        except BaseException:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+        # Only complete mirrors appear under their key
+        partial.rename(mirror)
+        with self._lock:
+            self.counts["clones"] += 1
+
+    def _fetch(self, mirror: Path, mode: str) -> None:
+        # The blob filter is remembered in the mirror's config; depth has to be repeated
+        depth = ["--depth", "1"] if mode in ("shallow", "sparse") else []
+        run_git(["fetch", "--prune", "--no-tags", *depth, "origin"], cwd=str(mirror))
+        run_git(["worktree", "prune"], cwd=str(mirror))
+        with self._lock:
+            self.counts["fetches"] += 1
+
+    @staticmethod
+    def _shape_flags(mode: str) -> List[str]:
+        flags = []
+        if mode in ("shallow", "sparse"):
+            flags += ["--depth", "1"]
+        if mode in ("blobless", "sparse"):
+            flags.append("--filter=blob:none")
+        return flags
+
+    @staticmethod
+    def _add_worktree(mirror: Path, worktree: str, commit: str, sparse_patterns: Optional[List[str]]) -> None:
+        if not sparse_patterns:
+            run_git(["worktree", "add", "--detach", worktree, commit], cwd=str(mirror))
+            return
+        run_git(["config", "core.sparseCheckout", "true"], cwd=str(mirror))
+        run_git(["worktree", "add", "--no-checkout", "--detach", worktree, commit], cwd=str(mirror))
+        # Each worktree has its own sparse-checkout file under the mirror
+        sparse_file = Path(run_git(["rev-parse", "--git-path", "info/sparse-checkout"], cwd=worktree).strip())
+        if not sparse_file.is_absolute():
+            sparse_file = Path(worktree) / sparse_file
+        sparse_file.parent.mkdir(parents=True, exist_ok=True)
+        sparse_file.write_text("\n".join(sparse_patterns) + "\n", encoding="utf-8")
+        run_git(["read-tree", "-mu", "HEAD"], cwd=worktree)
+
+    def _mirrors(self) -> List[Path]:
+        if not self.root.exists():
+            return []
+        return [p for p in self.root.iterdir() if p.is_dir() and (p / "HEAD").exists()]
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete least recently used mirrors until the store fits in max_bytes; mirrors in use are skipped."""
+        if self.max_bytes is None:
+            return 0
+        mirrors = []
+        for path in self._mirrors():
+            marker = path / _LAST_USED
+            last_used = marker.stat().st_mtime if marker.exists() else 0.0
+            mirrors.append((last_used, path, _mirror_bytes(path)))
+        total = sum(size for _, _, size in mirrors)
+        removed = 0
+        for _, path, size in sorted(mirrors, key=lambda m: m[0]):
+            if total <= self.max_bytes:
+                break
+            if path.name == keep:
+                continue
+            lock = self._lock_for(path.name)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                lock.release()
+            logger.info("Evicted repository mirror %s (%d bytes)", path.name, size)
+            total -= size
+            removed += 1
+        with self._lock:
+            self.counts["evictions"] += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        mirrors = self._mirrors()
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            "mirrors": len(mirrors),
+            "bytes": sum(_mirror_bytes(p) for p in mirrors),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_store: Optional[RepoMirrorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_mirror_store() -> RepoMirrorStore:
+    """Process-wide mirror store at GIT_MIRROR_DIR, capped at GIT_MIRROR_MAX_BYTES (0 = no cap)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                max_bytes: Optional[int] = int(float(os.getenv("GIT_MIRROR_MAX_BYTES", DEFAULT_MAX_BYTES)))
+            except ValueError:
+                max_bytes = DEFAULT_MAX_BYTES
+            _store = RepoMirrorStore(os.getenv("GIT_MIRROR_DIR", DEFAULT_MIRROR_DIR), max_bytes or None)
+        return _store
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..database import db
+
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = ("low", "medium", "high")
+_SEVERITY = {level: rank for rank, level in enumerate(RISK_LEVELS)}
+
+
+@dataclass(frozen=True)
+class ToolCategory:
+    name: str
+    risk: str
+    description: str
+    terms: Tuple[str, ...]
+
+
+# AGENT_RISK_PROMPT's severity calibration as a taxonomy of tool names. A tool
+# takes the first category with a term among the words of its name (file_read,
+# FileSystemTool, "web search" ...), so more dangerous categories come first.
+# Generic verbs only count next to a domain word: "db+delete" needs both words
+# somewhere in the name, so delete_draft or process_refund stay uncategorized.
+_DB_NOUNS = ("sql", "db", "database", "table", "tables", "rows", "mongo", "mongodb", "postgres", "mysql", "sqlite")
+_DB_VERBS = ("insert", "update", "delete", "drop", "truncate", "upsert", "write")
+_REPO_NOUNS = ("git", "repo", "repository", "branch", "pull request", "pr")
+_WEB_VERBS = ("fetch", "request", "requests", "visit", "browse", "download")
+_WEB_NOUNS = ("url", "urls", "page", "webpage", "website", "api", "html")
+_READ_VERBS = ("read", "get", "list", "search", "view", "check", "lookup", "query", "find")
+TOOL_TAXONOMY: Tuple[ToolCategory, ...] = (
+    ToolCategory("shell", "high", "process or shell execution", (
+        "shell", "terminal", "bash", "zsh", "powershell", "cmd", "command", "subprocess", "exec",
+        *(f"{verb}+{noun}" for verb in ("spawn", "kill", "run", "start") for noun in ("process", "processes")),
+    )),
+    ToolCategory("code_execution", "high", "code execution", (
+        "repl", "python repl", "code interpreter", "interpreter", "execute code", "run code", "eval", "jupyter",
+        "sandbox", *(f"{verb}+notebook" for verb in ("run", "execute", "exec")),
+    )),
+    ToolCategory("filesystem", "high", "filesystem access", (
+        "file", "files", "filesystem", "fs", "directory", "folder", "disk", "upload", "download",
+    )),
+    ToolCategory("secrets", "high", "secrets access", (
+        "secret", "secrets", "vault", "credential", "credentials", "password", "passwords", "keychain",
+        "api key", "token",
+    )),
+    ToolCategory("cloud_admin", "high", "cloud or service administration", (
+        "aws", "gcp", "azure", "cloud", "kubernetes", "k8s", "kubectl", "terraform", "docker", "ec2", "s3", "iam",
+        "admin", "deploy", "deployment",
+    )),
+    ToolCategory("repo_write", "high", "repository write access", (
+        "git push", "create pull request", "create branch", "create file", "update file", "delete file", "repo write",
+        *(f"{verb}+{noun}" for verb in ("push", "commit", "merge") for noun in _REPO_NOUNS),
+    )),
+    ToolCategory("database_write", "high", "database writes", (
+        "execute sql", "run sql", "sql execute",
+        *(f"{noun}+{verb}" for noun in _DB_NOUNS for verb in _DB_VERBS),
+    )),
+    ToolCategory("network", "high", "unrestricted network access", (
+        "http", "https", "curl", "wget", "webhook", "browser", "playwright", "selenium", "scrape", "scraper",
+        "crawl", "crawler", *(f"{verb}+{noun}" for verb in _WEB_VERBS for noun in _WEB_NOUNS),
+        *(f"requests+{method}" for method in ("get", "post", "put", "patch", "delete")),
+    )),
+    ToolCategory("payments", "high", "payments or money movement", (
+        "payment", "payments", "stripe", "paypal", "transfer", "purchase", "checkout", "invoice",
+    )),
+    ToolCategory("messaging", "medium", "sending messages", (
+        "email", "gmail", "mail", "slack", "sms", "twilio", "discord", "telegram", "send message", "notify",
+    )),
+    ToolCategory("public_data", "medium", "public data access", (
+        "search", "web search", "google", "bing", "serp", "serpapi", "tavily", "duckduckgo", "ddg", "wikipedia",
+        "wiki", "arxiv", "pubmed", "news", "weather", "youtube", "stock", "finance",
+    )),
+    ToolCategory("internal_read", "medium", "read-only internal resources", (
+        "sql", "db", "database", "query", "github", "gitlab", "jira", "confluence", "notion", "crm",
+        "salesforce", "hubspot", "drive", "sheets",
+        *(f"{verb}+{noun}" for verb in _READ_VERBS for noun in ("calendar", "docs")),
+    )),
+    ToolCategory("reasoning", "low", "reasoning-only helpers", (
+        "calculator", "calc", "math", "llm math", "datetime", "date", "time", "clock", "convert", "converter",
+        "summarize", "summarizer", "translate", "translator", "dictionary", "thesaurus", "retriever", "retrieval",
+        "vectorstore", "vector store", "vector search", "knowledge base", "faq", "rag", "echo", "random",
+    )),
+)
+
+
+def _words(name: str) -> str:
+    """'FileSystemTool' / 'file-system_tool' -> ' file system tool ' for whole-word matching."""
+    spaced = re.sub(r"([A-Z]+)([A-Z][a-z])", r"\1 \2", name.strip())
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", spaced)
+    return " " + " ".join(re.findall(r"[a-z0-9]+", spaced.lower())) + " "
+
+
+def categorize_tool(name: str) -> Optional[ToolCategory]:
+    # Also match the unsplit name, so "GitHub" is "github" and not only "git hub"
+    words = _words(name) + " ".join(re.findall(r"[a-z0-9]+", name.lower())) + " "
+    for category in TOOL_TAXONOMY:
+        if any(all(f" {part} " in words for part in term.split("+")) for term in category.terms):
+            return category
+    return None
+
+
+def risk_key(role: str, tools: Iterable[str]) -> Tuple[str, str]:
+    """Canonical memo key: normalized role and the sorted, de-duplicated tool set."""
+    role_key = " ".join(str(role or "").lower().split())
+    tools_key = ",".join(sorted({_words(t).strip() for t in tools if t and str(t).strip()}))
+    return role_key, tools_key
+
+
+@dataclass
+class RiskVerdict:
+    risk: str
+    reason: Optional[str]
+    # "rules", "cache" or "llm"
+    source: str
+
+
+def rule_verdict(tools: Iterable[str]) -> Optional[RiskVerdict]:
+    """Score a toolset from the taxonomy alone; None when any tool is not covered."""
+    worst: Optional[Tuple[str, ToolCategory]] = None
+    for tool in tools:
+        if not tool:
+            continue
+        category = categorize_tool(tool)
+        if category is None:
+            return None
+        if worst is None or _SEVERITY[category.risk] > _SEVERITY[worst[1].risk]:
+            worst = (tool, category)
+    if worst is None:
+        return RiskVerdict("low", "No external tools; reasoning-only agent", "rules")
+    tool, category = worst
+    return RiskVerdict(category.risk, f"{tool}: {category.description} ({category.risk} risk)", "rules")
+
+
+class RiskEngine:
+    """Deterministic risk scoring with memoized LLM verdicts for uncovered toolsets.
+
+    Toolsets fully covered by TOOL_TAXONOMY are scored locally. Other (role,
+    toolset) combinations are looked up in an in-process memo, then in the
+    risk_verdicts table; only unseen ones reach the LLM, and concurrent
+    requests for the same combination share one call.
+    """
+
+    def __init__(self) -> None:
+        self._memo: Dict[Tuple[str, str], RiskVerdict] = {}
+        self._inflight: Dict[Tuple[str, str], "asyncio.Future[Optional[RiskVerdict]]"] = {}
+        self.counts = {"rules": 0, "cache": 0, "llm": 0, "unassessed": 0}
+
+    def lookup(self, role: str, tools: List[str]) -> Optional[RiskVerdict]:
+        """Verdict from the rules or the memo, without calling the LLM."""
+        verdict = rule_verdict(tools)
+        if verdict is not None:
+            return verdict
+        key = risk_key(role, tools)
+        verdict = self._memo.get(key)
+        if verdict is None:
+            row = db.get_risk_verdict(*key)
+            if row is not None:
+                verdict = self._memo[key] = RiskVerdict(row["risk"], row["reason"], "cache")
+        if verdict is not None:
+            return RiskVerdict(verdict.risk, verdict.reason, "cache")
+        return None
+
+    def assess_locally(self, role: str, tools: List[str]) -> Optional[RiskVerdict]:
+        """Verdict from the rules or the memo only (None if neither covers it), counted like assess()."""
+        verdict = self.lookup(role, tools)
+        self.counts[verdict.source if verdict is not None else "unassessed"] += 1
+        return verdict
+
+    def remember(self, role: str, tools: List[str], risk: str, reason: Optional[str]) -> None:
+        """Memoize an LLM verdict obtained elsewhere (e.g. from a fused analysis)."""
+        key = risk_key(role, tools)
+        self._memo[key] = RiskVerdict(risk, reason, "llm")
+        db.save_risk_verdict(key[0], key[1], risk, reason)
+
+    def settle(self, role: str, tools: List[str], risk: str, reason: Optional[str]) -> Optional[RiskVerdict]:
+        """Verdict for an answer the LLM already gave (fused analysis).
+
+        Rules and memoized verdicts take precedence; otherwise the answer is
+        memoized and used.
+        """
+        verdict = self.lookup(role, tools)
+        if verdict is None and risk in RISK_LEVELS:
+            self.remember(role, tools, risk, reason)
+            verdict = RiskVerdict(risk, reason, "llm")
+        self.counts[verdict.source if verdict is not None else "unassessed"] += 1
+        return verdict
+
+    async def assess(
+        self, role: str, tools: List[str], ask_llm: Callable[[], Awaitable[Optional[Dict[str, str]]]]
+    ) -> Optional[RiskVerdict]:
+        """Verdict for (role, tools), calling ask_llm only for unseen uncovered combinations."""
+        verdict = self.lookup(role, tools)
+        if verdict is not None:
+            self.counts[verdict.source] += 1
+            return verdict
+        key = risk_key(role, tools)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            verdict = await asyncio.shield(pending)
+            if verdict is not None:
+                self.counts["cache"] += 1
+                return RiskVerdict(verdict.risk, verdict.reason, "cache")
+            self.counts["unassessed"] += 1
+            return None
+        future: "asyncio.Future[Optional[RiskVerdict]]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        verdict = None
+        try:
+            answer = await ask_llm()
+            risk = str((answer or {}).get("risk") or "").lower()
+            if risk in RISK_LEVELS:
+                verdict = RiskVerdict(risk, (answer or {}).get("reason"), "llm")
+                self.remember(role, tools, risk, verdict.reason)
+        finally:
+            future.set_result(verdict)
+            del self._inflight[key]
+        self.counts["llm" if verdict is not None else "unassessed"] += 1
+        return verdict
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counts)
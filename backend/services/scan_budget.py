@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Completion tokens to reserve per LLM call before its real usage is known
+EXPECTED_COMPLETION_TOKENS = 150
+
+
+def scan_token_budget() -> Optional[int]:
+    """SCAN_TOKEN_BUDGET env: prompt + completion tokens one scan may spend (unset or 0: no limit)."""
+    try:
+        budget = int(os.getenv("SCAN_TOKEN_BUDGET", "0"))
+    except ValueError:
+        return None
+    return budget if budget > 0 else None
+
+
+class ScanBudget:
+    """Token ceiling for the LLM analysis of one scan.
+
+    Work reserves its estimated tokens before calling the LLM and settles the
+    reservation with the tokens actually reported afterwards (cached answers
+    cost nothing). Once a reservation no longer fits, callers fall back to
+    local heuristics. A budget of None never runs out.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None):
+        self.max_tokens = max_tokens
+        self.used = 0
+        self.reserved = 0
+        self.counts = {"llm": 0, "heuristic": 0}
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> bool:
+        with self._lock:
+            if self.max_tokens is not None and self.used + self.reserved + tokens > self.max_tokens:
+                self.counts["heuristic"] += 1
+                return False
+            self.reserved += tokens
+            self.counts["llm"] += 1
+            return True
+
+    def settle(self, reserved: int, actual: int) -> None:
+        with self._lock:
+            self.reserved -= reserved
+            self.used += actual
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_tokens is not None and self.used + self.reserved >= self.max_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_tokens": self.max_tokens,
+                "used_tokens": self.used,
+                "llm_items": self.counts["llm"],
+                "heuristic_items": self.counts["heuristic"],
+            }
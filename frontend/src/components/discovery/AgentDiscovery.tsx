@@ -1,24 +1,53 @@
-import React, { useState } from 'react';
-import { useMutation, useQueryClient } from 'react-query';
+import React, { useEffect, useRef, useState } from 'react';
+import { useQueryClient } from 'react-query';
 import { discoveryApi } from '../../services/api';
-import { ApiError } from '../../types';
 import Button from '../common/Button';
 
+const STAGE_LABELS: Record<string, string> = {
+  clone: 'Cloning repository...',
+  scan: 'Scanning and classifying agents...',
+};
+
 const AgentDiscovery: React.FC = () => {
   const [githubUrl, setGithubUrl] = useState('');
   const [isValidUrl, setIsValidUrl] = useState(true);
+  const [isRunning, setIsRunning] = useState(false);
+  const [stage, setStage] = useState<string | null>(null);
+  const [agentsFound, setAgentsFound] = useState(0);
+  const [error, setError] = useState<string | null>(null);
+  const [successMessage, setSuccessMessage] = useState<string | null>(null);
+  const closeStream = useRef<(() => void) | null>(null);
   const queryClient = useQueryClient();
 
-  const discoverMutation = useMutation(
-    (url: string) => discoveryApi.discoverAgents(url),
-    {
-      onSuccess: () => {
+  // Close any open stream when leaving the page
+  useEffect(() => () => closeStream.current?.(), []);
+
+  const startDiscovery = (url: string) => {
+    setIsRunning(true);
+    setStage(null);
+    setAgentsFound(0);
+    setError(null);
+    setSuccessMessage(null);
+    closeStream.current = discoveryApi.streamAgents(url, {
+      onStage: setStage,
+      onAgent: () => {
+        // Show each agent in the inventory as soon as it is saved
+        setAgentsFound(count => count + 1);
+        queryClient.invalidateQueries('agents');
+      },
+      onDone: summary => {
+        setIsRunning(false);
+        setSuccessMessage(`Successfully discovered ${summary.agents} agents in ${summary.elapsed_seconds}s`);
         queryClient.invalidateQueries('agents');
         queryClient.invalidateQueries('discovery-status');
         setGithubUrl('');
       },
-    }
-  );
+      onError: message => {
+        setIsRunning(false);
+        setError(message);
+      },
+    });
+  };
 
   const validateGithubUrl = (url: string) => {
     const githubPattern = /^https:\/\/github\.com\/[a-zA-Z0-9_.-]+\/[a-zA-Z0-9_.-]+\/?$/;
@@ -33,7 +62,7 @@ const AgentDiscovery: React.FC = () => {
 
   const handleDiscover = () => {
     if (githubUrl && isValidUrl) {
-      discoverMutation.mutate(githubUrl);
+      startDiscovery(githubUrl);
     }
   };
 
@@ -78,10 +107,10 @@ const AgentDiscovery: React.FC = () => {
         <div className="flex items-center space-x-4">
           <Button
             onClick={handleDiscover}
-            disabled={!githubUrl || !isValidUrl || discoverMutation.isLoading}
+            disabled={!githubUrl || !isValidUrl || isRunning}
             variant="primary"
           >
-            {discoverMutation.isLoading ? (
+            {isRunning ? (
               <>
                 <div className="animate-spin rounded-full h-4 w-4 border-b-2 border-white mr-2"></div>
                 Discovering...
@@ -90,9 +119,14 @@ const AgentDiscovery: React.FC = () => {
               'Discover Agents'
             )}
           </Button>
+          {isRunning && (
+            <p className="text-sm text-gray-600">
+              {(stage && STAGE_LABELS[stage]) || 'Starting discovery...'} {agentsFound > 0 && `${agentsFound} agents found so far`}
+            </p>
+          )}
         </div>
 
-        {discoverMutation.isError && (
+        {error && (
           <div className="bg-red-50 border border-red-200 rounded-lg p-4">
             <div className="flex">
               <div className="flex-shrink-0">
@@ -103,14 +137,14 @@ const AgentDiscovery: React.FC = () => {
               <div className="ml-3">
                 <h3 className="text-sm font-medium text-red-800">Discovery Failed</h3>
                 <p className="mt-1 text-sm text-red-700">
-                  {(discoverMutation.error as ApiError)?.message || 'An error occurred during discovery'}
+                  {error || 'An error occurred during discovery'}
                 </p>
               </div>
             </div>
           </div>
         )}
 
-        {discoverMutation.isSuccess && (
+        {successMessage && (
           <div className="bg-green-50 border border-green-200 rounded-lg p-4">
             <div className="flex">
               <div className="flex-shrink-0">
@@ -121,7 +155,7 @@ const AgentDiscovery: React.FC = () => {
               <div className="ml-3">
                 <h3 className="text-sm font-medium text-green-800">Discovery Successful</h3>
                 <p className="mt-1 text-sm text-green-700">
-                  {discoverMutation.data?.message || 'Agents discovered successfully'}
+                  {successMessage}
                 </p>
               </div>
             </div>
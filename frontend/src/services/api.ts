@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Agent, Tool, DiscoveryStatus, ToolExecuteRequest, ToolExecuteResponse, ToolSelectionRequest, ToolSelectionResponse } from '../types';
+import { Agent, SimilarAgent, Tool, DiscoveryStatus, DiscoveryStreamHandlers, ToolExecuteRequest, ToolExecuteResponse, ToolSelectionRequest, ToolSelectionResponse } from '../types';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
@@ -23,6 +23,9 @@ export const agentsApi = {
   getTools: (id: string): Promise<{ agent_id: string; tools: Tool[] }> =>
     api.get(`/api/agents/${id}/tools`).then(res => res.data),
   
+  getSimilar: (id: string): Promise<{ agent_id: string; similar: SimilarAgent[]; cluster: string[] }> =>
+    api.get(`/api/agents/${id}/similar`).then(res => res.data),
+  
   // Permissions removed
   
   getStatistics: (): Promise<any> =>
@@ -51,6 +54,27 @@ export const toolsApi = {
 export const discoveryApi = {
   discoverAgents: (githubRepoUrl: string): Promise<any> =>
     api.post('/api/discovery/agents', { github_repo_url: githubRepoUrl }).then(res => res.data),
+
+  // Live discovery over Server-Sent Events; returns a function that closes the stream
+  streamAgents: (githubRepoUrl: string, handlers: DiscoveryStreamHandlers): (() => void) => {
+    const url = `${API_BASE_URL}/api/discovery/stream?github_repo_url=${encodeURIComponent(githubRepoUrl)}`;
+    const source = new EventSource(url);
+    const parse = (e: Event) => JSON.parse((e as MessageEvent).data);
+    source.addEventListener('stage', e => handlers.onStage?.(parse(e).stage));
+    source.addEventListener('agent', e => handlers.onAgent?.(parse(e)));
+    source.addEventListener('progress', e => handlers.onProgress?.(parse(e)));
+    source.addEventListener('done', e => {
+      source.close();
+      handlers.onDone?.(parse(e));
+    });
+    source.addEventListener('error', e => {
+      source.close();
+      // Server-sent "error" events carry a detail; connection failures do not
+      const data = (e as MessageEvent).data;
+      handlers.onError?.(data ? JSON.parse(data).detail : 'Connection to discovery stream lost');
+    });
+    return () => source.close();
+  },
   
   
   getStatus: (): Promise<DiscoveryStatus> =>
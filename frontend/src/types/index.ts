@@ -8,9 +8,27 @@ export interface Agent {
   framework?: string;
   risk?: 'low' | 'medium' | 'high';
   risk_reason?: string;
+  risk_source?: 'rules' | 'cache' | 'llm';
+  locations?: AgentLocation[];
   created_at: string;
 }
 
+export interface AgentLocation {
+  file_path: string;
+  line?: number;
+  col?: number;
+}
+
+export interface SimilarAgent {
+  agent_id: string;
+  role?: string;
+  file_path?: string;
+  similarity: number;
+  is_duplicate: boolean;
+  source: 'minhash' | 'llm';
+  explanation?: string;
+}
+
 export interface Tool {
   id: number;
   name: string;
@@ -24,6 +42,20 @@ export interface DiscoveryStatus {
   discovered_agents: number;
 }
 
+export interface DiscoveryProgress {
+  agents: number;
+  files_seen: number;
+  elapsed_seconds: number;
+}
+
+export interface DiscoveryStreamHandlers {
+  onStage?: (stage: string) => void;
+  onAgent?: (agent: Agent) => void;
+  onProgress?: (progress: DiscoveryProgress) => void;
+  onDone?: (summary: { agents: number; elapsed_seconds: number }) => void;
+  onError?: (message: string) => void;
+}
+
 export interface ToolExecuteRequest {
   agent_id: string;
   parameters: Record<string, any>;
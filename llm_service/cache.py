@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+
+# Lives next to backend/doubletrust.db but in its own file so it can be deleted freely
+DEFAULT_CACHE_PATH = str(Path(__file__).resolve().parents[1] / "backend" / "llm_cache.db")
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+# Evict after this many new entries rather than on every write
+EVICT_EVERY = 100
+
+_bypass: ContextVar[bool] = ContextVar("_llm_cache_bypass", default=False)
+
+
+def _normalize(text: str) -> str:
+    # Line endings and trailing whitespace do not change what the model is asked
+    return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").split("\n")).strip()
+
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """Content address of a chat completion request: model, temperature and normalized messages."""
+    messages = [
+        {"role": m.get("role", ""), "content": _normalize(str(m.get("content", "")))}
+        for m in payload.get("messages", [])
+    ]
+    canonical = json.dumps(
+        {"model": payload.get("model"), "temperature": payload.get("temperature"), "messages": messages},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """On-disk cache of parsed JSON LLM responses keyed by request_key().
+
+    Entries older than ttl_seconds are misses. Least-recently-used entries are
+    evicted once the stored responses exceed max_bytes. Counters accumulate over
+    the lifetime of the instance; seconds_saved sums the original latency of
+    every call answered from the cache.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._init_table()
+
+    def _init_table(self) -> None:
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    request_hash VARCHAR PRIMARY KEY,
+                    model VARCHAR,
+                    response JSON,
+                    size INTEGER,
+                    seconds FLOAT,
+                    created_at FLOAT,
+                    last_used FLOAT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+            conn.commit()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Sync callers and the LLM event loop thread share the file, so wait on locks
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, seconds FROM llm_cache WHERE request_hash = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE llm_cache SET last_used = ? WHERE request_hash = ?", (now, key))
+                conn.commit()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.seconds_saved += row[1] or 0.0
+        return json.loads(row[0])
+
+    def put(self, key: str, model: Optional[str], response: Dict[str, Any], seconds: float) -> None:
+        now = time.time()
+        payload = json.dumps(response)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(request_hash, model, response, size, seconds, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, payload, len(payload), seconds, now, now),
+            )
+            conn.commit()
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones until the cache fits in max_bytes."""
+        with self._connect() as conn:
+            expired = conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            over = conn.execute(
+                """
+                DELETE FROM llm_cache WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, SUM(size) OVER (ORDER BY last_used DESC, rowid DESC) AS running
+                        FROM llm_cache
+                    ) WHERE running > ?
+                )
+                """,
+                (self.max_bytes,),
+            )
+            conn.commit()
+            removed = expired.rowcount + over.rowcount
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "seconds_saved": round(self.seconds_saved, 4),
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Process-wide response cache, or None when LLM_CACHE is off or bypass is active."""
+    if os.getenv("LLM_CACHE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                max_bytes=int(_env_float("LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                ttl_seconds=_env_float("LLM_CACHE_TTL", DEFAULT_TTL_SECONDS),
+            )
+        cache = _cache
+    if _bypass.get():
+        with cache._lock:
+            cache.bypassed += 1
+        return None
+    return cache
+
+
+def llm_cache_bypassed() -> bool:
+    return _bypass.get()
+
+
+@contextmanager
+def bypass_llm_cache(enabled: bool = True) -> Iterator[None]:
+    """Skip cache lookups (and writes) for LLM calls made inside this block."""
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def llm_cache_stats() -> Dict[str, Any]:
+    cache = _cache
+    return cache.stats() if cache is not None else {}
+
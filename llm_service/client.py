@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+# OpenAI-compatible API root; point LLM_BASE_URL at another (e.g. llm_service.mock_server) to run offline
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_openai_client: Any = None
+_openai_key: Optional[str] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+
+_stats: Dict[str, Any] = {
+    "requests": 0,
+    "errors": 0,
+    "connections_opened": 0,
+    "seconds": 0.0,
+    "max_seconds": 0.0,
+}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _http2_enabled() -> bool:
+    if os.getenv("LLM_HTTP2", "").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("LLM_HTTP2 is set but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def _client_options() -> Dict[str, Any]:
+    """Pool limits and timeouts, configurable through LLM_* environment variables."""
+    timeout = _env_float("LLM_TIMEOUT", DEFAULT_TIMEOUT)
+    return {
+        "timeout": httpx.Timeout(timeout, connect=_env_float("LLM_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+        "limits": httpx.Limits(
+            max_connections=_env_int("LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS),
+            max_keepalive_connections=_env_int("LLM_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE),
+            keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY),
+        ),
+        "http2": _http2_enabled(),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled keep-alive client for synchronous LLM calls."""
+    global _sync_client
+    with _lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(**_client_options())
+        return _sync_client
+
+
+def llm_base_url() -> str:
+    return os.getenv("LLM_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+
+def uses_openrouter() -> bool:
+    """Whether requests go to the OpenRouter host (which needs OPENROUTER_API_KEY)."""
+    return urlsplit(llm_base_url()).hostname == urlsplit(DEFAULT_BASE_URL).hostname
+
+
+def get_openai_client(api_key: str) -> Any:
+    """Process-wide OpenAI client for OpenRouter, sharing the pooled HTTP client."""
+    from openai import OpenAI
+
+    global _openai_client, _openai_key
+    http_client = get_http_client()
+    with _lock:
+        if _openai_client is None or _openai_key != api_key:
+            _openai_client = OpenAI(api_key=api_key, base_url=llm_base_url(), http_client=http_client)
+            _openai_key = api_key
+        return _openai_client
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Background event loop that owns the shared async client; started on first use."""
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def run_on_llm_loop(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine on the LLM event loop and block until it finishes.
+
+    Must not be called from the LLM loop itself.
+    """
+    future: Future = asyncio.run_coroutine_threadsafe(coro, _get_loop())  # type: ignore[arg-type]
+    return future.result()
+
+
+def get_async_http_client() -> Optional[httpx.AsyncClient]:
+    """Shared pooled async client, or None when not running on the LLM event loop.
+
+    Async connections are bound to the loop that opened them, so only
+    coroutines scheduled through run_on_llm_loop() can reuse the pool.
+    """
+    global _async_client
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    if running is not _loop:
+        return None
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+
+def _on_connect(name: str) -> bool:
+    if name == "connection.connect_tcp.complete":
+        with _lock:
+            _stats["connections_opened"] += 1
+        return True
+    return False
+
+
+def trace_extensions() -> Dict[str, Any]:
+    """Request extensions that count newly opened connections (everything else was reused)."""
+    def trace(name: str, info: Dict[str, Any]) -> None:
+        _on_connect(name)
+
+    return {"trace": trace}
+
+
+def async_trace_extensions() -> Dict[str, Any]:
+    async def trace(name: str, info: Dict[str, Any]) -> None:
+        _on_connect(name)
+
+    return {"trace": trace}
+
+
+def record_call(started: float, ok: bool, connections_before: int) -> None:
+    seconds = time.perf_counter() - started
+    with _lock:
+        _stats["requests"] += 1
+        _stats["seconds"] += seconds
+        _stats["max_seconds"] = max(_stats["max_seconds"], seconds)
+        if not ok:
+            _stats["errors"] += 1
+        # Approximate under concurrency: another call may have opened the connection
+        reused = _stats["connections_opened"] == connections_before
+    logger.debug("LLM call %s in %.0f ms (%s connection)", "ok" if ok else "failed", seconds * 1000,
+                 "reused" if reused else "new")
+
+
+def connections_opened() -> int:
+    return _stats["connections_opened"]
+
+
+def llm_client_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+    requests = stats["requests"]
+    stats["connections_reused"] = max(0, requests - stats["connections_opened"])
+    stats["avg_seconds"] = round(stats["seconds"] / requests, 4) if requests else 0.0
+    stats["seconds"] = round(stats["seconds"], 4)
+    stats["max_seconds"] = round(stats["max_seconds"], 4)
+    return stats
+
+
+def close_llm_clients() -> None:
+    """Close the pooled clients and stop the LLM event loop (application shutdown)."""
+    global _sync_client, _async_client, _openai_client, _openai_key, _loop, _loop_thread
+    with _lock:
+        sync_client, async_client, loop, thread = _sync_client, _async_client, _loop, _loop_thread
+        _sync_client = _async_client = _openai_client = _openai_key = None
+        _loop = _loop_thread = None
+    if sync_client is not None:
+        sync_client.close()
+    if loop is not None and not loop.is_closed():
+        if async_client is not None:
+            asyncio.run_coroutine_threadsafe(async_client.aclose(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=10)
+        loop.close()
+    logger.info("LLM clients closed: %s", llm_client_stats())
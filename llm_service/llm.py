@@ -1,22 +1,88 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Any, Dict, List
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
+
+from .cache import bypass_llm_cache, get_llm_cache, llm_cache_bypassed, request_key
+from .recording import get_cassette, transport_mode
+from .shaping import estimate_message_tokens, record_call_tokens
+from .transport import LLMUnavailableError, asend, failover_model, send
+from .client import (
+    async_trace_extensions,
+    connections_opened,
+    get_async_http_client,
+    get_http_client,
+    get_openai_client,
+    llm_base_url,
+    record_call,
+    run_on_llm_loop,
+    trace_extensions,
+    uses_openrouter,
+)
 
 
 class MissingApiKeyError(Exception):
     pass
 
 
-def llm_json(messages: List[Dict[str, str]]) -> Dict[str, Any]:
-    import httpx
-    import json as _json
+DEFAULT_LLM_CONCURRENCY = 8
+
+T = TypeVar("T")
+
+# Concurrency limit shared by the async calls of one run_llm_calls() batch
+_async_batch: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("_async_batch", default=None)
+# Usage counters of the enclosing meter_llm_usage() block
+_usage_meter: ContextVar[Optional[Dict[str, Any]]] = ContextVar("_usage_meter", default=None)
+
+
+@contextmanager
+def meter_llm_usage() -> Iterator[Dict[str, Any]]:
+    """Count the LLM calls, tokens and seconds spent inside this block (including async tasks it starts).
+
+    Calls answered from the response cache count as cached_calls with no tokens.
+    estimated_prompt_tokens sums the local estimate of the calls that were sent.
+    """
+    meter: Dict[str, Any] = {
+        "calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0,
+        "estimated_prompt_tokens": 0,
+    }
+    token = _usage_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _usage_meter.reset(token)
+
+
+def _meter(data: Optional[Dict[str, Any]], seconds: float, payload: Optional[Dict[str, Any]] = None) -> None:
+    usage = (data or {}).get("usage") or {}
+    estimated = estimate_message_tokens(payload["messages"]) if payload is not None else 0
+    if data is not None and payload is not None:
+        record_call_tokens(payload["model"], estimated, usage)
+    meter = _usage_meter.get()
+    if meter is None:
+        return
+    if data is None:
+        meter["cached_calls"] += 1
+        return
+    meter["calls"] += 1
+    meter["prompt_tokens"] += usage.get("prompt_tokens") or 0
+    meter["completion_tokens"] += usage.get("completion_tokens") or 0
+    meter["estimated_prompt_tokens"] += estimated
+    meter["seconds"] += seconds
 
+
+def _json_request(messages: List[Dict[str, str]]) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """Build the (url, headers, payload) of a JSON-only chat completion request."""
     api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
+    # Replays and endpoints other than OpenRouter (LLM_BASE_URL) work without a key
+    if not api_key and transport_mode() != "replay" and uses_openrouter():
         # Aid debugging when env isn't loaded
         raise MissingApiKeyError("Missing OPENROUTER_API_KEY for LLM usage (env not set)")
-    url = "https://openrouter.ai/api/v1/chat/completions"
+    url = f"{llm_base_url()}/chat/completions"
     model = os.getenv("OPENROUTER_MODEL", "openrouter/auto")
     referer = os.getenv("OPENROUTER_REFERER", "http://localhost:8000")
     app_title = os.getenv("OPENROUTER_APP_TITLE", "DoubleTrust")
@@ -25,22 +91,172 @@ def llm_json(messages: List[Dict[str, str]]) -> Dict[str, Any]:
         "content": "You must output only a single JSON object, no prose.",
     }
     payload = {"model": model, "messages": [sys_msg, *messages], "temperature": 0}
-    with httpx.Client(timeout=30) as client:
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            # OpenRouter recommends these headers for server environments
-            "HTTP-Referer": referer,
-            "X-Title": app_title,
-        }
-        resp = client.post(url, headers=headers, json=payload)
-        resp.raise_for_status()
-        data = resp.json()
-        content = data["choices"][0]["message"]["content"].strip()
+    headers = {
+        "Content-Type": "application/json",
+        # OpenRouter recommends these headers for server environments
+        "HTTP-Referer": referer,
+        "X-Title": app_title,
+    }
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return url, headers, payload
+
+
+def _json_content(data: Dict[str, Any]) -> Dict[str, Any]:
+    import json as _json
+
+    content = data["choices"][0]["message"]["content"].strip()
+    try:
         return _json.loads(content)
+    except _json.JSONDecodeError:
+        # Some models wrap the object in a code fence despite the instruction
+        return _extract_json(content)
+
+
+def llm_json(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    url, headers, payload = _json_request(messages)
+    try:
+        return _llm_json(url, headers, payload)
+    except LLMUnavailableError:
+        fallback = failover_model(payload["model"])
+        if not fallback:
+            raise
+        return _llm_json(url, headers, {**payload, "model": fallback})
+
+
+def _llm_json(url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Requests run at temperature 0, so identical requests are answered from the cache;
+    # recording and replaying skip it so that every request goes through the cassette
+    cassette = get_cassette()
+    cache = get_llm_cache() if cassette is None else None
+    key = request_key(payload) if cache else None
+    if cache and key:
+        cached = cache.get(key)
+        if cached is not None:
+            _meter(None, 0.0)
+            return cached
+    client = get_http_client()
+
+    def post():
+        started, before, ok = time.perf_counter(), connections_opened(), False
+        try:
+            resp = client.post(url, headers=headers, json=payload, extensions=trace_extensions())
+            ok = resp.is_success
+            return resp
+        finally:
+            record_call(started, ok, before)
+
+    started = time.perf_counter()
+    if cassette is not None and transport_mode() == "replay":
+        data = cassette.replay(payload)
+    else:
+        data = send(post, payload["model"]).json()
+        if cassette is not None:
+            cassette.record(payload, data)
+    _meter(data, time.perf_counter() - started, payload)
+    result = _json_content(data)
+    # An unparseable answer ({}) is not worth replaying
+    if cache and key and result:
+        cache.put(key, payload["model"], result, time.perf_counter() - started)
+    return result
+
+
+async def allm_json(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Async llm_json; inside run_llm_calls() it shares the pooled client and concurrency limit."""
+    url, headers, payload = _json_request(messages)
+    try:
+        return await _allm_json(url, headers, payload)
+    except LLMUnavailableError:
+        fallback = failover_model(payload["model"])
+        if not fallback:
+            raise
+        return await _allm_json(url, headers, {**payload, "model": fallback})
+
+
+async def _allm_json(url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+    import httpx
+
+    cassette = get_cassette()
+    cache = get_llm_cache() if cassette is None else None
+    key = request_key(payload) if cache else None
+    if cache and key:
+        cached = cache.get(key)
+        if cached is not None:
+            _meter(None, 0.0)
+            return cached
+    client = get_async_http_client()
+    semaphore = _async_batch.get()
+
+    async def post(http: httpx.AsyncClient):
+        started, before, ok = time.perf_counter(), connections_opened(), False
+        try:
+            # The concurrency slot is held per attempt, not across retry backoff
+            if semaphore is None:
+                resp = await http.post(url, headers=headers, json=payload, extensions=async_trace_extensions())
+            else:
+                async with semaphore:
+                    resp = await http.post(url, headers=headers, json=payload, extensions=async_trace_extensions())
+            ok = resp.is_success
+            return resp
+        finally:
+            record_call(started, ok, before)
+
+    started = time.perf_counter()
+    if cassette is not None and transport_mode() == "replay":
+        # Replayed latency occupies a concurrency slot like a real request would
+        if semaphore is None:
+            data = await cassette.areplay(payload)
+        else:
+            async with semaphore:
+                data = await cassette.areplay(payload)
+    else:
+        if client is None:
+            # Outside the LLM event loop the pool cannot be shared
+            async with httpx.AsyncClient(timeout=30) as own_client:
+                resp = await asend(lambda: post(own_client), payload["model"])
+        else:
+            resp = await asend(lambda: post(client), payload["model"])
+        data = resp.json()
+        if cassette is not None:
+            cassette.record(payload, data)
+    _meter(data, time.perf_counter() - started, payload)
+    result = _json_content(data)
+    # An unparseable answer ({}) is not worth replaying
+    if cache and key and result:
+        cache.put(key, payload["model"], result, time.perf_counter() - started)
+    return result
+
+
+def llm_concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("LLM_CONCURRENCY", DEFAULT_LLM_CONCURRENCY)))
+    except ValueError:
+        return DEFAULT_LLM_CONCURRENCY
+
+
+def run_llm_calls(
+    calls: Sequence[Callable[[], Awaitable[T]]], concurrency: Optional[int] = None
+) -> List[Union[T, BaseException]]:
+    """Run async LLM jobs concurrently and return their results in input order.
+
+    At most `concurrency` requests (default LLM_CONCURRENCY env, 8) are in flight
+    at once. A job that raises yields its exception in its result slot instead
+    of failing the batch. Must be called from synchronous code.
+    """
+    if not calls:
+        return []
+    limit = concurrency or llm_concurrency()
+    # The LLM loop does not inherit the caller's context, so carry the bypass flag over
+    bypass = llm_cache_bypassed()
+
+    async def _run() -> List[Union[T, BaseException]]:
+        _async_batch.set(asyncio.Semaphore(limit))
+        with bypass_llm_cache(bypass):
+            return await asyncio.gather(*(call() for call in calls), return_exceptions=True)
+
+    # The long-lived LLM loop owns the pooled async client, so connections are reused across batches
+    return run_on_llm_loop(_run())
 
-from openai import OpenAI
-import os
 import json
 import re
 
@@ -49,13 +265,36 @@ def get_llm_response(content: str, system_prompt: str = "") -> str:
     if not api_key:
         raise MissingApiKeyError("Missing OPENROUTER_API_KEY for LLM usage (env not set)")
     
-    # Set the API key as an environment variable for the OpenAI client
-    os.environ["OPENAI_API_KEY"] = api_key
+    client = get_openai_client(api_key)
+
+    messages = _chat_messages(content, system_prompt)
+
+    # OpenRouter recommends including referer/title via standard headers; the OpenAI SDK
+    # used through OpenRouter doesn't expose header injection here, so prefer llm_json for JSON.
+    completion = client.chat.completions.create(model="openai/gpt-4.1-nano", messages=messages, temperature=0.1)
+    return completion.choices[0].message.content
+
+def _extract_json(response: str) -> dict:
+    # Try to extract JSON using regex pattern matching
+    json_pattern = r'```(?:json)?\s*([\s\S]*?)\s*```'
+    match = re.search(json_pattern, response)
+    
+    if match:
+        # Extract the JSON content from the code block
+        json_str = match.group(1)
+    else:
+        # If no code block is found, try to use the entire response
+        json_str = response
     
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-    )
+    try:
+        # Parse the JSON string into a Python dictionary
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        # If parsing fails, return an empty dictionary
+        return {}
 
+
+def _chat_messages(content: str, system_prompt: str) -> List[Dict[str, str]]:
     messages = []
     if system_prompt:
         messages.append({
@@ -67,11 +306,8 @@ def get_llm_response(content: str, system_prompt: str = "") -> str:
         "role": "user",
         "content": content
     })
+    return messages
 
-    # OpenRouter recommends including referer/title via standard headers; the OpenAI SDK
-    # used through OpenRouter doesn't expose header injection here, so prefer llm_json for JSON.
-    completion = client.chat.completions.create(model="openai/gpt-4.1-nano", messages=messages, temperature=0.1)
-    return completion.choices[0].message.content
 
 def get_json_llm_response(content: str, system_prompt: str) -> dict:
     """
@@ -86,42 +322,12 @@ def get_json_llm_response(content: str, system_prompt: str) -> dict:
     """
     
     # Use the httpx-based function instead of the OpenAI client
-    messages = []
-    if system_prompt:
-        messages.append({
-            "role": "system",
-            "content": system_prompt
-        })
-    
-    messages.append({
-        "role": "user",
-        "content": content
-    })
+    messages = _chat_messages(content, system_prompt)
     
-    try:
-        response = llm_json(messages)
-        return response
-    except MissingApiKeyError:
-        # Surface a consistent exception so callers can detect missing key
-        raise
-    except Exception as e:
-        # If httpx fails, fall back to the OpenAI client
-        response = get_llm_response(content, system_prompt)
-        
-        # Try to extract JSON using regex pattern matching
-        json_pattern = r'```(?:json)?\s*([\s\S]*?)\s*```'
-        match = re.search(json_pattern, response)
-        
-        if match:
-            # Extract the JSON content from the code block
-            json_str = match.group(1)
-        else:
-            # If no code block is found, try to use the entire response
-            json_str = response
-        
-        try:
-            # Parse the JSON string into a Python dictionary
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            # If parsing fails, return an empty dictionary
-            return {}
\ No newline at end of file
+    # Transient failures are retried by the transport; no second request via another client
+    return llm_json(messages)
+
+
+async def aget_json_llm_response(content: str, system_prompt: str) -> dict:
+    """Async get_json_llm_response, for use inside run_llm_calls()."""
+    return await allm_json(_chat_messages(content, system_prompt))
@@ -0,0 +1,199 @@
+"""Local OpenAI-compatible chat completions server for offline runs and benchmarks.
+
+    python -m llm_service.mock_server --port 8765 --latency-ms 300 --jitter-ms 200
+    LLM_BASE_URL=http://127.0.0.1:8765/v1 python doubletrust.py
+
+Answers are canned but well-formed for every prompt the discovery pipeline
+sends, and deterministic for a given request, so scans against the mock are
+repeatable. Latency and an error rate can be injected to exercise the
+transport's concurrency, retry and circuit-breaker settings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from .prompts.agent_profile import AGENT_PROFILE_PROMPT
+from .prompts.agent_risk import AGENT_RISK_PROMPT
+from .prompts.discovery_prompts import BATCH_SUMMARIZER_SYSTEM, CLASSIFIER_SYSTEM, SUMMARIZER_SYSTEM
+from .prompts.duplicate_detection import DUPLICATE_DETECTION_PROMPT
+from .prompts.tool_detection import TOOL_DETECTION_PROMPT
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+_ROLE_HINTS = (
+    (("code", "developer", "programming"), "Coding assistant"),
+    (("customer", "support", "refund"), "Customer support"),
+    (("sql", "database", "query"), "SQL assistant"),
+    (("financ", "invest", "budget"), "Financial advisor"),
+    (("travel", "flight", "hotel"), "Travel agent"),
+    (("story", "poem", "creative"), "Creative writer"),
+    (("translat",), "Translator"),
+    (("search", "browse", "web"), "Web search agent"),
+    (("summar",), "Summarizer"),
+)
+
+
+def _template_head(template: str) -> str:
+    # The fixed text before the first placeholder identifies the prompt
+    return template.strip().split("{")[0][:60]
+
+
+def _guess_role(text: str) -> str:
+    lowered = text.lower()
+    for hints, role in _ROLE_HINTS:
+        if any(hint in lowered for hint in hints):
+            return role
+    return "General assistant"
+
+
+def mock_answer(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The JSON object a model would plausibly return for this conversation."""
+    system = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    user = str(messages[-1].get("content", "")) if messages else ""
+    if BATCH_SUMMARIZER_SYSTEM in system:
+        try:
+            prompts = json.loads(user)
+        except ValueError:
+            return {}
+        return {"roles": {prompt_id: _guess_role(str(text)) for prompt_id, text in prompts.items()}}
+    if SUMMARIZER_SYSTEM in system:
+        return {"role": _guess_role(user)}
+    if CLASSIFIER_SYSTEM in system:
+        return {"is_system_prompt": any(p in user.lower() for p in ("you are", "act as", "your task"))}
+    if user.startswith(_template_head(AGENT_PROFILE_PROMPT)):
+        return {"role": _guess_role(user.split("Prompt:", 1)[-1]), "tools": [], "risk": "medium",
+                "reason": "Mock verdict"}
+    if user.startswith(_template_head(TOOL_DETECTION_PROMPT)):
+        return {"tools": []}
+    if user.startswith(_template_head(AGENT_RISK_PROMPT)):
+        return {"risk": "medium", "reason": "Mock verdict"}
+    if user.startswith(_template_head(DUPLICATE_DETECTION_PROMPT)):
+        return {"similarity_score": 0.5, "is_duplicate": False, "explanation": "Mock comparison", "differences": []}
+    return {}
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__((host, port), _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _fail_next(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            return self._random.random() < self.error_rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockLLMServer
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/health"):
+            self._send(200, {"status": "ok", "requests": self.server.requests})
+        else:
+            self._send(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self) -> None:
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "Not found"}})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        except ValueError:
+            self._send(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        messages = payload.get("messages") or []
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).digest()
+        # Same jitter for the same request, so runs are comparable
+        jitter = int.from_bytes(digest[:4], "big") / 0xFFFFFFFF * self.server.jitter_ms
+        time.sleep((self.server.latency_ms + jitter) / 1000)
+        if self.server._fail_next():
+            self._send(503, {"error": {"message": "Injected failure"}})
+            return
+        content = json.dumps(mock_answer(messages))
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        self._send(200, {
+            "id": f"mock-{digest[:6].hex()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model") or "mock",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4,
+            },
+        })
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def serve_in_background(server: Optional[MockLLMServer] = None) -> MockLLMServer:
+    """Start a mock server (default: a free port) on a daemon thread; stop it with server.shutdown()."""
+    server = server or MockLLMServer(port=0)
+    threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True).start()
+    return server
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Serve canned OpenAI-compatible chat completions locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra delay of up to this much per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 503")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the injected failures")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    server = MockLLMServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    logger.info("Mock LLM server listening; set LLM_BASE_URL=%s", server.base_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+# One request in place of the separate role, tool detection and risk prompts
+AGENT_PROFILE_PROMPT = (
+    """
+You are given an AI agent system prompt and the tools the agent is already known to use. Produce a complete profile of the agent in one answer:
+
+1. role: categorize the agent's primary function, even if not explicitly stated (e.g., "Coding assistant", "Financial advisor", "General assistant"). Limit the label to 3 words max; NEVER use "Unknown".
+2. tools: identify any external tools, APIs, services, or resources explicitly mentioned in the prompt that the agent expects to use. Be conservative: only include tools that are clearly named or obviously implied by specific phrases (e.g., "GitHub", "filesystem", "browser", "calendar"). If none, return an empty list.
+3. risk: evaluate the risk level (low, medium, high) from the role and all tools (known and detected). Consider data exfiltration potential, destructive actions, and misuse.
+Severity calibration guidelines:
+- Treat filesystem read/write, process execution, shell/terminal, network access, or code execution as HIGH risk unless tool usage is tightly constrained to safe paths and non-destructive operations.
+- Treat cloud/service admin, secrets access, or repo write as HIGH risk.
+- Medium is reserved for tools that access public data or read-only internal resources with limited scope.
+- Low for simple retrieval or reasoning-only agents without external actions.
+
+Return JSON with this shape:
+{{
+  "role": "short-label",
+  "tools": [
+    {{"name": "...", "description": "...", "parameters": {{}}}}
+  ],
+  "risk": "low|medium|high",
+  "reason": "one-line justification of the risk"
+}}
+
+Known tools: {tools}
+
+Prompt:
+"""
+).strip()
@@ -25,3 +25,19 @@ Respond ONLY with valid JSON: {"role": "short-label"}. Limit the label to 3 word
 ).strip()
 
 
+
+
+BATCH_SUMMARIZER_SYSTEM = (
+    """
+You are an expert at categorizing the role of AI system prompts based on their content, purpose, and instructions. You receive a JSON object mapping prompt IDs to system prompt texts. Analyze each text independently and infer its primary function, even if not explicitly stated—e.g., if it guides user queries in a domain, classify as that domain's assistant.
+Examples:
+
+"You are a helpful coding assistant..." → "Coding assistant"
+"Act as a financial advisor for investments." → "Financial advisor"
+"You are a creative writer generating stories." → "Creative writer"
+Generic helpful instructions → "General assistant"
+No clear role or ambiguous → Infer the closest match (e.g., "Task executor" or "Domain specialist"); NEVER use "Unknown"—always provide a fitting label.
+
+Respond ONLY with valid JSON: {"roles": {"<prompt ID>": "short-label", ...}} with exactly one entry for every prompt ID you were given. Limit each label to 3 words max for brevity and accuracy.
+    """
+).strip()
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .cache import request_key
+
+
+logger = logging.getLogger(__name__)
+
+# live: call the API; record: call it and append every exchange to the cassette; replay: serve from the cassette
+TRANSPORT_MODES = ("live", "record", "replay")
+DEFAULT_CASSETTE_PATH = str(Path(__file__).resolve().parents[1] / "backend" / "llm_cassette.jsonl")
+
+
+class CassetteMissError(Exception):
+    """A replayed request has no recorded response."""
+
+
+def transport_mode() -> str:
+    mode = os.getenv("LLM_TRANSPORT", "live").lower()
+    if mode not in TRANSPORT_MODES:
+        logger.warning("Unknown LLM_TRANSPORT %r; using live", mode)
+        return "live"
+    return mode
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class Cassette:
+    """Request/response pairs of chat completions, one JSON object per line, keyed by request_key().
+
+    Replayed responses are delayed by latency_ms plus up to jitter_ms
+    (deterministic per request), so runs against a cassette keep a realistic
+    shape. Re-recording a request appends a newer line; the last one wins.
+    """
+
+    def __init__(self, path: str = DEFAULT_CASSETTE_PATH, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._responses: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._responses is None:
+                responses: Dict[str, Dict[str, Any]] = {}
+                try:
+                    with open(self.path, encoding="utf-8") as fh:
+                        for line in fh:
+                            if line.strip():
+                                entry = json.loads(line)
+                                responses[entry["key"]] = entry["response"]
+                except FileNotFoundError:
+                    logger.warning("LLM cassette %s does not exist; every request will miss", self.path)
+                self._responses = responses
+            return self._responses
+
+    def record(self, payload: Dict[str, Any], response: Dict[str, Any]) -> None:
+        key = request_key(payload)
+        line = json.dumps({"key": key, "request": payload, "response": response}, ensure_ascii=False)
+        with self._lock:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+            if self._responses is not None:
+                self._responses[key] = response
+            self.recorded += 1
+
+    def _lookup(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        key = request_key(payload)
+        response = self._load().get(key)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.replayed += 1
+        if response is None:
+            raise CassetteMissError(f"No recorded LLM response for request {key[:12]} in {self.path}")
+        return response
+
+    def _delay(self, payload: Dict[str, Any]) -> float:
+        jitter = int(request_key(payload)[:8], 16) / 0xFFFFFFFF * self.jitter_ms
+        return (self.latency_ms + jitter) / 1000
+
+    def replay(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = self._lookup(payload)
+        time.sleep(self._delay(payload))
+        return response
+
+    async def areplay(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = self._lookup(payload)
+        await asyncio.sleep(self._delay(payload))
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"path": self.path, "recorded": self.recorded, "replayed": self.replayed, "misses": self.misses}
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Process-wide cassette (LLM_CASSETTE path), or None in live mode."""
+    if transport_mode() == "live":
+        return None
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(
+                path=os.getenv("LLM_CASSETTE", DEFAULT_CASSETTE_PATH),
+                latency_ms=_env_float("LLM_REPLAY_LATENCY_MS", 0.0),
+                jitter_ms=_env_float("LLM_REPLAY_JITTER_MS", 0.0),
+            )
+        return _cassette
+
+
+def recording_stats() -> Dict[str, Any]:
+    cassette = _cassette
+    return {"mode": transport_mode(), **(cassette.stats() if cassette is not None else {})}
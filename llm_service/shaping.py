@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import re
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Rough English average for GPT-style tokenizers; only used for budgeting, never for billing
+CHARS_PER_TOKEN = 4
+# Role, separators and priming the API adds around each chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Agent prompts longer than this are shaped before being sent (LLM_MAX_INPUT_TOKENS env)
+DEFAULT_MAX_INPUT_TOKENS = 3000
+# Share of a truncated prompt kept from its start; the rest comes from its end
+_HEAD_SHARE = 2 / 3
+_BLANK_LINES_RE = re.compile(r"\n\s*\n(\s*\n)+")
+_SPACES_RE = re.compile(r"[ \t]+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def max_input_tokens() -> int:
+    try:
+        return max(1, int(os.getenv("LLM_MAX_INPUT_TOKENS", DEFAULT_MAX_INPUT_TOKENS)))
+    except ValueError:
+        return DEFAULT_MAX_INPUT_TOKENS
+
+
+def _condense(text: str) -> str:
+    """Whitespace runs collapsed and repeated non-blank lines dropped after their first occurrence."""
+    seen = set()
+    lines = []
+    for line in _SPACES_RE.sub(" ", text).split("\n"):
+        key = line.strip()
+        if key and key in seen:
+            continue
+        seen.add(key)
+        lines.append(line.rstrip())
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def shape_text(text: str, max_tokens: Optional[int] = None) -> str:
+    """Fit an agent prompt into max_tokens (default LLM_MAX_INPUT_TOKENS), deterministically.
+
+    Prompts within the budget are returned unchanged. Larger ones are first
+    condensed (whitespace runs and repeated lines, common in generated
+    templates); if still too large, the start and end are kept around a
+    marker saying how much was cut. The same input always gives the same
+    output, so shaped requests still hit the response cache.
+    """
+    limit = max_tokens or max_input_tokens()
+    if estimate_tokens(text) <= limit:
+        return text
+    shaped = _condense(text)
+    if estimate_tokens(shaped) <= limit:
+        return shaped
+    budget = max(limit * CHARS_PER_TOKEN - 40, CHARS_PER_TOKEN)  # room for the marker
+    head_end = int(budget * _HEAD_SHARE)
+    tail_start = len(shaped) - (budget - head_end)
+    # Cut at whitespace where there is some nearby, so no word is split
+    head_cut = shaped.rfind(" ", 0, head_end)
+    if head_cut > head_end // 2:
+        head_end = head_cut
+    tail_cut = shaped.find(" ", tail_start, tail_start + 100)
+    if tail_cut != -1:
+        tail_start = tail_cut + 1
+    omitted = tail_start - head_end
+    logger.debug("Shaped a %d-character prompt, omitting %d characters", len(text), omitted)
+    return f"{shaped[:head_end]}\n[... {omitted} characters omitted ...]\n{shaped[tail_start:]}"
+
+
+class TokenLedger:
+    """Estimated and actual tokens of every LLM call, for calibrating budgets."""
+
+    def __init__(self, keep: int = 1000):
+        self._calls: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._totals = {"calls": 0, "estimated_prompt_tokens": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, estimated: int, usage: Dict[str, Any]) -> None:
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        logger.debug(
+            "LLM call to %s: %d prompt tokens estimated, %d actual, %d completion",
+            model, estimated, prompt_tokens, completion_tokens,
+        )
+        with self._lock:
+            self._calls.append({
+                "model": model,
+                "estimated_prompt_tokens": estimated,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            })
+            self._totals["calls"] += 1
+            self._totals["estimated_prompt_tokens"] += estimated
+            self._totals["prompt_tokens"] += prompt_tokens
+            self._totals["completion_tokens"] += completion_tokens
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._calls)[-limit:]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+        # Actual / estimated prompt tokens; only meaningful when the API reports usage
+        totals["estimate_ratio"] = (
+            round(totals["prompt_tokens"] / totals["estimated_prompt_tokens"], 3)
+            if totals["prompt_tokens"] and totals["estimated_prompt_tokens"] else None
+        )
+        return totals
+
+
+_ledger = TokenLedger()
+
+
+def record_call_tokens(model: str, estimated: int, usage: Dict[str, Any]) -> None:
+    _ledger.record(model, estimated, usage)
+
+
+def token_stats() -> Dict[str, Any]:
+    return _ledger.stats()
+
+
+def recent_token_calls(limit: int = 50) -> List[Dict[str, Any]]:
+    return _ledger.recent(limit)
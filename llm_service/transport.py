@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_PER_SECOND = 5.0
+DEFAULT_RATE_BURST = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 20.0
+# Never sleep longer than this for a single Retry-After
+MAX_RETRY_AFTER = 60.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30.0
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """The provider could not answer: retries exhausted or the circuit is open."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "attempts": 0,
+    "retries": 0,
+    "rate_limited": 0,
+    "rate_limit_wait_seconds": 0.0,
+    "throttled_responses": 0,
+    "breaker_opens": 0,
+    "breaker_rejections": 0,
+    "failovers": 0,
+    "give_ups": 0,
+}
+
+
+def _count(name: str, amount: float = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by sync callers and the LLM event loop.
+
+    acquire() reserves a token and returns how long the caller must wait for it,
+    so waiting happens outside the lock. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            _count("rate_limited")
+            _count("rate_limit_wait_seconds", wait)
+        return wait
+
+
+class CircuitBreaker:
+    """Fails fast after `threshold` consecutive failures until `cooldown` seconds pass.
+
+    After the cooldown one probe request is let through (half-open); its success
+    closes the circuit and its failure opens it again. A probe that ends
+    without either (cancelled, unexpected error) frees the slot via release().
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Raise CircuitOpenError unless a request may go out; True when it is the half-open probe."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+        _count("breaker_rejections")
+        raise CircuitOpenError(f"LLM circuit for {self.name} is open")
+
+    def release(self) -> None:
+        with self._lock:
+            self._probing = False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            reopen = self._probing
+            self._probing = False
+            if reopen or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                opened = True
+            else:
+                opened = False
+        if opened:
+            _count("breaker_opens")
+            logger.warning("LLM circuit for %s opened after %d failures", self.name, self.failures)
+
+
+_bucket: Optional[TokenBucket] = None
+_breakers: Dict[str, CircuitBreaker] = {}
+_lock = threading.Lock()
+
+
+def _get_bucket() -> TokenBucket:
+    global _bucket
+    with _lock:
+        if _bucket is None:
+            _bucket = TokenBucket(
+                _env_float("LLM_RATE_PER_SECOND", DEFAULT_RATE_PER_SECOND),
+                _env_float("LLM_RATE_BURST", DEFAULT_RATE_BURST),
+            )
+        return _bucket
+
+
+def _get_breaker(model: str) -> CircuitBreaker:
+    # One circuit per model, so a failover model is not rejected with the primary
+    with _lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(
+                model,
+                int(_env_float("LLM_BREAKER_THRESHOLD", DEFAULT_BREAKER_THRESHOLD)),
+                _env_float("LLM_BREAKER_COOLDOWN", DEFAULT_BREAKER_COOLDOWN),
+            )
+        return breaker
+
+
+def _retry_after(resp: Optional[httpx.Response]) -> Optional[float]:
+    if resp is None:
+        return None
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+
+def _backoff(attempt: int, resp: Optional[httpx.Response]) -> float:
+    retry_after = _retry_after(resp)
+    if retry_after is not None:
+        return retry_after
+    # Full jitter keeps concurrent callers from retrying in lockstep
+    ceiling = min(_env_float("LLM_BACKOFF_MAX", DEFAULT_BACKOFF_MAX),
+                  _env_float("LLM_BACKOFF_BASE", DEFAULT_BACKOFF_BASE) * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def _classify(resp: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+    """True when the attempt failed in a way worth retrying (and counting against the circuit)."""
+    if error is not None:
+        return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+    assert resp is not None
+    if resp.status_code == 429:
+        _count("throttled_responses")
+    return resp.status_code in RETRYABLE_STATUS
+
+
+def send(post: Callable[[], httpx.Response], model: str) -> httpx.Response:
+    """Send one LLM request with rate limiting, retries and the model's circuit breaker.
+
+    Returns the successful response. Non-retryable HTTP errors are raised as
+    httpx.HTTPStatusError; exhausted retries raise LLMUnavailableError, as
+    does a failure that opens the circuit, without retrying further.
+    """
+    breaker = _get_breaker(model)
+    retries = int(_env_float("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    for attempt in range(retries + 1):
+        probe = breaker.allow()
+        settled = False
+        try:
+            wait = _get_bucket().reserve()
+            if wait:
+                time.sleep(wait)
+            resp, error = _attempt(post)
+            settled = True
+        finally:
+            if probe and not settled:
+                breaker.release()
+        if not _classify(resp, error):
+            breaker.success()
+            if error is not None:
+                raise error
+            assert resp is not None
+            resp.raise_for_status()
+            return resp
+        breaker.failure()
+        if breaker.state == "open":
+            # This failure (re)opened the circuit: further attempts would only be rejected
+            break
+        if attempt < retries:
+            delay = _backoff(attempt, resp)
+            _count("retries")
+            logger.info("LLM request failed (%s); retry %d/%d in %.2fs", _describe(resp, error), attempt + 1,
+                        retries, delay)
+            time.sleep(delay)
+    _count("give_ups")
+    raise LLMUnavailableError(f"LLM request to {model} failed after {attempt + 1} attempts: "
+                              f"{_describe(resp, error)}")
+
+
+async def asend(post: Callable[[], Awaitable[httpx.Response]], model: str) -> httpx.Response:
+    """Async send(); sleeps without blocking the event loop."""
+    breaker = _get_breaker(model)
+    retries = int(_env_float("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    for attempt in range(retries + 1):
+        probe = breaker.allow()
+        settled = False
+        try:
+            wait = _get_bucket().reserve()
+            if wait:
+                await asyncio.sleep(wait)
+            resp, error = await _aattempt(post)
+            settled = True
+        finally:
+            if probe and not settled:
+                breaker.release()
+        if not _classify(resp, error):
+            breaker.success()
+            if error is not None:
+                raise error
+            assert resp is not None
+            resp.raise_for_status()
+            return resp
+        breaker.failure()
+        if breaker.state == "open":
+            # This failure (re)opened the circuit: further attempts would only be rejected
+            break
+        if attempt < retries:
+            delay = _backoff(attempt, resp)
+            _count("retries")
+            logger.info("LLM request failed (%s); retry %d/%d in %.2fs", _describe(resp, error), attempt + 1,
+                        retries, delay)
+            await asyncio.sleep(delay)
+    _count("give_ups")
+    raise LLMUnavailableError(f"LLM request to {model} failed after {attempt + 1} attempts: "
+                              f"{_describe(resp, error)}")
+
+
+def _attempt(post: Callable[[], httpx.Response]):
+    _count("attempts")
+    try:
+        return post(), None
+    except httpx.HTTPError as e:
+        return None, e
+
+
+async def _aattempt(post: Callable[[], Awaitable[httpx.Response]]):
+    _count("attempts")
+    try:
+        return await post(), None
+    except httpx.HTTPError as e:
+        return None, e
+
+
+def _describe(resp: Optional[httpx.Response], error: Optional[Exception]) -> str:
+    if error is not None:
+        return f"{type(error).__name__}: {error}"
+    return f"HTTP {resp.status_code}" if resp is not None else "no response"
+
+
+def failover_model(model: str) -> Optional[str]:
+    """The single failover policy: retry an unavailable model once on LLM_FALLBACK_MODEL, if set."""
+    fallback = os.getenv("LLM_FALLBACK_MODEL")
+    if not fallback or fallback == model:
+        return None
+    _count("failovers")
+    logger.warning("LLM model %s unavailable; failing over to %s", model, fallback)
+    return fallback
+
+
+def transport_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["rate_limit_wait_seconds"] = round(stats["rate_limit_wait_seconds"], 4)
+    with _lock:
+        stats["circuits"] = {name: breaker.state for name, breaker in _breakers.items()}
+    return stats
@@ -0,0 +1,37 @@
+import importlib
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The backend and llm_service packages are imported from the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# backend.database opens backend/doubletrust.db relative to the working directory when imported;
+# import it from a scratch directory so the tests never touch the checked-in database
+_scratch = tempfile.mkdtemp(prefix="doubletrust-tests-")
+os.makedirs(os.path.join(_scratch, "backend"))
+_cwd = os.getcwd()
+os.chdir(_scratch)
+try:
+    import backend.database  # noqa: E402
+finally:
+    os.chdir(_cwd)
+
+# Services holding their own reference to the shared database
+DB_MODULES = (
+    "backend.services.discovery_service",
+    "backend.services.prompt_similarity",
+    "backend.services.risk_engine",
+)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh database in tmp_path, swapped in for the services' shared one."""
+    fresh = backend.database.Database(str(tmp_path / "test.db"))
+    monkeypatch.setattr(backend.database, "db", fresh)
+    for name in DB_MODULES:
+        monkeypatch.setattr(importlib.import_module(name), "db", fresh)
+    return fresh
@@ -0,0 +1,43 @@
+from backend.services.discovery.discovery import discover_agents, iter_discover_agents
+
+
+def prompt_file(n):
+    return f'messages = [{{"role": "system", "content": "You are assistant number {n}."}}]\n'
+
+
+def test_duplicates_classified_once_and_locations_follow(tmp_path):
+    # 30 distinct prompts, each in two files; with one slot a window holds 20 candidates
+    for i in range(60):
+        (tmp_path / f"f{i:03}.py").write_text(prompt_file(i % 30))
+    entries = list(iter_discover_agents(str(tmp_path), concurrency=1, assign_roles=False))
+    agents = [e for e in entries if not e.get("__update__")]
+    updates = [e for e in entries if e.get("__update__")]
+    assert len(agents) == len({a["id"] for a in agents}) == 30
+    # The first window was yielded before the scan reached the second copies of its prompts
+    assert len(updates) == 20
+    assert {u["id"] for u in updates} <= {a["id"] for a in agents}
+
+
+def test_discover_agents_folds_updates_into_agents(tmp_path):
+    for i in range(60):
+        (tmp_path / f"f{i:03}.py").write_text(prompt_file(i % 30))
+    result = discover_agents(str(tmp_path), concurrency=1, role_confidence=0)
+    assert len(result["agents"]) == 30
+    assert all(len(agent["locations"]) == 2 for agent in result["agents"])
+    assert result["stats"]["files_seen"] == 60
+
+
+def test_saved_rows_carry_the_assessment(database):
+    from backend.services.discovery_service import DiscoveryService
+    from backend.services.scan_budget import ScanBudget
+
+    agent = {
+        "id": "a1", "file": "bot.py", "role": None, "framework": "Custom",
+        "system_prompt": "You are a release bot. Use the run_shell_command tool to deploy and send_email to report.",
+        "locations": [{"file": "bot.py", "line": 1, "col": 0}],
+    }
+    # An exhausted budget keeps the analysis local
+    [saved] = DiscoveryService._save_and_assess([agent], concurrency=1, budget=ScanBudget(1))
+    assert saved["risk"] is not None
+    assert {t["name"] for t in saved["tools"]} == {t["name"] for t in database.get_agent_tools("a1")}
+    assert saved["tools"]
@@ -0,0 +1,122 @@
+import subprocess
+
+import pytest
+
+from backend.services import repo_mirror
+from backend.services.discovery import discovery
+from backend.services.discovery_service import DiscoveryService
+from backend.services.github_service import GitHubService
+from llm_service import recording, transport
+from llm_service.mock_server import serve_in_background
+
+
+def prompt_file(text):
+    return f'messages = [{{"role": "system", "content": "{text}"}}]\n'
+
+
+def commit(repo, files, message="change"):
+    for name, content in files.items():
+        path = repo / name
+        if content is None:
+            path.unlink()
+        else:
+            path.write_text(content)
+    subprocess.run(["git", "add", "-A"], cwd=repo, check=True)
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-qm", message], cwd=repo, check=True
+    )
+
+
+@pytest.fixture
+def remote(tmp_path, database, monkeypatch):
+    """A local repository scanned like a GitHub one, against the mock LLM server."""
+    server = serve_in_background()
+    monkeypatch.setenv("LLM_BASE_URL", server.base_url)
+    monkeypatch.setenv("LLM_CACHE", "off")
+    monkeypatch.setenv("LLM_RATE_PER_SECOND", "0")
+    monkeypatch.setenv("GIT_MIRROR_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setattr(repo_mirror, "_store", None)
+    monkeypatch.setattr(recording, "_cassette", None)
+    monkeypatch.setattr(transport, "_breakers", {})
+    monkeypatch.setattr(transport, "_bucket", None)
+    monkeypatch.setattr(GitHubService, "validate_github_url", staticmethod(lambda url: True))
+    monkeypatch.setattr(GitHubService, "check_repository_size", staticmethod(lambda url: None))
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q", "-b", "main"], cwd=repo, check=True)
+    commit(repo, {
+        "a.py": prompt_file("You are a billing assistant for invoices."),
+        "b.py": prompt_file("You are a travel agent booking flights."),
+    }, "initial")
+    yield repo
+    server.shutdown()
+    server.server_close()
+
+
+def scan(repo, **kwargs):
+    events = list(DiscoveryService.iter_discovery_events(repo.as_uri(), **kwargs))
+    agents = [e["data"] for e in events if e["event"] == "agent"]
+    return agents, events[-1]["data"]
+
+
+def test_incremental_rescan_reports_the_whole_inventory(remote):
+    first, _ = scan(remote)
+    assert len(first) == 2
+
+    commit(remote, {"c.py": prompt_file("You are a recipe translator for French cooks.")})
+    agents, done = scan(remote)
+    assert done["rescan"]["mode"] == "incremental"
+    assert (done["rescan"]["agents_changed"], done["rescan"]["agents_unchanged"]) == (1, 2)
+    assert done["agents"] == len(agents) == 3
+    assert {a["id"] for a in first} < {a["id"] for a in agents}
+    assert all(a["risk"] for a in agents)
+
+
+def test_rescan_skips_roles_of_analysed_agents(remote, monkeypatch):
+    scan(remote, analysis_mode="separate")
+    classified = []
+    assign_roles = discovery._assign_roles
+
+    def spy(prompts, *args):
+        classified.extend(prompts)
+        return assign_roles(prompts, *args)
+
+    monkeypatch.setattr(discovery, "_assign_roles", spy)
+    commit(remote, {
+        "a.py": "# moved\n" + prompt_file("You are a billing assistant for invoices."),
+        "c.py": prompt_file("You are a recipe translator for French cooks."),
+    })
+    agents, done = scan(remote, analysis_mode="separate")
+    assert classified == ["You are a recipe translator for French cooks."]
+    assert all(a["role"] for a in agents)
+    assert done["agents"] == 3
+
+
+def test_unchanged_remote_is_served_from_the_snapshot(remote, monkeypatch):
+    first, _ = scan(remote)
+
+    def no_clone(*args, **kwargs):
+        raise AssertionError("an unchanged repository must not be cloned")
+
+    monkeypatch.setattr(GitHubService, "checkout_repository", staticmethod(no_clone))
+    agents, done = scan(remote)
+    assert done["from_snapshot"] is True
+    assert done["rescan"]["mode"] == "snapshot"
+    assert sorted(a["id"] for a in agents) == sorted(a["id"] for a in first)
+
+
+def test_force_and_new_commits_scan_again(remote):
+    scan(remote)
+    _, done = scan(remote, force=True)
+    assert (done["from_snapshot"], done["rescan"]["mode"]) == (False, "full")
+    commit(remote, {"b.py": None})
+    _, done = scan(remote)
+    assert done["rescan"]["mode"] == "incremental"
+    assert done["rescan"]["agents_retired"] == 1
+
+
+def test_remote_head_reads_the_remote_without_cloning(remote):
+    assert GitHubService.remote_head(remote.as_uri()) == subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=remote, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert GitHubService.remote_head((remote.parent / "missing").as_uri()) is None
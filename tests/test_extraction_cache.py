@@ -0,0 +1,34 @@
+from backend.services.discovery.cache import ExtractionCache
+from backend.services.discovery.extractor import EXTRACTOR_VERSION, scan_directory
+
+SYSTEM_PROMPT = 'messages = [{"role": "system", "content": "You are a billing assistant."}]\n'
+LANGCHAIN_AGENT = (
+    "from langchain.agents import create_react_agent\n"
+    'agent = create_react_agent(prompt="You search the web.", tools=["web_search"])\n'
+)
+
+
+def write(root, files):
+    root.mkdir(exist_ok=True)
+    for name, text in files.items():
+        (root / name).write_text(text)
+
+
+def test_cache_skips_parsing_unchanged_files(tmp_path):
+    tree = tmp_path / "tree"
+    write(tree, {"a.py": SYSTEM_PROMPT, "b.py": LANGCHAIN_AGENT})
+    cache = ExtractionCache(EXTRACTOR_VERSION, path=str(tmp_path / "cache.db"))
+    first = scan_directory(str(tree), cache=cache)
+    second = scan_directory(str(tree), cache=cache)
+    assert first.stats["cache_misses"] == 2
+    assert second.stats["cache_hits"] == 2
+    assert second.stats["files_parsed"] == 0
+    assert second.files == first.files
+
+
+def test_cache_ignores_other_extractor_versions(tmp_path):
+    path = str(tmp_path / "cache.db")
+    old = ExtractionCache("0-old", path=path)
+    old.record([], [("deadbeef", {"system_prompts": []}, 0.1)])
+    assert old.lookup(["deadbeef"])
+    assert ExtractionCache(EXTRACTOR_VERSION, path=path).lookup(["deadbeef"]) == {}
@@ -0,0 +1,66 @@
+from backend.services.discovery.extractor import iter_scan, scan_directory
+
+SYSTEM_PROMPT = 'PROMPT = "You are a billing assistant."\nmessages = [{"role": "system", "content": PROMPT}]\n'
+LANGCHAIN_AGENT = (
+    "from langchain.agents import create_react_agent\n"
+    'agent = create_react_agent(prompt="You search the web.", tools=["web_search", "calculator"])\n'
+)
+
+
+def write(root, files):
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def test_one_pass_feeds_every_visitor(tmp_path):
+    write(tmp_path, {"a.py": SYSTEM_PROMPT, "pkg/b.py": LANGCHAIN_AGENT, "c.py": "x = 1\n"})
+    result = scan_directory(str(tmp_path))
+    prompts = [item["prompt"] for _, item in result.items("system_prompts")]
+    agents = [item for _, item in result.items("langchain_agents")]
+    assert prompts == ["You are a billing assistant."]
+    assert agents[0]["prompt"] == "You search the web."
+    assert agents[0]["tools"] == ["web_search", "calculator"]
+    assert result.stats["files_seen"] == 3
+    # c.py has no trigger tokens and is never parsed
+    assert result.stats["prefilter_skipped"] == 1
+    assert result.stats["files_parsed"] == 2
+
+
+def test_unparsable_files_are_counted_not_raised(tmp_path):
+    write(tmp_path, {"bad.py": 'role = "system"\ndef (:\n', "a.py": SYSTEM_PROMPT})
+    result = scan_directory(str(tmp_path))
+    assert result.stats["parse_errors"] == 1
+    assert len(result.items("system_prompts")) == 1
+
+
+def test_only_files_restricts_the_scan(tmp_path):
+    write(tmp_path, {"a.py": SYSTEM_PROMPT, "b.py": SYSTEM_PROMPT.replace("billing", "travel")})
+    found = dict(iter_scan(str(tmp_path), only_files={"b.py"}))
+    assert [p.rsplit("/", 1)[-1] for p in found] == ["b.py"]
+
+
+
+
+def test_process_pool_matches_a_serial_scan(tmp_path):
+    files = {f"pkg{i % 3}/m{i}.py": SYSTEM_PROMPT.replace("billing", f"team {i}") for i in range(12)}
+    files.update({"bad.py": 'role = "system"\ndef (:\n', "agent.py": LANGCHAIN_AGENT, "plain.py": "x = 1\n"})
+    write(tmp_path, files)
+    serial = scan_directory(str(tmp_path))
+    pooled = scan_directory(str(tmp_path), workers=2, chunk_size=4)
+    assert pooled.files == serial.files
+    for key in ("files_seen", "files_parsed", "parse_errors", "prefilter_skipped"):
+        assert pooled.stats[key] == serial.stats[key], key
+
+
+def test_strict_prefilter_verifies_skipped_files(tmp_path):
+    # Escaped keys hide the trigger tokens from the byte-level prefilter
+    write(tmp_path, {"a.py": 'messages = [{"r\\x6fle": "sys\\x74em", "content": "You are hidden."}]\n'})
+    skipped = scan_directory(str(tmp_path))
+    assert skipped.stats["prefilter_skipped"] == 1
+    assert skipped.items("system_prompts") == []
+    strict = scan_directory(str(tmp_path), prefilter="strict")
+    assert strict.stats["prefilter_mismatches"] == 1
+    assert [item["prompt"] for _, item in strict.items("system_prompts")] == ["You are hidden."]
+    assert scan_directory(str(tmp_path), prefilter="off").stats["prefilter_skipped"] == 0
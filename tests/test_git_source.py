@@ -0,0 +1,109 @@
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from backend.services.discovery.git_source import _batch_check, iter_git_files, prefetch_blobs
+from backend.services.discovery.walker import WalkOptions, new_walk_stats, walk_code_files
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+
+def git(cwd, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args], cwd=cwd, check=True, capture_output=True
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "repo"
+    files = {
+        "a.py": "x = 1\n", "pkg/b.py": "y = 2\n", "node_modules/c.py": "z = 3\n", "gen/d.py": "w = 4\n",
+        "notes.txt": "text\n", ".gitignore": "gen/\n", "big.py": "#" * 5000 + "\n",
+    }
+    for name, text in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(text)
+    git(tmp_path, "init", "-q", str(root))
+    git(root, "add", "-A")
+    # Committed despite .gitignore, which still prunes it from the scan
+    git(root, "add", "-f", "gen/d.py")
+    git(root, "commit", "-qm", "init")
+    git(root, "config", "uploadpack.allowFilter", "true")
+    return root
+
+
+def test_selects_the_same_files_as_the_walker(repo):
+    options = WalkOptions(max_file_size=1000)
+    walk_stats, git_stats = new_walk_stats(), new_walk_stats()
+    walked = sorted(p[len(str(repo)) + 1:] for p in walk_code_files(str(repo), options, walk_stats))
+    read = dict(iter_git_files(str(repo), options=options, stats=git_stats))
+    assert sorted(read) == walked == ["a.py", "pkg/b.py"]
+    assert read["pkg/b.py"] == b"y = 2\n"
+    for key in ("files_pruned", "oversized_files", "bytes_pruned"):
+        assert git_stats[key] == walk_stats[key], key
+    # The walker also prunes the checkout's .git
+    assert git_stats["dirs_pruned"] == walk_stats["dirs_pruned"] - 1 == 2
+    assert git_stats["files_seen"] == 2
+
+
+def test_only_files(repo):
+    assert [path for path, _ in iter_git_files(str(repo), only_files={"pkg/b.py"})] == ["pkg/b.py"]
+
+
+def test_closing_early_does_not_hang(tmp_path):
+    root = tmp_path / "many"
+    root.mkdir()
+    for i in range(2000):
+        (root / f"f{i}.py").write_text(f"x = {i}  # {'-' * 2000}\n")
+    git(tmp_path, "init", "-q", str(root))
+    git(root, "add", "-A")
+    git(root, "commit", "-qm", "init")
+    started = time.monotonic()
+    files = iter_git_files(str(root))
+    next(files)
+    files.close()
+    assert time.monotonic() - started < 30
+
+
+def test_prefetches_missing_blobs_of_a_partial_clone(repo, tmp_path):
+    clone = tmp_path / "clone.git"
+    git(tmp_path, "clone", "-q", "--bare", "--filter=blob:none", f"file://{repo}", str(clone))
+    read = dict(iter_git_files(str(clone)))
+    assert read["a.py"] == b"x = 1\n"
+    # Everything scanned is local now; nothing is left to fetch
+    oid = subprocess.run(
+        ["git", "rev-parse", "HEAD:a.py"], cwd=clone, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert prefetch_blobs(str(clone), [oid]) == 0
+
+
+def test_partial_clone_fetches_only_selected_blobs(repo, tmp_path):
+    clone = tmp_path / "clone.git"
+    git(tmp_path, "clone", "-q", "--bare", "--filter=blob:none", f"file://{repo}", str(clone))
+    assert sorted(path for path, _ in iter_git_files(str(clone))) == ["a.py", "big.py", "pkg/b.py"]
+
+    def local(path):
+        oid = subprocess.run(
+            ["git", "rev-parse", f"HEAD:{path}"], cwd=clone, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return _batch_check(str(clone), [oid], lazy_fetch=False)[oid] is not None
+
+    assert local("pkg/b.py") and local(".gitignore")
+    # Pruned by .gitignore or the deny list: never fetched
+    assert not local("gen/d.py") and not local("node_modules/c.py")
+
+
+def test_partial_clone_checks_sizes_of_fetched_blobs(repo, tmp_path):
+    clone = tmp_path / "clone.git"
+    git(tmp_path, "clone", "-q", "--bare", "--filter=blob:none", f"file://{repo}", str(clone))
+    stats = new_walk_stats()
+    read = dict(iter_git_files(str(clone), options=WalkOptions(max_file_size=1000), stats=stats))
+    assert sorted(read) == ["a.py", "pkg/b.py"]
+    assert stats["oversized_files"] == 1
+
+
+def test_prefetch_is_a_no_op_outside_partial_clones(repo):
+    assert prefetch_blobs(str(repo), ["0" * 40]) == 0
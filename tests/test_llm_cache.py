@@ -0,0 +1,40 @@
+import time
+
+from llm_service.cache import LLMResponseCache, request_key
+
+
+def payload(content, **extra):
+    return {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": content}], **extra}
+
+
+def test_request_key_ignores_whitespace_noise():
+    assert request_key(payload("hello  \r\nworld\n")) == request_key(payload("hello\nworld"))
+    assert request_key(payload("hello")) != request_key(payload("hello", temperature=1))
+
+
+def test_hits_after_put_and_counts_saved_seconds(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"))
+    key = request_key(payload("hi"))
+    assert cache.get(key) is None
+    cache.put(key, "m", {"role": "Support"}, seconds=1.5)
+    assert cache.get(key) == {"role": "Support"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["seconds_saved"] == 1.5
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), ttl_seconds=0.01)
+    cache.put("k", "m", {"a": 1}, seconds=0.1)
+    time.sleep(0.05)
+    assert cache.get("k") is None
+
+
+def test_evicts_least_recently_used_past_max_bytes(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), max_bytes=40)
+    cache.put("old", "m", {"v": "x" * 20}, seconds=0)
+    time.sleep(0.01)
+    cache.put("new", "m", {"v": "y" * 20}, seconds=0)
+    assert cache.evict() == 1
+    assert cache.get("old") is None
+    assert cache.get("new") == {"v": "y" * 20}
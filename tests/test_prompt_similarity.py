@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from backend.services import prompt_similarity
+from backend.services.prompt_similarity import (
+    PromptSimilarityIndex, SimilarPair, estimate_similarity, lsh_buckets, minhash, similar_agents,
+)
+from backend.services.scan_budget import ScanBudget
+from llm_service.llm import MissingApiKeyError
+from llm_service.transport import LLMUnavailableError
+
+BASE = " ".join(f"Rule {i}: answer billing questions about invoice {i} politely and briefly." for i in range(20))
+
+
+def add_agent(database, agent_id, prompt):
+    database.create_agent({
+        "id": agent_id, "file_path": f"{agent_id}.py", "role": "Support", "system_prompt": prompt,
+        "model": None, "temperature": None, "framework": "Custom", "risk": None, "risk_reason": None,
+    })
+
+
+def test_minhash_estimates_jaccard_similarity():
+    same = minhash(BASE)
+    assert same == minhash(BASE.upper())
+    assert estimate_similarity(same, minhash(BASE + " Never mention refunds.")) > 0.9
+    assert estimate_similarity(same, minhash("You translate recipes into French for a cooking site.")) < 0.1
+    assert minhash("   ") is None
+    assert len(lsh_buckets(same)) == prompt_similarity.NUM_BANDS
+
+
+def test_index_links_near_duplicates_through_shared_buckets(database):
+    index = PromptSimilarityIndex()
+    add_agent(database, "a", BASE)
+    add_agent(database, "b", BASE + " Never mention refunds.")
+    add_agent(database, "c", "You translate recipes into French for a cooking site.")
+    assert index.index("a", BASE) == []
+    assert index.index("b", BASE + " Never mention refunds.") == []
+    assert index.index("c", "You translate recipes into French for a cooking site.") == []
+    # Indexing is once per agent
+    assert index.index("b", BASE) == []
+    assert index.stats()["duplicates"] == 1
+    assert similar_agents("a")["cluster"] == ["a", "b"]
+
+
+def test_borderline_pairs_are_settled_by_the_llm(database, monkeypatch):
+    index = PromptSimilarityIndex()
+    edited = " ".join(BASE.split()[:120]) + " Always escalate disputes to a human agent within one day."
+    add_agent(database, "a", BASE)
+    add_agent(database, "b", edited)
+    index.index("a", BASE)
+    [pair] = index.index("b", edited)
+    assert prompt_similarity.BORDERLINE_SIMILARITY <= pair.similarity < prompt_similarity.DUPLICATE_SIMILARITY
+
+    async def answer(prompt, system_prompt):
+        return {"similarity_score": 0.95, "is_duplicate": True, "explanation": "same rules"}
+
+    monkeypatch.setattr(prompt_similarity, "aget_json_llm_response", answer)
+    assert asyncio.run(index.compare(pair))
+    [row] = database.get_similar_agents("b")
+    assert (row["is_duplicate"], row["source"]) == (True, "llm")
+
+
+@pytest.mark.parametrize("error", [LLMUnavailableError("down"), MissingApiKeyError("no key")])
+def test_pairs_are_not_compared_without_an_llm(database, monkeypatch, error):
+    add_agent(database, "a", BASE)
+    add_agent(database, "b", BASE + " Never mention refunds.")
+
+    async def fail(prompt, system_prompt):
+        raise error
+
+    monkeypatch.setattr(prompt_similarity, "aget_json_llm_response", fail)
+    index = PromptSimilarityIndex()
+    budget = ScanBudget(100_000)
+    assert not asyncio.run(index.compare(SimilarPair("a", "b", 0.7), budget))
+    assert index.stats()["not_compared"] == 1
+    assert budget.reserved == 0
+
+
+def test_over_budget_pairs_are_not_compared(database):
+    add_agent(database, "a", BASE)
+    add_agent(database, "b", BASE)
+    index = PromptSimilarityIndex()
+    assert not asyncio.run(index.compare(SimilarPair("a", "b", 0.7), ScanBudget(1)))
+    assert index.stats()["over_budget"] == 1
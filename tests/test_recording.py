@@ -0,0 +1,74 @@
+import pytest
+
+from llm_service import recording, transport
+from llm_service.llm import MissingApiKeyError, _json_request, llm_json
+from llm_service.mock_server import mock_answer, serve_in_background
+from llm_service.prompts.agent_risk import AGENT_RISK_PROMPT
+from llm_service.prompts.duplicate_detection import DUPLICATE_DETECTION_PROMPT
+from llm_service.recording import CassetteMissError
+
+MESSAGES = [{"role": "user", "content": DUPLICATE_DETECTION_PROMPT.format(prompt1="You are A.", prompt2="You are B.")}]
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(recording, "_cassette", None)
+    monkeypatch.setattr(transport, "_breakers", {})
+    monkeypatch.setattr(transport, "_bucket", None)
+    monkeypatch.setenv("LLM_CASSETTE", str(tmp_path / "cassette.jsonl"))
+    monkeypatch.setenv("LLM_CACHE", "off")
+    monkeypatch.setenv("LLM_RATE_PER_SECOND", "0")
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+    monkeypatch.delenv("LLM_BASE_URL", raising=False)
+
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    server = serve_in_background()
+    monkeypatch.setenv("LLM_BASE_URL", server.base_url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_mock_answers_each_pipeline_prompt():
+    assert mock_answer(MESSAGES)["is_duplicate"] is False
+    risk = mock_answer([{"role": "user", "content": AGENT_RISK_PROMPT}])
+    assert risk["risk"] == "medium"
+    assert mock_answer([{"role": "user", "content": "hello"}]) == {}
+
+
+def test_record_then_replay_without_the_server(mock_server, monkeypatch):
+    monkeypatch.setenv("LLM_TRANSPORT", "record")
+    recorded = llm_json(MESSAGES)
+    assert recorded["explanation"] == "Mock comparison"
+    assert mock_server.requests == 1
+
+    monkeypatch.setattr(recording, "_cassette", None)
+    monkeypatch.setenv("LLM_TRANSPORT", "replay")
+    # Replays need neither the server nor a key
+    monkeypatch.delenv("LLM_BASE_URL")
+    assert llm_json(MESSAGES) == recorded
+    assert recording.recording_stats()["replayed"] == 1
+    assert mock_server.requests == 1
+
+
+def test_replay_miss_raises(monkeypatch):
+    monkeypatch.setenv("LLM_TRANSPORT", "replay")
+    with pytest.raises(CassetteMissError):
+        llm_json(MESSAGES)
+
+
+@pytest.mark.parametrize("base_url", [None, "https://openrouter.ai/api/v1/"])
+def test_openrouter_needs_a_key(monkeypatch, base_url):
+    if base_url:
+        monkeypatch.setenv("LLM_BASE_URL", base_url)
+    with pytest.raises(MissingApiKeyError):
+        _json_request(MESSAGES)
+
+
+def test_other_endpoints_work_without_a_key(monkeypatch):
+    monkeypatch.setenv("LLM_BASE_URL", "http://127.0.0.1:8765/v1")
+    url, headers, _ = _json_request(MESSAGES)
+    assert url == "http://127.0.0.1:8765/v1/chat/completions"
+    assert "Authorization" not in headers
@@ -0,0 +1,118 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from backend.services.github_service import SPARSE_PATTERNS
+from backend.services.repo_mirror import RepoMirrorStore
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+
+def git(cwd, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args], cwd=cwd, check=True, capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def commit(repo, files, message="change"):
+    for name, text in files.items():
+        (repo / name).parent.mkdir(parents=True, exist_ok=True)
+        (repo / name).write_text(text)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", message)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    repo = tmp_path / "remote"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "config", "uploadpack.allowFilter", "true")
+    commit(repo, {"a.py": "x = 1\n", "docs/guide.md": "# Guide\n"}, "first")
+    commit(repo, {"pkg/b.py": "y = 2\n"}, "second")
+    return repo
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RepoMirrorStore(str(tmp_path / "mirrors"), max_bytes=None)
+
+
+def checked_out(path):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), path).replace(os.sep, "/")
+        for root, _, names in os.walk(path) for name in names if name != ".git"
+    )
+
+
+@pytest.mark.parametrize("mode", ["full", "shallow", "blobless", "sparse"])
+def test_clone_modes_check_out_the_head(remote, store, mode):
+    checkout = store.checkout(
+        remote.as_uri(), mode, sparse_patterns=SPARSE_PATTERNS if mode == "sparse" else None
+    )
+    try:
+        assert checkout.commit == git(remote, "rev-parse", "HEAD")
+        expected = ["a.py", "pkg/b.py"] if mode == "sparse" else ["a.py", "docs/guide.md", "pkg/b.py"]
+        assert checked_out(checkout.path) == expected
+        history = int(git(checkout.mirror, "rev-list", "--count", "HEAD"))
+        assert history == (1 if mode in ("shallow", "sparse") else 2)
+        partial = git(checkout.mirror, "config", "--get-regexp", "^remote\\.origin\\.").count("promisor")
+        assert bool(partial) == (mode in ("blobless", "sparse"))
+    finally:
+        store.release(checkout)
+    assert not os.path.exists(checkout.path)
+
+
+def test_rescans_fetch_into_the_existing_mirror(remote, store):
+    stats = {}
+    store.release(store.checkout(remote.as_uri(), "full", stats=stats))
+    assert stats["incremental"] is False
+    commit(remote, {"c.py": "z = 3\n"})
+    checkout = store.checkout(remote.as_uri(), "full", stats=stats)
+    try:
+        assert stats["incremental"] is True
+        assert "c.py" in checked_out(checkout.path)
+    finally:
+        store.release(checkout)
+    assert store.stats()["clones"] == 1 and store.stats()["fetches"] == 1
+
+
+def test_concurrent_checkouts_get_their_own_worktrees(remote, store):
+    first = store.checkout(remote.as_uri(), "full")
+    second = store.checkout(remote.as_uri(), "full")
+    try:
+        assert first.mirror == second.mirror
+        assert first.path != second.path
+    finally:
+        store.release(first)
+        store.release(second)
+
+
+def test_mirrors_only_fetch_their_branch(remote, store):
+    git(remote, "checkout", "-q", "-b", "other")
+    commit(remote, {"other.py": "o = 1\n"})
+    git(remote, "checkout", "-q", "main")
+    store.release(store.checkout(remote.as_uri(), "full", worktree=False))
+    checkout = store.checkout(remote.as_uri(), "full", worktree=False)
+    try:
+        assert checkout.path is None
+        assert git(checkout.mirror, "for-each-ref", "--format=%(refname)") == "refs/heads/main"
+    finally:
+        store.release(checkout)
+
+
+def test_least_recently_used_mirrors_are_evicted(remote, tmp_path):
+    other = tmp_path / "other"
+    shutil.copytree(remote, other)
+    store = RepoMirrorStore(str(tmp_path / "mirrors"), max_bytes=1)
+    store.release(store.checkout(remote.as_uri(), "full"))
+    in_use = store.checkout(other.as_uri(), "full")
+    try:
+        # The older mirror goes; the one just checked out is kept
+        assert [p.name for p in store._mirrors()] == [os.path.basename(in_use.mirror)]
+        assert store.stats()["evictions"] == 1
+    finally:
+        store.release(in_use)
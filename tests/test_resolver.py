@@ -0,0 +1,54 @@
+import ast
+
+import pytest
+
+from backend.services.discovery.resolver import ConstantResolver
+
+
+def resolve(source, bindings=None, **options):
+    module = ast.parse(source)
+    names = {}
+    for node in module.body[:-1]:
+        names[node.targets[0].id] = node.value
+    names.update(bindings or {})
+    resolver = ConstantResolver(names.get, **options)
+    return resolver.resolve(module.body[-1].value), resolver
+
+
+def test_resolves_names_concatenation_and_methods():
+    value, _ = resolve('base = "You are "\nrole = base + "a helpful " + "assistant"\nx = role.strip()')
+    assert value == "You are a helpful assistant"
+
+
+def test_formats_literal_arguments():
+    assert resolve('x = "Hello %s, %d%%" % ("bob", 5)')[0] == "Hello bob, 5%"
+    assert resolve('x = "{name:>6}!".format(name="x")')[0] == "     x!"
+
+
+def test_self_reference_is_a_cycle():
+    value, resolver = resolve('x = x + "a"\ny = x')
+    assert value is None
+    assert resolver.cycles == 1
+
+
+def test_results_are_clipped_to_max_length():
+    value, resolver = resolve('a = "ab"\nx = a + a + a', max_length=4)
+    assert value == "abab"
+    assert resolver.truncated == 1
+
+
+@pytest.mark.parametrize("source", [
+    'x = "%0300000000d" % 1',
+    'x = "%.300000000f" % 1.0',
+    'x = "%*d" % (5, 1)',
+    'x = "{:>300000000}".format("x")',
+    'x = "{0:{1}}".format("a", 9)',
+])
+def test_refuses_formatting_past_max_length(source):
+    assert resolve(source)[0] is None
+
+
+def test_refuses_repeated_fields_of_a_long_argument():
+    long_arg = "x" * 10_000
+    value, _ = resolve(f'x = "{{0}}{{0}}{{0}}".format("{long_arg}")', max_length=20_000)
+    assert value is None
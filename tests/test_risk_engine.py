@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from backend.services.risk_engine import RiskEngine, categorize_tool, risk_key, rule_verdict
+
+
+def category(name):
+    found = categorize_tool(name)
+    return found.name if found else None
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("ShellTool", "shell"),
+    ("PythonREPLTool", "code_execution"),
+    ("run_notebook", "code_execution"),
+    ("file_read", "filesystem"),
+    ("FileSystemTool", "filesystem"),
+    ("fetch_url", "network"),
+    ("http_request", "network"),
+    ("api_request", "network"),
+    ("RequestsGetTool", "network"),
+    ("db_delete", "database_write"),
+    ("git_push", "repo_write"),
+    ("send_email", "messaging"),
+    ("web search", "public_data"),
+    ("GitHub", "internal_read"),
+    ("read_calendar", "internal_read"),
+    ("search_docs", "public_data"),
+    ("calculator", "reasoning"),
+])
+def test_categorize_tool(name, expected):
+    assert category(name) == expected
+
+
+@pytest.mark.parametrize("name", [
+    "request_refund", "time_off_request", "fetch_weather", "shortest_path", "notebook_lookup", "update_calendar",
+    "delete_draft", "process_refund",
+])
+def test_generic_words_need_a_domain_word(name):
+    assert category(name) not in ("network", "filesystem", "code_execution", "internal_read", "database_write")
+
+
+def test_fetch_weather_is_public_data():
+    assert category("fetch_weather") == "public_data"
+
+
+def test_rule_verdict_takes_the_worst_tool():
+    verdict = rule_verdict(["calculator", "web_search", "ShellTool"])
+    assert (verdict.risk, verdict.source) == ("high", "rules")
+    assert verdict.reason.startswith("ShellTool")
+    assert rule_verdict(["calculator", "send_email"]).risk == "medium"
+
+
+def test_rule_verdict_without_tools_is_low():
+    assert rule_verdict([]).risk == "low"
+
+
+def test_rule_verdict_leaves_uncovered_toolsets_to_the_llm():
+    assert rule_verdict(["calculator", "request_refund"]) is None
+
+
+def test_risk_key_is_order_and_case_insensitive():
+    assert risk_key(" Support  Agent", ["RefundOrder", "lookup_order", "refund_order"]) == (
+        "support agent", "lookup order,refund order"
+    )
+
+
+def test_llm_verdicts_are_memoized(database):
+    engine = RiskEngine()
+    calls = []
+
+    async def ask():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return {"risk": "Medium", "reason": "issues refunds"}
+
+    async def assess_twice():
+        return await asyncio.gather(*(engine.assess("Support", ["refund_order"], ask) for _ in range(2)))
+
+    first, second = asyncio.run(assess_twice())
+    assert len(calls) == 1
+    assert (first.risk, first.source, second.source) == ("medium", "llm", "cache")
+    # A new engine finds the verdict in the database
+    assert RiskEngine().lookup("support", ["RefundOrder"]).source == "cache"
+    assert engine.stats()["llm"] == 1
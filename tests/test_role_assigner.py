@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.services.discovery import role_assigner
+from backend.services.discovery.role_assigner import asummarize_prompt_roles, plan_role_batches
+from llm_service.llm import MissingApiKeyError
+
+
+def test_batches_respect_the_token_and_item_limits():
+    items = [(str(i), "word " * 40) for i in range(10)]
+    batches = plan_role_batches(items, max_tokens=200, max_items=3)
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    assert [item for batch in batches for item in batch] == items
+    # A prompt over the budget on its own still gets a batch
+    assert plan_role_batches([("big", "x" * 10_000), ("small", "hi")], max_tokens=100) == [
+        [("big", "x" * 10_000)], [("small", "hi")]
+    ]
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Fake LLM answering batches with only their first prompt, and single prompts in full."""
+    requests = []
+
+    async def allm_json(messages):
+        system, user = messages[0]["content"], messages[1]["content"]
+        requests.append(system)
+        if system == role_assigner.BATCH_SUMMARIZER_SYSTEM:
+            first = next(iter(json.loads(user)))
+            return {"roles": {first: f"Role {first}"}}
+        return {"role": "Single"}
+
+    monkeypatch.setattr(role_assigner, "allm_json", allm_json)
+    return requests
+
+
+def test_partial_batch_answers_are_split_and_retried(llm):
+    stats = {}
+    roles = asyncio.run(asummarize_prompt_roles({str(i): f"prompt {i}" for i in range(4)}, stats=stats))
+    assert roles == {"0": "Role 0", "1": "Role 1", "2": "Single", "3": "Single"}
+    # [0-3] answers 0 and splits into [1, 2] (answers 1, then 2 alone) and 3 alone
+    assert stats["role_batches"] == 2
+    assert stats["role_batch_splits"] == 2
+    assert stats["role_requests"] == 4
+
+
+def test_failed_batches_are_left_out(monkeypatch):
+    async def fail(messages):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(role_assigner, "allm_json", fail)
+    assert asyncio.run(asummarize_prompt_roles({"0": "a", "1": "b"})) == {}
+
+
+def test_missing_key_is_raised(monkeypatch):
+    async def no_key(messages):
+        raise MissingApiKeyError("no key")
+
+    monkeypatch.setattr(role_assigner, "allm_json", no_key)
+    with pytest.raises(MissingApiKeyError):
+        asyncio.run(asummarize_prompt_roles({"0": "a", "1": "b"}))
+
+
+@pytest.mark.parametrize("prompt, role", [
+    ("You are a senior software engineer. Review the code and fix bugs in Python programs.", "Coding assistant"),
+    ("You translate documents between English and Spanish.", "Translator"),
+    ("You are a travel agent who books flights and hotels for trips.", "Travel agent"),
+])
+def test_local_classifier_is_confident_on_clear_prompts(prompt, role):
+    guess = role_assigner.classify_prompt_role(prompt)
+    assert guess.role == role
+    assert guess.confidence >= role_assigner.DEFAULT_ROLE_CONFIDENCE
+    assert role_assigner.classify_prompt_role(prompt) == guess
+
+
+@pytest.mark.parametrize("prompt", ["Hello.", "You are an assistant.", ""])
+def test_local_classifier_defers_vague_prompts(prompt):
+    guess = role_assigner.classify_prompt_role(prompt)
+    assert guess.role == "General assistant"
+    assert guess.confidence < role_assigner.DEFAULT_ROLE_CONFIDENCE
+
+
+def test_only_unconfident_prompts_reach_the_llm(monkeypatch):
+    from backend.services.discovery import discovery
+
+    sent = []
+
+    async def summarize(prompts, max_tokens, stats):
+        sent.extend(prompts.values())
+        return {prompt_id: "From LLM" for prompt_id in prompts}
+
+    monkeypatch.setattr(discovery, "asummarize_prompt_roles", summarize)
+    prompts = ["You translate documents between English and Spanish.", "You are an assistant.", ""]
+    stats = {}
+    roles = discovery._assign_roles(prompts, 1, True, role_assigner.DEFAULT_ROLE_CONFIDENCE, stats)
+    assert roles == ["Translator", "From LLM", "Unknown"]
+    assert sent == ["You are an assistant."]
+    assert (stats["roles_local"], stats["roles_llm"]) == (2, 1)
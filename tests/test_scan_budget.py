@@ -0,0 +1,73 @@
+from backend.services.discovery import discovery
+from backend.services.discovery.role_assigner import classify_prompt_role
+from backend.services.scan_budget import EXPECTED_COMPLETION_TOKENS, ScanBudget, scan_token_budget
+from llm_service.prompts.discovery_prompts import BATCH_SUMMARIZER_SYSTEM
+from llm_service.shaping import estimate_tokens, shape_text
+
+PROMPTS = ["You answer questions.", "You are helpful and kind."]
+
+
+def test_short_prompts_are_not_shaped():
+    assert shape_text("You are a helpful assistant.", 100) == "You are a helpful assistant."
+
+
+def test_shaping_condenses_before_truncating():
+    text = "You are a bot.\n" + "Follow the rules.\n" * 50 + "Be   brief."
+    assert shape_text(text, 20) == "You are a bot.\nFollow the rules.\nBe brief."
+
+
+def test_shaping_keeps_head_and_tail_within_the_limit():
+    text = " ".join(f"word{i}" for i in range(2000))
+    shaped = shape_text(text, 100)
+    assert estimate_tokens(shaped) <= 100
+    assert shaped.startswith("word0 ") and shaped.endswith(" word1999")
+    assert "characters omitted" in shaped
+    assert shape_text(text, 100) == shaped
+
+
+def test_budget_reserves_until_full_then_settles_actual_usage():
+    budget = ScanBudget(100)
+    assert budget.reserve(60)
+    assert not budget.reserve(50)
+    budget.settle(60, 20)
+    assert budget.reserve(50)
+    assert not budget.exhausted
+    assert budget.stats() == {"max_tokens": 100, "used_tokens": 20, "llm_items": 2, "heuristic_items": 1}
+    assert ScanBudget().reserve(10 ** 9)
+
+
+def test_scan_token_budget_from_env(monkeypatch):
+    monkeypatch.setenv("SCAN_TOKEN_BUDGET", "5000")
+    assert scan_token_budget() == 5000
+    monkeypatch.setenv("SCAN_TOKEN_BUDGET", "0")
+    assert scan_token_budget() is None
+
+
+def fake_summaries(monkeypatch):
+    calls = []
+
+    async def summarize(prompts, max_tokens, stats):
+        calls.append(dict(prompts))
+        return {prompt_id: "Summarized" for prompt_id in prompts}
+
+    monkeypatch.setattr(discovery, "asummarize_prompt_roles", summarize)
+    return calls
+
+
+def test_roles_reserve_from_the_scan_budget(monkeypatch):
+    calls = fake_summaries(monkeypatch)
+    budget, stats = ScanBudget(10_000), {}
+    assert discovery._assign_roles(PROMPTS, 1, True, 2.0, stats, budget) == ["Summarized", "Summarized"]
+    assert len(calls) == 1
+    # Nothing was reported spent, so the reservation is released
+    assert (budget.reserved, budget.used, budget.counts["llm"]) == (0, 0, 2)
+
+
+def test_roles_over_budget_use_the_local_classifier(monkeypatch):
+    calls = fake_summaries(monkeypatch)
+    instructions = estimate_tokens(BATCH_SUMMARIZER_SYSTEM) + EXPECTED_COMPLETION_TOKENS
+    budget, stats = ScanBudget(instructions + discovery._role_tokens(PROMPTS[0], True)), {}
+    roles = discovery._assign_roles(PROMPTS, 1, True, 2.0, stats, budget)
+    assert roles == ["Summarized", classify_prompt_role(PROMPTS[1]).role]
+    assert calls == [{"0": PROMPTS[0]}]
+    assert (stats["roles_over_budget"], stats["roles_local"], stats["roles_llm"]) == (1, 1, 1)
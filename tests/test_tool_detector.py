@@ -0,0 +1,60 @@
+import pytest
+
+from backend.services.discovery.tool_detector import ToolMentionDetector
+
+VOCABULARY = {
+    "web_search": {"aliases": ["web search", "search the web"], "description": "Search the web"},
+    "send_email": {"aliases": ["send email", "email"], "description": "Send an email"},
+    "github": {"aliases": ["github"], "description": "GitHub repositories and issues"},
+}
+
+
+@pytest.fixture
+def detector():
+    return ToolMentionDetector(VOCABULARY)
+
+
+def test_finds_aliases_as_whole_words(detector):
+    found = detector.detect("You can search the web and send_email to customers. Emailing is banned.")
+    assert [t["name"] for t in found.tools] == ["web_search", "send_email"]
+    assert not found.needs_llm
+
+
+@pytest.mark.parametrize("prompt", [
+    "You are a helpful assistant. Use the context to answer questions about our API and its functions.",
+    "You are a support bot (be polite).",
+])
+def test_generic_wording_stays_local(detector, prompt):
+    assert not detector.detect(prompt).needs_llm
+
+
+@pytest.mark.parametrize("prompt", [
+    "You have access to the following tools.",
+    "Call the refund_order tool for refunds.",
+    "Tools: lookup, refund",
+    "Emit lookup_order(order_id) to find an order.",
+])
+def test_unknown_tool_grants_go_to_the_llm(detector, prompt):
+    assert detector.detect(prompt).needs_llm
+
+
+def test_vocabulary_match_skips_the_llm(detector):
+    assert not detector.detect("You have access to the following tools: web search, send_email(to, body).").needs_llm
+
+
+def test_unknown_tool_beside_a_known_one_goes_to_the_llm(detector):
+    found = detector.detect("You have access to GitHub for issues. Refunds are issued with refund_order(order_id).")
+    assert [t["name"] for t in found.tools] == ["github"]
+    assert found.needs_llm
+
+
+def test_grant_far_from_any_known_tool_goes_to_the_llm(detector):
+    prompt = "Search the web for context. " + "Be concise and friendly. " * 8 + "You have access to the billing tool."
+    assert detector.detect(prompt).needs_llm
+
+
+def test_stats(detector):
+    detector.detect("Tools: x")
+    detector.detect("search the web")
+    stats = detector.stats()
+    assert (stats["prompts"], stats["prompts_with_tools"], stats["sent_to_llm"]) == (2, 1, 1)
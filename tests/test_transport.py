@@ -0,0 +1,110 @@
+import asyncio
+
+import httpx
+import pytest
+
+from llm_service import transport
+from llm_service.transport import CircuitBreaker, CircuitOpenError, LLMUnavailableError, asend, send
+
+
+@pytest.fixture(autouse=True)
+def fresh_transport(monkeypatch):
+    monkeypatch.setattr(transport, "_breakers", {})
+    monkeypatch.setattr(transport, "_bucket", None)
+    monkeypatch.setenv("LLM_RATE_PER_SECOND", "0")
+    monkeypatch.setenv("LLM_BACKOFF_BASE", "0.001")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "3")
+
+
+def response(status, headers=None):
+    return httpx.Response(status, headers=headers, request=httpx.Request("POST", "http://llm"))
+
+
+def sequence(*results):
+    calls = []
+
+    def post():
+        result = results[min(len(calls), len(results) - 1)]
+        calls.append(result)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return post, calls
+
+
+def test_retries_retryable_failures_until_success():
+    post, calls = sequence(response(503), httpx.ConnectError("down"), response(200))
+    assert send(post, "m").status_code == 200
+    assert len(calls) == 3
+
+
+def test_non_retryable_status_is_raised_at_once():
+    post, calls = sequence(response(400))
+    with pytest.raises(httpx.HTTPStatusError):
+        send(post, "m")
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_retries():
+    post, calls = sequence(response(500))
+    with pytest.raises(LLMUnavailableError):
+        send(post, "m")
+    assert len(calls) == 4
+
+
+def test_retry_after_is_honoured(monkeypatch):
+    slept = []
+    monkeypatch.setattr(transport.time, "sleep", slept.append)
+    post, _ = sequence(response(429, {"Retry-After": "2"}), response(200))
+    send(post, "m")
+    assert slept == [2.0]
+
+
+def test_stops_retrying_once_the_circuit_opens(monkeypatch):
+    monkeypatch.setenv("LLM_BREAKER_THRESHOLD", "2")
+    post, calls = sequence(response(503))
+    with pytest.raises(LLMUnavailableError) as raised:
+        send(post, "m")
+    assert not isinstance(raised.value, CircuitOpenError)
+    assert len(calls) == 2
+    with pytest.raises(CircuitOpenError):
+        send(post, "m")
+    assert len(calls) == 2
+
+
+def test_breaker_half_open_probe():
+    breaker = CircuitBreaker("m", threshold=1, cooldown=0)
+    breaker.failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_frees_the_slot(monkeypatch):
+    monkeypatch.setenv("LLM_BREAKER_COOLDOWN", "0")
+    breaker = transport._get_breaker("m")
+    breaker.opened_at = 0.0
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(asend(cancelled, "m"))
+    # The next request may probe instead of being rejected for good
+    post, _ = sequence(response(200))
+    assert send(post, "m").status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_unexpected_error_frees_the_probe(monkeypatch):
+    monkeypatch.setenv("LLM_BREAKER_COOLDOWN", "0")
+    breaker = transport._get_breaker("m")
+    breaker.opened_at = 0.0
+    post, _ = sequence(KeyError("bug"))
+    with pytest.raises(KeyError):
+        send(post, "m")
+    assert breaker.allow() is True
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from backend.services.discovery.walker import WalkOptions, new_walk_stats, walk_code_files
+
+
+def relative(root, paths):
+    return sorted(os.path.relpath(p, root).replace(os.sep, "/") for p in paths)
+
+
+def test_prunes_ignored_dirs_and_gitignored_files(tmp_path):
+    for name in ("a.py", "node_modules/x.py", "gen/y.py", "skip.py", "keep/z.py"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("x = 1\n")
+    (tmp_path / ".gitignore").write_text("gen/\nskip.py\n")
+    stats = new_walk_stats()
+    assert relative(tmp_path, walk_code_files(str(tmp_path), stats=stats)) == ["a.py", "keep/z.py"]
+    assert stats["dirs_pruned"] == 2
+    assert stats["files_pruned"] == 1
+
+
+def test_skips_oversized_files(tmp_path):
+    (tmp_path / "big.py").write_text("x" * 100)
+    (tmp_path / "small.py").write_text("x")
+    stats = new_walk_stats()
+    found = walk_code_files(str(tmp_path), WalkOptions(max_file_size=10), stats)
+    assert relative(tmp_path, found) == ["small.py"]
+    assert stats["oversized_files"] == 1
+
+
+def test_leading_slash_anchors_to_the_gitignore(tmp_path):
+    for name in ("gen/a.py", "pkg/gen/b.py", "pkg/c.py"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("x = 1\n")
+    (tmp_path / ".gitignore").write_text("/gen/\n")
+    assert relative(tmp_path, walk_code_files(str(tmp_path))) == ["pkg/c.py", "pkg/gen/b.py"]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_symlinks_never_leave_the_root(tmp_path):
+    root, outside = tmp_path / "repo", tmp_path / "outside"
+    (root / "pkg").mkdir(parents=True)
+    outside.mkdir()
+    (root / "pkg" / "a.py").write_text("x = 1\n")
+    (outside / "secret.py").write_text("x = 1\n")
+    os.symlink(str(outside), str(root / "escape"))
+    os.symlink(str(outside / "secret.py"), str(root / "secret.py"))
+    os.symlink("pkg", str(root / "alias"))
+
+    assert relative(root, walk_code_files(str(root))) == ["pkg/a.py"]
+    followed = relative(root, walk_code_files(str(root), WalkOptions(follow_symlinks=True)))
+    # Only the link inside the tree is followed; pkg is then a loop back into it
+    assert followed == ["alias/a.py"]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_reads_file_symlinks_within_the_root(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text("x = 1\n")
+    os.symlink(os.path.join("pkg", "a.py"), str(tmp_path / "link.py"))
+    assert relative(tmp_path, walk_code_files(str(tmp_path))) == ["link.py", "pkg/a.py"]